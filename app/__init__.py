@@ -5,17 +5,28 @@ FastAPI factory function that bootstraps the entire system —
 loads configuration, initializes databases, embeddings, and routes.
 """
 
-from fastapi import FastAPI
+import time
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from app.config import (
     APP_NAME,
     APP_VERSION,
     ENVIRONMENT,
+    LAZY_LOADING,
+    BACKGROUND_WARMUP,
     initialize_system,
     shutdown_system,
 )
-from app.utils import logger, connect_databases, embedding_helper
+from app.utils import logger
+from app.utils.batching import QueueFullError
+from app.utils.executor import inference_executor
+from app.utils.resources import resources
+from app.utils.server_timing import header_value, record, stage_timings
 from app.routes import api_routes, admin_routes, auth_routes
+from app.services import warmup_models
 
 
 # =============================================================
@@ -42,8 +53,54 @@ def create_app() -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=["Server-Timing"],
     )
 
+    @app.middleware("http")
+    async def server_timing(request: Request, call_next):
+        """stage durations recorded by controllers → Server-Timing header"""
+        start = time.perf_counter()
+        stage_timings(request)
+        response = await call_next(request)
+        record(request, "total", (time.perf_counter() - start) * 1000)
+        response.headers["Server-Timing"] = header_value(stage_timings(request))
+        return response
+
+    # ---------------------------------------------------------
+    # 🔸 backpressure → 503
+    # ---------------------------------------------------------
+    @app.exception_handler(QueueFullError)
+    async def on_queue_full(request: Request, exc: QueueFullError):
+        """shed load instead of queueing unbounded inference work"""
+        logger.warning(f"🚦 request rejected under load: {exc}")
+        return JSONResponse(
+            status_code=503,
+            content={"status": "error", "message": "server busy, please retry shortly."},
+            headers={"Retry-After": "1"},
+        )
+
+    # ---------------------------------------------------------
+    # 🔸 warmup + readiness state
+    # ---------------------------------------------------------
+    app.state.ready = False
+    app.state.warmup_error = None
+
+    def _warmup():
+        """blocking warmup: databases (once) + every shared model"""
+        initialize_system()
+        warmup_models()
+        resources.log_report()
+
+    async def _run_warmup():
+        try:
+            await run_in_threadpool(_warmup)
+            app.state.ready = True
+            logger.info("🟢 warmup complete — instance ready for traffic.")
+        except Exception as e:
+            app.state.warmup_error = str(e)
+            logger.error(f"❌ warmup failed: {e}")
+            raise
+
     # ---------------------------------------------------------
     # 🔸 startup event
     # ---------------------------------------------------------
@@ -52,10 +109,16 @@ def create_app() -> FastAPI:
         """initialize db + ai subsystems safely on startup"""
         try:
             logger.info("⚙️ system startup sequence initiated...")
-            initialize_system()
-            connect_databases()
-            if embedding_helper.model:
-                logger.info("🧠 embedding subsystem active.")
+            if not LAZY_LOADING:
+                await _run_warmup()
+            elif BACKGROUND_WARMUP:
+                # accept connections now; /ready flips once models are warm
+                app.state.warmup_task = asyncio.create_task(_run_warmup())
+                logger.info("💤 lazy loading — models warming up in the background.")
+            else:
+                # pure first-use loading: nothing to wait for
+                app.state.ready = True
+                logger.info("💤 lazy loading — models load on first use.")
             logger.info("✅ system startup complete — all systems go.")
         except Exception as e:
             logger.error(f"❌ startup failure: {e}")
@@ -70,6 +133,7 @@ def create_app() -> FastAPI:
         try:
             logger.info("🧹 initiating graceful shutdown...")
             shutdown_system()
+            inference_executor.shutdown()
             logger.info("✅ system shutdown complete.")
         except Exception as e:
             logger.error(f"❌ error during shutdown: {e}")
@@ -43,6 +43,16 @@ MODEL_NAME = os.getenv("MODEL_NAME", "distilgpt2")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", 150))
 
+# =============================================================
+# 🔹 server process model
+# =============================================================
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", 4))
+# load weights once in the master, then fork workers that share them copy-on-write
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "true").lower() in ("1", "true", "yes")
+# serve immediately and load models on first use / in a background warmup task
+LAZY_LOADING = os.getenv("LAZY_LOADING", "false").lower() in ("1", "true", "yes")
+BACKGROUND_WARMUP = os.getenv("BACKGROUND_WARMUP", "true").lower() in ("1", "true", "yes")
+
 # =============================================================
 # 🔹 misc and logging
 # =============================================================
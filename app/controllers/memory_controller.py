@@ -1,4 +1,5 @@
 from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from app.utils.database import get_mongo_db
 from app.models.session_model import SessionBase, session_document
@@ -8,9 +9,13 @@ from datetime import datetime
 
 
 # -------------------------------------------------------------
-# database connection
+# database connection (resolved on first use, not at import)
 # -------------------------------------------------------------
-db = get_mongo_db()
+def _db():
+    db = get_mongo_db()
+    if db is None:
+        raise RuntimeError("mongodb unavailable")
+    return db
 
 
 # -------------------------------------------------------------
@@ -41,6 +46,7 @@ class HistoryRequest(BaseModel):
 async def save_session(request: Request, body: MemoryRequest):
     """saves chat sessions and responses to mongodb"""
     try:
+        db = await run_in_threadpool(_db)
         session = SessionBase(
             user_id=body.user_id,
             query=body.query.lower(),
@@ -49,7 +55,7 @@ async def save_session(request: Request, body: MemoryRequest):
             created_at=datetime.utcnow()
         )
 
-        db["sessions"].insert_one(session_document(session))
+        await run_in_threadpool(db["sessions"].insert_one, session_document(session))
         logger.info(f"💾 session saved for user: {body.user_id}")
 
         return {
@@ -71,15 +77,12 @@ async def save_session(request: Request, body: MemoryRequest):
 async def get_user_sessions(request: Request, body: HistoryRequest):
     """retrieves recent chat history for a given user"""
     try:
+        db = await run_in_threadpool(_db)
         user_id = body.user_id.strip()
         limit = body.limit or 10
 
-        sessions = list(
-            db["sessions"]
-            .find({"user_id": user_id})
-            .sort("created_at", -1)
-            .limit(limit)
-        )
+        cursor = db["sessions"].find({"user_id": user_id}).sort("created_at", -1).limit(limit)
+        sessions = await run_in_threadpool(list, cursor)
 
         if not sessions:
             return {
@@ -112,6 +115,7 @@ async def get_user_sessions(request: Request, body: HistoryRequest):
 async def save_feedback(request: Request, body: FeedbackRequest):
     """saves user feedback on chatbot responses"""
     try:
+        db = await run_in_threadpool(_db)
         feedback = FeedbackBase(
             user_id=body.user_id,
             session_id=body.session_id,
@@ -120,7 +124,7 @@ async def save_feedback(request: Request, body: FeedbackRequest):
             created_at=datetime.utcnow()
         )
 
-        db["feedbacks"].insert_one(feedback_document(feedback))
+        await run_in_threadpool(db["feedbacks"].insert_one, feedback_document(feedback))
         logger.info(f"📝 feedback recorded for user {body.user_id}")
 
         return {
@@ -142,13 +146,10 @@ async def save_feedback(request: Request, body: FeedbackRequest):
 async def get_user_feedback(request: Request, body: HistoryRequest):
     """retrieves user feedback records"""
     try:
+        db = await run_in_threadpool(_db)
         user_id = body.user_id.strip()
-        feedbacks = list(
-            db["feedbacks"]
-            .find({"user_id": user_id})
-            .sort("created_at", -1)
-            .limit(20)
-        )
+        cursor = db["feedbacks"].find({"user_id": user_id}).sort("created_at", -1).limit(20)
+        feedbacks = await run_in_threadpool(list, cursor)
 
         if not feedbacks:
             return {
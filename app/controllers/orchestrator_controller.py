@@ -1,16 +1,132 @@
+import asyncio
+import threading
 from fastapi import Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.services.generation_service import MaharagaModel
-from app.services.policy_service import check_age_access, check_safety
+from app.services.generation_service import GENERATION_ERRORS, get_generator, generator_version
+from app.services.policy_service import check_age_access, check_safety, policy_service
+from app.controllers.safety_controller import safety_check, SafetyCheckRequest
 from app.services.intent_service import detect_intent
-from app.services.vector_service import retrieve_context
-from app.services.rag_service import build_contextual_prompt
+from app.services.vector_service import vector_service
+from app.services.rag_service import assemble_rag_prompt
+from app.utils.batching import MicroBatcher, QueueFullError
+from app.utils.executor import inference_executor
+from app.utils.response_cache import ResponseCache, normalize_query
+from app.utils.streaming import ndjson_token_stream, NDJSON_MEDIA_TYPE
+from app.utils.server_timing import record, timed
 from app.utils.logger import logger
+from app.utils.constants import (
+    GEN_BATCH_MAX_SIZE,
+    GEN_BATCH_MAX_WAIT_MS,
+    GEN_BATCH_QUEUE_SIZE,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_SEMANTIC,
+    RESPONSE_CACHE_SIM_THRESHOLD,
+)
 
 # -------------------------------------------------------------
-# global model instance (loaded once on app startup)
+# generation backend (model resolved lazily via the resource container)
 # -------------------------------------------------------------
-maharaga_model = MaharagaModel()
+def _generate_batch(prompts: list[str]) -> list[str]:
+    return get_generator().generate_batch(prompts)
+
+
+def _open_stream(prompt: str):
+    return get_generator().stream_text(prompt)
+
+
+# concurrent prompts are coalesced into one batched generate() call
+generation_batcher = MicroBatcher(
+    "generation",
+    _generate_batch,
+    max_batch_size=GEN_BATCH_MAX_SIZE,
+    max_wait_ms=GEN_BATCH_MAX_WAIT_MS,
+    max_queue_size=GEN_BATCH_QUEUE_SIZE,
+)
+
+
+# -------------------------------------------------------------
+# response cache (exact + semantic tiers, scoped to model / kb version)
+# -------------------------------------------------------------
+def _embed_query(query: str):
+    # one minilm embedding of the canonical query (normalize_query) serves
+    # both the semantic cache and dense retrieval
+    return vector_service.embed_text(query) if vector_service else None
+
+
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl_seconds=RESPONSE_CACHE_TTL,
+    embed_fn=_embed_query if RESPONSE_CACHE_SEMANTIC else None,
+    similarity_threshold=RESPONSE_CACHE_SIM_THRESHOLD,
+    enabled=RESPONSE_CACHE_ENABLED,
+)
+
+
+def _cache_scope(mode: str) -> str | None:
+    """model version (+ shared knowledge-base stamp for rag); None = don't cache yet"""
+    model = generator_version()
+    if model is None:
+        return None
+    if mode == "contextual":
+        return f"{model}|kb{vector_service.kb_version if vector_service else 0}"
+    return model
+
+
+async def _cached_answer(mode: str, query: str, after=None) -> dict | None:
+    """
+    exact lookup inline, semantic lookup (needs an embedding) on the executor.
+    `after` (the canonical query-embedding task) supplies that embedding, so
+    the cache does not embed the query a second time.
+    """
+    scope = _cache_scope(mode)
+    if scope is None or not response_cache.enabled:
+        return None
+    hit = response_cache.get(mode, query, scope)
+    if hit is not None:
+        return hit
+    if not response_cache.semantic_enabled:
+        return response_cache.get_similar(mode, query, scope)  # records the miss
+    try:
+        if after is not None:
+            vector = await after
+            return response_cache.get_similar(mode, query, scope, vector=vector)
+        return await inference_executor.run(response_cache.get_similar, mode, query, scope)
+    except QueueFullError:
+        return None  # under load, skip the semantic tier rather than reject
+
+
+def _remember(mode: str, query: str, payload: dict, vector=None):
+    """store a finished answer; semantic indexing runs in the background"""
+    scope = _cache_scope(mode)
+    if scope is None or not response_cache.enabled or payload.get("response") in GENERATION_ERRORS:
+        return
+    response_cache.put(mode, query, scope, payload)
+    if response_cache.semantic_enabled:
+        try:
+            inference_executor.submit(response_cache.index, mode, query, scope, vector)
+        except QueueFullError:
+            pass
+
+
+def _stream_cached(hit: dict, meta: dict) -> StreamingResponse:
+    """replay a cached answer as a single-token ndjson stream (policy-filtered like a fresh one)"""
+    return StreamingResponse(
+        ndjson_token_stream(
+            iter([hit["response"]]),
+            meta=dict(meta, cache=hit.get("cache")),
+            text_filter=policy_service.stream_filter(),
+        ),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+def _policy_blocked(verdict: dict) -> bool:
+    """policy scans return a verdict dict; only "error" blocks (warnings pass)"""
+    return (verdict or {}).get("status") == "error"
 
 
 # -------------------------------------------------------------
@@ -19,6 +135,7 @@ maharaga_model = MaharagaModel()
 class QueryRequest(BaseModel):
     query: str
     user_age: int | None = None
+    stream: bool = False
 
 
 # =============================================================
@@ -38,7 +155,7 @@ async def process_query(request: Request, body: QueryRequest):
             }
 
         # safety validation
-        if not check_safety(query):
+        if _policy_blocked(check_safety(query, user_age)):
             return {
                 "status": "error",
                 "message": "query blocked due to unsafe or restricted content.",
@@ -47,24 +164,50 @@ async def process_query(request: Request, body: QueryRequest):
         # detect intent
         intent = detect_intent(query)
         logger.info(f"🧭 intent detected: {intent}")
+        meta = {"query": query, "intent": intent, "model": "distilgpt2"}
+
+        # repeated / near-duplicate question: serve the cached answer
+        cached = await _cached_answer("chat", query)
+        if cached is not None:
+            logger.info(f"♻️ response served from {cached['cache']} cache")
+            if body.stream:
+                return _stream_cached(cached, meta)
+            return dict(cached, query=query)
+
+        # streaming mode: ndjson tokens with incremental policy post-processing
+        if body.stream:
+            pieces = await inference_executor.run(_open_stream, query)
+            return StreamingResponse(
+                ndjson_token_stream(
+                    pieces,
+                    text_filter=policy_service.stream_filter(),
+                    meta=meta,
+                    fallback="i'm not sure about that yet, but i'm learning every day.",
+                ),
+                media_type=NDJSON_MEDIA_TYPE,
+            )
 
         # generate model response
-        ai_response = maharaga_model.generate_text(query)
+        ai_response = await generation_batcher.asubmit(query)
 
         if not ai_response or ai_response.strip() == "":
             ai_response = "i'm not sure about that yet, but i'm learning every day."
 
         logger.info(f"🤖 response: {ai_response[:150]}...")
 
-        return {
+        result = {
             "status": "success",
             "query": query,
             "intent": intent,
-            "response": ai_response.lower(),
+            "response": policy_service.postprocess(ai_response),
             "model": "distilgpt2",
             "source": "maharaga core v1.0",
         }
+        _remember("chat", query, result)
+        return result
 
+    except QueueFullError:
+        raise  # surfaced as 503 by the app-level handler
     except Exception as e:
         logger.error(f"❌ process_query failed: {e}")
         return {
@@ -76,59 +219,144 @@ async def process_query(request: Request, body: QueryRequest):
 # =============================================================
 # 2️⃣ CONTEXTUAL QUERY HANDLER (RAG MODE)
 # =============================================================
+#
+#   embed query ──▶ retrieve + prompt (domain filter from the query text) ─▶ generate
+#   cache lookup (exact now, semantic after embed) ──▶ hit → cancel retrieval
+#   intent ──▶ response metadata only
+#   safety scans ─▶ blocked → cancel everything still in flight
+#
+# independent stages start together; every stage is timed into the
+# Server-Timing response header.
+
+async def _safety_gate(request: Request, query: str, user_age: int) -> dict | None:
+    """keyword safety scan + policy scan → blocking payload, or None to proceed"""
+    scan = await safety_check(request, SafetyCheckRequest(query=query, user_age=user_age))
+    if scan.get("status") != "success":
+        logger.warning("⚠️ contextual query blocked by safety layer.")
+        return scan
+    verdict = await run_in_threadpool(check_safety, query, user_age)
+    if _policy_blocked(verdict):
+        return {
+            "status": "error",
+            "message": "query blocked due to policy restrictions.",
+        }
+    return None
+
+
+async def _retrieve(request: Request, query: str, embed_task, cancel: threading.Event) -> dict:
+    """hybrid retrieval + prompt assembly as soon as the query vector is known"""
+    vector = await embed_task  # handed to the dense search, so the query is embedded once
+    rag = await timed(
+        request,
+        "retrieval",
+        inference_executor.run(assemble_rag_prompt, query, cancel=cancel, vector=vector),
+    )
+    for stage, ms in (rag.get("timings") or {}).items():
+        record(request, f"rag-{stage.removesuffix('_ms')}", ms)
+    return rag
+
+
+async def _settle(tasks: list, cancel: threading.Event):
+    """cancel stages still in flight and collect their outcomes"""
+    cancel.set()  # stops a retrieval that is already running at its next stage
+    for task in tasks:
+        if not task.done():
+            task.cancel()  # queued executor work never starts
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
 async def process_contextual_query(request: Request, body: QueryRequest):
     """handles context-aware generation using rag pipeline"""
+    tasks: list = []
+    cancel = threading.Event()
     try:
         query = body.query.strip().lower()
         user_age = body.user_age or 0
 
-        # safety & access checks
+        # access check (no work started yet)
         if not check_age_access(user_age):
             return {
                 "status": "error",
                 "message": "restricted access. only 25+ users can use contextual mode.",
             }
 
-        if not check_safety(query):
-            return {
-                "status": "error",
-                "message": "query blocked due to policy restrictions.",
-            }
+        # start the independent stages together; the canonical query is
+        # embedded once for the semantic cache and the dense search
+        embed_task = asyncio.create_task(
+            timed(request, "embed", inference_executor.run(_embed_query, normalize_query(query)))
+        )
+        intent_task = asyncio.create_task(timed(request, "intent", run_in_threadpool(detect_intent, query)))
+        safety_task = asyncio.create_task(timed(request, "safety", _safety_gate(request, body.query, user_age)))
+        cache_task = asyncio.create_task(
+            timed(request, "cache", _cached_answer("contextual", query, after=embed_task))
+        )
+        retrieval_task = asyncio.create_task(_retrieve(request, query, embed_task, cancel))
+        tasks = [embed_task, intent_task, safety_task, cache_task, retrieval_task]
 
-        # intent detection
-        intent = detect_intent(query)
+        blocked = await safety_task
+        if blocked is not None:
+            return blocked
+
+        intent = await intent_task
         logger.info(f"📚 contextual mode intent: {intent}")
 
-        # retrieve context
-        try:
-            context_docs = retrieve_context(query, intent=intent)
-        except Exception as ctx_err:
-            logger.error(f"❌ context retrieval failed: {ctx_err}")
-            context_docs = []
+        # cached answers skip retrieval as well as generation
+        cached = await cache_task
+        if cached is not None:
+            logger.info(f"♻️ contextual response served from {cached['cache']} cache")
+            if body.stream:
+                meta = {"mode": "contextual", "query": query, "intent": intent, "model": "distilgpt2"}
+                return _stream_cached(cached, dict(meta, context_used=cached.get("context_used")))
+            return dict(cached, query=query)
 
-        # build rag prompt
-        full_prompt = build_contextual_prompt(query, context_docs or [])
+        rag = await retrieval_task
+        context_docs = rag.get("context_docs") or []
+        full_prompt = rag["prompt"]
+
+        if body.stream:
+            pieces = await timed(request, "generate-start", inference_executor.run(_open_stream, full_prompt))
+            return StreamingResponse(
+                ndjson_token_stream(
+                    pieces,
+                    text_filter=policy_service.stream_filter(),
+                    meta={
+                        "mode": "contextual",
+                        "query": query,
+                        "intent": intent,
+                        "context_used": bool(context_docs),
+                        "model": "distilgpt2",
+                    },
+                ),
+                media_type=NDJSON_MEDIA_TYPE,
+            )
 
         # generate text
-        ai_response = maharaga_model.generate_text(full_prompt)
+        ai_response = await timed(request, "generate", generation_batcher.asubmit(full_prompt))
 
-        return {
+        result = {
             "status": "success",
             "mode": "contextual",
             "intent": intent,
             "query": query,
-            "response": ai_response.lower(),
+            "response": policy_service.postprocess(ai_response),
             "context_used": bool(context_docs),
             "model": "distilgpt2",
             "source": "maharaga rag v1.0",
         }
+        _remember("contextual", query, result, vector=embed_task.result())
+        return result
 
+    except QueueFullError:
+        raise  # surfaced as 503 by the app-level handler
     except Exception as e:
         logger.error(f"❌ process_contextual_query failed: {e}")
         return {
             "status": "error",
             "message": "internal system error while generating contextual response.",
         }
+    finally:
+        if tasks:
+            await _settle(tasks, cancel)
 
 
 # =============================================================
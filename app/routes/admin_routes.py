@@ -1,4 +1,16 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from app.controllers.orchestrator_controller import generation_batcher, response_cache
+from app.services.generation_service import prefix_cache_stats
+from app.services.ingestion_service import ingestion_status, start_ingestion_job
+from app.services.ml_service import ml_service
+from app.services.model_registry import model_registry
+from app.services.vector_service import vector_service
+from app.services.rag_service import retrieval_timings, context_packer
+from app.services.rerank_service import rerank_service
+from app.utils.embeddings import embedding_batcher, embedding_cache
+from app.utils.executor import inference_executor
+from app.utils.resources import resources
 from app.utils.logger import logger
 
 router = APIRouter(tags=["admin"])
@@ -25,3 +37,112 @@ async def system_status():
         "uptime": "active",
         "message": "maharaga system stable and responsive."
     }
+
+
+# -------------------------------------------------------------
+# 📈 inference metrics
+# -------------------------------------------------------------
+@router.get("/metrics")
+async def inference_metrics():
+    """returns queue depth and batch-size histograms for tuning"""
+    return {
+        "status": "success",
+        "batching": {
+            "generation": generation_batcher.stats(),
+            "embedding": embedding_batcher.stats(),
+        },
+        "executor": inference_executor.stats(),
+        "prefix_cache": prefix_cache_stats(),
+        "response_cache": response_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "retrieval": retrieval_timings.stats(),
+        "rerank": rerank_service.stats(),
+        "context_packing": context_packer.stats(),
+    }
+
+
+@router.post("/cache/clear")
+async def clear_response_cache():
+    """drops every cached orchestrator answer"""
+    response_cache.invalidate(reason="admin request")
+    return {"status": "success", "message": "response cache cleared."}
+
+
+# -------------------------------------------------------------
+# 🗂️ loaded models
+# -------------------------------------------------------------
+@router.get("/models")
+async def list_models():
+    """lists models held by the process-wide registry"""
+    return {"status": "success", "models": model_registry.stats()}
+
+
+@router.post("/models/reload")
+async def reload_model():
+    """hot-swaps the served model to the latest checkpoint in models/trained"""
+    logger.info("🔁 admin requested serving model reload.")
+    return await run_in_threadpool(ml_service.reload_serving_model)
+
+
+# -------------------------------------------------------------
+# 📦 shared resources
+# -------------------------------------------------------------
+@router.get("/resources")
+async def list_resources():
+    """load time and memory footprint of each shared resource"""
+    return {"status": "success", "resources": resources.report()}
+
+
+# -------------------------------------------------------------
+# 📥 bulk knowledge-base ingestion
+# -------------------------------------------------------------
+@router.post("/ingest")
+async def ingest_documents(request: Request):
+    """starts a background ingestion of a jsonl / csv file or directory on the server"""
+    body = await request.json()
+    source = body.get("path")
+    if not source:
+        return {"status": "error", "message": "missing 'path'."}
+    logger.info(f"📥 admin requested ingestion of {source}.")
+    return start_ingestion_job(
+        source,
+        checkpoint_path=body.get("checkpoint"),
+        text_field=body.get("text_field", "text"),
+        id_field=body.get("id_field", "id"),
+        restart=bool(body.get("restart", False)),
+    )
+
+
+@router.get("/ingest")
+async def ingest_status():
+    """progress / report of the last ingestion job"""
+    return ingestion_status()
+
+
+# -------------------------------------------------------------
+# 🗃️ knowledge-base collection
+# -------------------------------------------------------------
+@router.get("/collection")
+async def collection_info():
+    """alias target, embedding schema and point count of the knowledge base"""
+    if not vector_service:
+        return {"status": "error", "message": "vector service unavailable."}
+    return await run_in_threadpool(vector_service.collection_info)
+
+
+@router.post("/collection/snapshot")
+async def snapshot_collection():
+    """mirrors the qdrant collection into the local fallback index"""
+    if not vector_service:
+        return {"status": "error", "message": "vector service unavailable."}
+    logger.info("💾 admin requested a local vector index snapshot.")
+    return await run_in_threadpool(vector_service.snapshot_local_index)
+
+
+@router.post("/collection/lexical")
+async def rebuild_lexical_index():
+    """rebuilds (and compacts) the bm25 index from the stored chunks"""
+    if not vector_service:
+        return {"status": "error", "message": "vector service unavailable."}
+    logger.info("🔤 admin requested a lexical index rebuild.")
+    return await run_in_threadpool(vector_service.rebuild_lexical_index)
@@ -1,7 +1,18 @@
 from fastapi import APIRouter, Request
-from app.controllers.orchestrator_controller import process_query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.controllers.orchestrator_controller import (
+    QueryRequest,
+    process_query,
+    process_contextual_query,
+)
 from app.controllers.safety_controller import safety_check, SafetyCheckRequest
-from app.services.ml_service import MaharagaMLService
+from app.services.ml_service import ml_service
+from app.services.policy_service import policy_service
+from app.utils.batching import QueueFullError
+from app.utils.executor import inference_executor
+from app.utils.resources import resources
+from app.utils.streaming import ndjson_token_stream, NDJSON_MEDIA_TYPE
 from app.utils.logger import logger
 
 router = APIRouter(tags=["maharaga api"])
@@ -19,6 +30,30 @@ async def health_check():
     }
 
 
+# -------------------------------------------------------------
+# liveness: the process is up and the event loop responds
+# -------------------------------------------------------------
+@router.get("/live")
+async def liveness():
+    """liveness probe — never touches models or databases"""
+    return {"status": "ok"}
+
+
+# -------------------------------------------------------------
+# readiness: models are warm and the instance can take traffic
+# -------------------------------------------------------------
+@router.get("/ready")
+async def readiness(request: Request):
+    """readiness probe — 503 until the warmup task has finished"""
+    state = request.app.state
+    if getattr(state, "ready", False):
+        return {"status": "ready"}
+    body = {"status": "warming_up", "resources": resources.report()}
+    if getattr(state, "warmup_error", None):
+        body = {"status": "failed", "message": state.warmup_error}
+    return JSONResponse(status_code=503, content=body)
+
+
 # =============================================================
 # 🧠 MAIN CONVERSATION ENDPOINT
 # =============================================================
@@ -27,6 +62,7 @@ async def query(request: Request):
     """
     receives user input → passes through safety + orchestrator layers
     for intelligent response generation.
+    set "stream": true to receive ndjson token events instead.
     """
     try:
         data = await request.json()
@@ -45,14 +81,45 @@ async def query(request: Request):
             return safe_check
 
         # 2️⃣ run orchestrator (main AI logic)
-        response = await process_query(request)
+        body = QueryRequest(query=user_query, user_age=user_age, stream=bool(data.get("stream")))
+        response = await process_query(request, body)
         return response
 
+    except QueueFullError:
+        raise
     except Exception as e:
         logger.error(f"❌ query route error: {e}")
         return {"status": "error", "message": "internal server failure."}
 
 
+# =============================================================
+# 📚 CONTEXTUAL (RAG) CONVERSATION ENDPOINT
+# =============================================================
+@router.post("/query/contextual")
+async def contextual_query(request: Request):
+    """
+    retrieval-augmented variant of /query.
+    set "stream": true to receive ndjson token events instead.
+    """
+    try:
+        data = await request.json()
+        user_query = data.get("query", "").strip()
+        user_age = data.get("user_age", 0)
+
+        if not user_query:
+            return {"status": "error", "message": "query cannot be empty."}
+
+        # the safety layer runs inside the orchestrator, concurrently with retrieval
+        body = QueryRequest(query=user_query, user_age=user_age, stream=bool(data.get("stream")))
+        return await process_contextual_query(request, body)
+
+    except QueueFullError:
+        raise
+    except Exception as e:
+        logger.error(f"❌ contextual query route error: {e}")
+        return {"status": "error", "message": "internal server failure."}
+
+
 # =============================================================
 # 🧩 TRAIN MAHARAGA MODEL
 # =============================================================
@@ -75,8 +142,11 @@ async def train_model(request: Request):
             }
 
         logger.info(f"⚙️ starting model training from {csv_path} for {epochs} epoch(s).")
-        ml = MaharagaMLService()
-        result = ml.train_from_csv(csv_path, text_column=text_column, epochs=epochs)
+        # training runs for minutes — keep it off both the loop and the inference pool.
+        # on success the served weights are hot-swapped to the new checkpoint.
+        result = await run_in_threadpool(
+            ml_service.train_from_csv, csv_path, text_column=text_column, epochs=epochs
+        )
 
         logger.info(f"✅ training process completed with status: {result.get('status')}")
         return result
@@ -94,6 +164,7 @@ async def generate_text(request: Request):
     """
     generate intelligent text using the fine-tuned or base maharaga model.
     accepts a text prompt and returns generated output.
+    set "stream": true to receive ndjson token events instead.
     """
     try:
         data = await request.json()
@@ -104,12 +175,25 @@ async def generate_text(request: Request):
             return {"status": "error", "message": "prompt cannot be empty."}
 
         logger.info("🧠 generating response via maharaga model...")
-        ml = MaharagaMLService()
-        output = ml.generate_text(prompt, max_length=max_length)
+        if data.get("stream"):
+            # loading / reloading the model and tokenizing happen off the event loop
+            pieces = await inference_executor.run(ml_service.stream_text, prompt, max_length=max_length)
+            return StreamingResponse(
+                ndjson_token_stream(
+                    pieces,
+                    text_filter=policy_service.stream_filter(),
+                ),
+                media_type=NDJSON_MEDIA_TYPE,
+            )
+
+        output = await inference_executor.run(ml_service.generate_text, prompt, max_length=max_length)
 
         logger.info("✅ generation completed successfully.")
-        return {"status": "success", "response": output}
+        # same lowercase / mask / tone pipeline the stream applies
+        return {"status": "success", "response": policy_service.postprocess(output)}
 
+    except QueueFullError:
+        raise
     except Exception as e:
         logger.error(f"❌ generation route error: {e}")
         return {"status": "error", "message": f"generation failed: {e}"}
@@ -11,32 +11,52 @@ together via the main orchestrator controller.
 
 from app.services.vector_service import VectorService, vector_service
 from app.services.intent_service import detect_intent
-from app.services.generation_service import MaharagaModel
-from app.services.policy_service import PolicyService
+from app.services.generation_service import MaharagaModel, get_generator
+from app.services.policy_service import PolicyService, policy_service as _policy_service
+from app.services.ml_service import ml_service
 from app.services import rag_service  # ✅ functional-style RAG module
+from app.utils.resources import resources
 from app.utils.logger import logger
 
 
 # =============================================================
 # 🔹 global instances (lazy-loaded singletons)
 # =============================================================
-try:
-    vector_service_instance = vector_service  # already instantiated in vector_service.py
-except Exception as e:
-    logger.warning(f"⚠️ vector service not ready: {e}")
-    vector_service_instance = None
+vector_service_instance = vector_service  # connects to qdrant on first use
+policy_service = _policy_service  # already instantiated in policy_service.py
 
-try:
-    maharaga_model = MaharagaModel()
-except Exception as e:
-    logger.warning(f"⚠️ maharaga model initialization failed: {e}")
-    maharaga_model = None
 
-try:
-    policy_service = PolicyService()
-except Exception as e:
-    logger.warning(f"⚠️ policy service initialization failed: {e}")
-    policy_service = None
+def __getattr__(name: str):
+    """resolve heavy singletons on first attribute access"""
+    if name == "maharaga_model":
+        try:
+            return get_generator()  # same instance the orchestrator uses
+        except Exception as e:
+            logger.warning(f"⚠️ maharaga model initialization failed: {e}")
+            return None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# =============================================================
+# 🔥 warmup (background task, or pre-fork preload + per-worker setup)
+# =============================================================
+def warmup_models():
+    """load every shared model and connect the vector store now"""
+    resources.warmup()
+    ml_service.warmup()
+    vector_service.ensure_ready()
+
+
+def preload_models():
+    """master side of prefork: cpu weights only — no gpu, no qdrant connection"""
+    resources.warmup()
+    ml_service.warmup()
+
+
+def after_fork():
+    """worker side of prefork: gpu placement and this worker's own qdrant client"""
+    resources.after_fork()
+    vector_service.ensure_ready()
 
 
 # =============================================================
@@ -54,6 +74,10 @@ __all__ = [
     "policy_service",
     # modules
     "rag_service",
+    # lifecycle
+    "warmup_models",
+    "preload_models",
+    "after_fork",
 ]
 
 # =============================================================
@@ -1,7 +1,205 @@
-import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+import time
+import threading
+from functools import lru_cache
+from typing import Iterator
 from app.utils.logger import logger
-from app.utils.constants import MODEL_NAME, MAX_TOKENS
+from app.utils.executor import inference_executor
+from app.utils.resources import resources
+from app.utils.precision import apply_precision
+from app.utils.devices import accelerator, placement_pending
+from app.utils.constants import (
+    MODEL_NAME,
+    MAX_TOKENS,
+    INFERENCE_PRECISION,
+    PREFIX_CACHE_ENABLED,
+    SYSTEM_PROMPT_PREFIX,
+)
+
+# torch / transformers are imported inside the functions that need them so
+# that importing this module (and therefore the app) stays fast.
+
+MODEL_UNAVAILABLE = "system error: model not available."
+GPU_OOM_MESSAGE = "unable to process request due to limited gpu memory."
+GENERATION_FAILED = "internal error occurred during text generation."
+# placeholder texts returned instead of a real continuation
+GENERATION_ERRORS = (MODEL_UNAVAILABLE, GPU_OOM_MESSAGE, GENERATION_FAILED)
+
+
+# =============================================================
+# 🔹 token streaming helpers
+# =============================================================
+@lru_cache(maxsize=1)
+def _stop_on_event_class():
+    """build the StoppingCriteria subclass on first use"""
+    import torch
+    from transformers import StoppingCriteria
+
+    class _StopOnEvent(StoppingCriteria):
+        """stops generation once the consumer of a stream goes away"""
+
+        def __init__(self, event: threading.Event):
+            self.event = event
+
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full(
+                (input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device
+            )
+
+    return _StopOnEvent
+
+
+def stream_generate(model, tokenizer, inputs, skip_prompt: bool = True, **generate_kwargs) -> Iterator[str]:
+    """
+    run model.generate() on the inference executor and return an iterator
+    of decoded text pieces as each token is produced. the decode is
+    admitted eagerly, so a saturated executor raises QueueFullError here
+    rather than mid-stream. closing the iterator aborts decoding.
+    """
+    import torch
+    from transformers import StoppingCriteriaList, TextIteratorStreamer
+
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=skip_prompt, skip_special_tokens=True)
+    stop = threading.Event()
+    stop_criteria = StoppingCriteriaList([_stop_on_event_class()(stop)])
+
+    def _worker():
+        try:
+            with torch.inference_mode():
+                model.generate(
+                    **inputs,
+                    streamer=streamer,
+                    stopping_criteria=stop_criteria,
+                    **generate_kwargs,
+                )
+        except Exception as e:
+            logger.error(f"❌ streaming generation failed: {e}")
+            streamer.end()
+
+    inference_executor.submit(_worker)
+    return _drain_stream(streamer, stop)
+
+
+def _drain_stream(streamer, stop: threading.Event) -> Iterator[str]:
+    try:
+        for piece in streamer:
+            if piece:
+                yield piece
+    finally:
+        stop.set()
+
+
+# =============================================================
+# 🔹 static prompt prefix kv cache
+# =============================================================
+class PrefixKVCache:
+    """
+    attention keys/values of static prompt prefixes, computed once per model.
+    every rag prompt opens with the same system block; its past_key_values
+    are handed to generate() so prefill only covers the per-request suffix.
+    """
+
+    def __init__(self, model, tokenizer, device: str, prefixes=(SYSTEM_PROMPT_PREFIX,)):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.device = device
+        # longest first so the most specific prefix wins
+        self.prefixes = tuple(sorted((p for p in prefixes if p), key=len, reverse=True))
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_tokens = 0
+
+    # ---------------------------------------------------------
+    def match(self, prompt: str) -> str | None:
+        """the cached prefix prompt starts with (None if there is none)"""
+        for prefix in self.prefixes:
+            if len(prompt) > len(prefix) and prompt.startswith(prefix):
+                return prefix
+        return None
+
+    def _build(self, prefix: str):
+        """run the prefix through the model once and keep its kv tensors"""
+        import torch
+
+        prefix_ids = self.tokenizer(prefix, return_tensors="pt")["input_ids"].to(self.device)
+        with torch.inference_mode():
+            past = self.model(input_ids=prefix_ids, use_cache=True).past_key_values
+        if hasattr(past, "to_legacy_cache"):
+            past = past.to_legacy_cache()
+        logger.info(f"🧠 cached kv for {prefix_ids.shape[1]}-token prompt prefix")
+        return prefix_ids, past
+
+    def _lookup(self, prefix: str):
+        """return (prefix_ids, past, built_now)"""
+        entry = self._entries.get(prefix)
+        if entry is not None:
+            return (*entry, False)
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is not None:
+                return (*entry, False)
+            entry = self._build(prefix)
+            self._entries[prefix] = entry
+            return (*entry, True)
+
+    # ---------------------------------------------------------
+    def prepare(self, prompts: list[str], prefix: str | None) -> dict | None:
+        """
+        generate() inputs for prompts that all start with prefix: the
+        cached prefix ids + left-padded suffixes, and the prefix kv
+        expanded (as views) to the batch. None when prefix is None.
+        """
+        if prefix is None:
+            with self._lock:
+                self.bypassed += len(prompts)
+            return None
+
+        import torch
+
+        prefix_ids, past, built_now = self._lookup(prefix)
+        batch, prefix_len = len(prompts), prefix_ids.shape[1]
+        suffix = self.tokenizer(
+            [p[len(prefix):] for p in prompts], return_tensors="pt", padding=True
+        ).to(self.device)
+
+        # suffix padding sits between prefix and suffix; the mask hides it and
+        # position ids (mask cumsum) continue straight on from the prefix
+        input_ids = torch.cat([prefix_ids.expand(batch, -1), suffix["input_ids"]], dim=1)
+        attention_mask = torch.cat(
+            [
+                torch.ones((batch, prefix_len), dtype=suffix["attention_mask"].dtype, device=self.device),
+                suffix["attention_mask"],
+            ],
+            dim=1,
+        )
+        # generate() concatenates new keys onto these, never writes into them
+        past_key_values = tuple(tuple(t.expand(batch, -1, -1, -1) for t in layer) for layer in past)
+
+        reused = batch - 1 if built_now else batch
+        with self._lock:
+            self.hits += reused
+            self.misses += batch - reused
+            self.saved_tokens += reused * prefix_len
+        return {"input_ids": input_ids, "attention_mask": attention_mask, "past_key_values": past_key_values}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """hit rate over every prompt seen by the generator"""
+        total = self.hits + self.misses + self.bypassed
+        return {
+            "prefixes": len(self.prefixes),
+            "cached": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "saved_tokens": self.saved_tokens,
+        }
 
 
 # =============================================================
@@ -13,41 +211,194 @@ class MaharagaModel:
     def __init__(self):
         """initialize tokenizer and model safely"""
         try:
+            from transformers import AutoTokenizer, AutoModelForCausalLM
+
             logger.info(f"🧠 loading maharaga model: {MODEL_NAME} ...")
             self.tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+            # left padding keeps every prompt flush against its new tokens in a batch
+            self.tokenizer.padding_side = "left"
+            if self.tokenizer.pad_token is None:
+                self.tokenizer.pad_token = self.tokenizer.eos_token
             self.model = AutoModelForCausalLM.from_pretrained(MODEL_NAME)
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.model.to(self.device)
+            self.model.eval()
             logger.info("✅ model loaded successfully")
         except Exception as e:
             logger.error(f"❌ model loading failed: {e}")
-            self.tokenizer, self.model, self.device = None, None, "cpu"
+            self.tokenizer, self.model = None, None
+        self.device, self.precision, self.prefix_cache = "cpu", None, None
+        self.loaded_at = time.time()
+
+        if placement_pending():
+            logger.info("⏳ gpu placement deferred to the workers (preforking master)")
+        else:
+            self.place(accelerator())
+
+    def place(self, device: str):
+        """move the weights to device, apply the inference precision, build the prefix cache"""
+        if self.model is None or (self.precision is not None and device == self.device):
+            return
+        try:
+            self.model.to(device)
+            self.device = device
+            self.model, self.precision = apply_precision(self.model, INFERENCE_PRECISION, device)
+            logger.info(f"✅ generator placed on {device} ({self.precision})")
+        except Exception as e:
+            logger.error(f"❌ generator placement on {device} failed: {e}")
+            return
+        self.prefix_cache = (
+            PrefixKVCache(self.model, self.tokenizer, self.device) if PREFIX_CACHE_ENABLED else None
+        )
+
+    @property
+    def version(self) -> str:
+        """identifies these exact weights (changes on reload / precision switch)"""
+        return f"{MODEL_NAME}:{self.precision}:{int(self.loaded_at)}"
+
+    # ---------------------------------------------------------
+    # tokenization (reuses the prefix kv cache when possible)
+    # ---------------------------------------------------------
+    def _encode(self, prompts: list[str], prefix: str | None = None) -> dict:
+        """generate() inputs for prompts sharing the same cached prefix (or none)"""
+        if self.prefix_cache is not None:
+            try:
+                inputs = self.prefix_cache.prepare(prompts, prefix)
+                if inputs is not None:
+                    return inputs
+            except Exception as e:
+                logger.warning(f"⚠️ prefix cache unusable, encoding full prompt: {e}")
+        return self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.device)
+
+    def _group_by_prefix(self, prompts: list[str]) -> dict:
+        """prompt indices keyed by their cached prefix (None = no shared prefix)"""
+        groups: dict = {}
+        for i, prompt in enumerate(prompts):
+            prefix = self.prefix_cache.match(prompt) if self.prefix_cache else None
+            groups.setdefault(prefix, []).append(i)
+        return groups
 
     # ---------------------------------------------------------
     # core generation function
     # ---------------------------------------------------------
     def generate_text(self, prompt: str) -> str:
         """generate a text continuation for the given prompt"""
+        return self.generate_batch([prompt])[0]
+
+    # ---------------------------------------------------------
+    # token streaming
+    # ---------------------------------------------------------
+    def stream_text(self, prompt: str) -> Iterator[str]:
+        """return an iterator over the continuation as tokens are decoded"""
+        if not self.model or not self.tokenizer:
+            logger.error("⚠️ model not initialized.")
+            return iter([MODEL_UNAVAILABLE])
+
+        prefix = self.prefix_cache.match(prompt) if self.prefix_cache else None
+        inputs = self._encode([prompt], prefix)
+        return stream_generate(
+            self.model,
+            self.tokenizer,
+            inputs,
+            max_new_tokens=MAX_TOKENS,
+            temperature=0.7,
+            top_p=0.9,
+            do_sample=True,
+            pad_token_id=self.tokenizer.pad_token_id,
+        )
+
+    # ---------------------------------------------------------
+    # batched generation (used by the micro-batcher)
+    # ---------------------------------------------------------
+    def generate_batch(self, prompts: list[str]) -> list[str]:
+        """generate continuations for several prompts in one left-padded forward pass"""
         if not self.model or not self.tokenizer:
             logger.error("⚠️ model not initialized.")
-            return "system error: model not available."
+            return [MODEL_UNAVAILABLE] * len(prompts)
+
+        import torch
 
         try:
-            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
+            # rag prompts (shared system prefix) and plain prompts run as separate batches
+            results: list = [None] * len(prompts)
+            for prefix, indices in self._group_by_prefix(prompts).items():
+                group = self._generate_group([prompts[i] for i in indices], prefix)
+                for i, text in zip(indices, group):
+                    results[i] = text
+            return results
+        except torch.cuda.OutOfMemoryError:
+            logger.error("❌ gpu memory overflow during generation.")
+            return [GPU_OOM_MESSAGE] * len(prompts)
+        except Exception as e:
+            logger.error(f"❌ text generation failed: {e}")
+            return [GENERATION_FAILED] * len(prompts)
+
+    def _generate_group(self, prompts: list[str], prefix: str | None) -> list[str]:
+        import torch
+
+        inputs = self._encode(prompts, prefix)
+        with torch.inference_mode():
             outputs = self.model.generate(
                 **inputs,
                 max_new_tokens=MAX_TOKENS,
                 temperature=0.7,
                 top_p=0.9,
                 do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id,
+                pad_token_id=self.tokenizer.pad_token_id,
             )
-            response = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-            cleaned = response[len(prompt):].strip() or response.strip()
-            return cleaned.lower()
-        except torch.cuda.OutOfMemoryError:
-            logger.error("❌ gpu memory overflow during generation.")
-            return "unable to process request due to limited gpu memory."
-        except Exception as e:
-            logger.error(f"❌ text generation failed: {e}")
-            return "internal error occurred during text generation."
+
+        # with left padding every row's prompt ends at the same column
+        prompt_len = inputs["input_ids"].shape[1]
+        results = []
+        for row in outputs:
+            continuation = self.tokenizer.decode(row[prompt_len:], skip_special_tokens=True).strip()
+            if not continuation:
+                continuation = self.tokenizer.decode(row, skip_special_tokens=True).strip()
+            results.append(continuation.lower())
+        return results
+
+
+# =============================================================
+# ⚙️ shared generator (one copy per process)
+# =============================================================
+resources.register(
+    "generator",
+    MaharagaModel,
+    f"causal lm for chat + rag ({MODEL_NAME}, {INFERENCE_PRECISION})",
+    post_fork=lambda model: model.place(accelerator()),
+)
+
+
+def get_generator() -> MaharagaModel:
+    """the process-wide MaharagaModel shared by every controller"""
+    return resources.get("generator")
+
+
+def _build_generator_tokenizer():
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(MODEL_NAME)
+
+
+# tokenizer alone, for prompt budgeting before (or without) loading the weights
+resources.register("generator_tokenizer", _build_generator_tokenizer, f"generator tokenizer ({MODEL_NAME})")
+
+
+def get_generator_tokenizer():
+    """the generator's tokenizer (the loaded model's own when available)"""
+    if resources.is_loaded("generator") and get_generator().tokenizer is not None:
+        return get_generator().tokenizer
+    return resources.get("generator_tokenizer")
+
+
+def generator_version() -> str | None:
+    """version of the loaded generator (None until it is loaded)"""
+    if not resources.is_loaded("generator"):
+        return None
+    return get_generator().version
+
+
+def prefix_cache_stats() -> dict | None:
+    """prefix kv cache counters (None until the generator is loaded)"""
+    if not resources.is_loaded("generator"):
+        return None
+    cache = get_generator().prefix_cache
+    return cache.stats() if cache is not None else None
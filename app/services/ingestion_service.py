@@ -0,0 +1,369 @@
+"""
+maharaga ingestion service
+--------------------------
+bulk loader for the knowledge base.
+
+    source (jsonl / csv / directory)
+      → documents → chunks
+      → large embedding batches
+      → parallel qdrant upserts (retried with backoff)
+
+every chunk carries its document's `domains` (intent tags, see
+intent_service.document_domains) for filtered retrieval and a `simhash`
+fingerprint for near-duplicate removal at query time. point ids are
+derived from (document id, chunk index), so re-running an
+ingestion overwrites instead of duplicating; chunks past a document's
+new chunk_count (left by a longer earlier version) are deleted once its
+batch is written. progress is written to a
+checkpoint file after every contiguous run of committed batches; a rerun
+with the same checkpoint skips the documents already stored.
+"""
+
+import os
+import csv
+import json
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.utils.logger import logger
+from app.utils.chunking import chunk_document, default_counter
+from app.utils.embeddings import encode_uncached
+from app.services.vector_service import vector_service
+from app.services.intent_service import document_domains
+from app.utils.simhash import simhash
+from app.utils.constants import (
+    INGEST_EMBED_BATCH,
+    INGEST_UPSERT_BATCH,
+    INGEST_WORKERS,
+    INGEST_MAX_RETRIES,
+)
+
+TEXT_SUFFIXES = (".txt", ".md")
+
+
+class IngestionError(RuntimeError):
+    """raised when a batch still fails after all retries"""
+
+
+# =============================================================
+# 🔹 document readers
+# =============================================================
+def _doc(record: Dict[str, Any], text_field: str, id_field: str, fallback_id: str) -> Optional[Dict[str, Any]]:
+    text = str(record.get(text_field) or "").strip()
+    if not text:
+        return None
+    doc_id = str(record.get(id_field) or fallback_id)
+    metadata = {k: v for k, v in record.items() if k not in (text_field, id_field) and v not in (None, "")}
+    return {"id": doc_id, "text": text, "metadata": metadata}
+
+
+def _read_jsonl(path: str, text_field: str, id_field: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ {path}:{line_no + 1} is not valid json; skipped.")
+                continue
+            doc = _doc(record, text_field, id_field, f"{os.path.basename(path)}:{line_no}")
+            if doc:
+                yield doc
+
+
+def _read_csv(path: str, text_field: str, id_field: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row_no, row in enumerate(csv.DictReader(f)):
+            doc = _doc(row, text_field, id_field, f"{os.path.basename(path)}:{row_no}")
+            if doc:
+                yield doc
+
+
+def _read_text(path: str, root: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        text = f.read().strip()
+    if text:
+        rel = os.path.relpath(path, root)
+        yield {"id": rel, "text": text, "metadata": {"source": rel}}
+
+
+def iter_documents(source: str, text_field: str = "text", id_field: str = "id") -> Iterator[Dict[str, Any]]:
+    """stream {id, text, metadata} dicts from a jsonl / csv file or a directory tree"""
+    if os.path.isdir(source):
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                if name.endswith(".jsonl"):
+                    yield from _read_jsonl(path, text_field, id_field)
+                elif name.endswith(".csv"):
+                    yield from _read_csv(path, text_field, id_field)
+                elif name.endswith(TEXT_SUFFIXES):
+                    yield from _read_text(path, source)
+    elif source.endswith(".jsonl"):
+        yield from _read_jsonl(source, text_field, id_field)
+    elif source.endswith(".csv"):
+        yield from _read_csv(source, text_field, id_field)
+    elif source.endswith(TEXT_SUFFIXES):
+        yield from _read_text(source, os.path.dirname(source))
+    else:
+        raise ValueError(f"unsupported ingestion source: {source}")
+
+
+# =============================================================
+# 🔹 checkpoint
+# =============================================================
+class Checkpoint:
+    """documents fully stored for a source; written atomically"""
+
+    def __init__(self, path: Optional[str], source: str):
+        self.path = path
+        self.source = os.path.abspath(source)
+        self.docs_done = 0
+        self.chunks_done = 0
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                if state.get("source") == self.source:
+                    self.docs_done = int(state.get("docs_done", 0))
+                    self.chunks_done = int(state.get("chunks_done", 0))
+            except Exception as e:
+                logger.warning(f"⚠️ ignoring unreadable checkpoint {path}: {e}")
+
+    def save(self, docs_done: int, chunks_done: int):
+        self.docs_done, self.chunks_done = docs_done, chunks_done
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"source": self.source, "docs_done": docs_done, "chunks_done": chunks_done, "updated_at": time.time()},
+                f,
+            )
+        os.replace(tmp, self.path)
+
+
+# =============================================================
+# 🧩 ingestion pipeline
+# =============================================================
+class IngestionPipeline:
+    """chunk → batch-embed → parallel upsert, resumable via a checkpoint."""
+
+    def __init__(
+        self,
+        embed_batch: int = INGEST_EMBED_BATCH,
+        upsert_batch: int = INGEST_UPSERT_BATCH,
+        workers: int = INGEST_WORKERS,
+        max_retries: int = INGEST_MAX_RETRIES,
+        checkpoint_path: Optional[str] = None,
+        progress_every: float = 5.0,
+    ):
+        self.embed_batch = max(1, int(embed_batch))
+        self.upsert_batch = max(1, int(upsert_batch))
+        self.workers = max(1, int(workers))
+        self.max_retries = max(1, int(max_retries))
+        self.checkpoint_path = checkpoint_path
+        self.progress_every = progress_every
+
+    # ---------------------------------------------------------
+    def _chunks(self, docs: Iterator[Dict[str, Any]], first_ordinal: int) -> Iterator[Dict[str, Any]]:
+        """flatten documents into chunk records tagged with their document ordinal"""
+        counter = default_counter()
+        for ordinal, doc in enumerate(docs, start=first_ordinal):
+            chunks = chunk_document(doc["id"], doc["text"], counter=counter)
+            domains = document_domains(doc["text"], doc["metadata"])
+            for chunk in chunks:
+                yield {
+                    "id": chunk["id"],
+                    "text": chunk["text"],
+                    "payload": {
+                        **doc["metadata"],
+                        "text": chunk["text"],
+                        "domains": domains,
+                        "simhash": simhash(chunk["text"]),
+                        "parent_id": chunk["parent_id"],
+                        "chunk_index": chunk["chunk_index"],
+                        "chunk_count": chunk["chunk_count"],
+                    },
+                    "ordinal": ordinal,
+                    "last": chunk["chunk_index"] == chunk["chunk_count"] - 1,
+                }
+
+    def _upsert(self, batch: List[Dict[str, Any]], vectors) -> int:
+        """one upsert (+ stale tail-chunk delete) with exponential backoff; returns the number of points"""
+        ids = [c["id"] for c in batch]
+        payloads = [c["payload"] for c in batch]
+        chunk_counts = {p["parent_id"]: p["chunk_count"] for p in payloads}
+        for attempt in range(self.max_retries):
+            try:
+                vector_service.upsert_batch(ids, vectors, payloads)
+                vector_service.drop_stale_chunks(chunk_counts)
+                return len(batch)
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    raise IngestionError(f"upsert of {len(batch)} points failed: {e}") from e
+                delay = min(30.0, 0.5 * 2 ** attempt)
+                logger.warning(f"⚠️ upsert failed ({e}); retry {attempt + 1}/{self.max_retries - 1} in {delay:.1f}s")
+                time.sleep(delay)
+        return 0
+
+    # ---------------------------------------------------------
+    def run(
+        self,
+        source: str,
+        text_field: str = "text",
+        id_field: str = "id",
+        restart: bool = False,
+        stop_event: Optional[threading.Event] = None,
+    ) -> dict:
+        """ingest source and return a report with docs/sec"""
+        checkpoint = Checkpoint(self.checkpoint_path, source)
+        if restart:
+            checkpoint.docs_done = checkpoint.chunks_done = 0
+        skip = checkpoint.docs_done
+        if skip:
+            logger.info(f"⏩ resuming {source}: skipping {skip} documents already stored")
+
+        docs = iter_documents(source, text_field, id_field)
+        for _ in range(skip):
+            if next(docs, None) is None:
+                break
+
+        start = time.time()
+        last_report = start
+        chunks_base = chunks_total = checkpoint.chunks_done
+        docs_total = skip
+        seq = 0
+        # batch seq → (ordinal of the last document fully inside batches <= seq, chunks)
+        batch_marks: Dict[int, tuple] = {}
+        finished: set = set()
+        committed_seq = -1
+
+        def advance_checkpoint():
+            nonlocal committed_seq
+            advanced = False
+            while committed_seq + 1 in finished:
+                committed_seq += 1
+                finished.discard(committed_seq)
+                advanced = True
+            if advanced:
+                done_docs, done_chunks = batch_marks.pop(committed_seq)
+                for old in [s for s in batch_marks if s < committed_seq]:
+                    batch_marks.pop(old)
+                checkpoint.save(done_docs, done_chunks)
+
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        pending: Dict[Any, int] = {}
+        last_complete_doc, complete_chunks = skip, chunks_total
+        try:
+            buffer: List[Dict[str, Any]] = []
+            chunk_iter = self._chunks(docs, skip)
+            exhausted = False
+            while not exhausted:
+                if stop_event is not None and stop_event.is_set():
+                    logger.warning("🛑 ingestion stopped on request.")
+                    break
+                buffer.clear()
+                for chunk in chunk_iter:
+                    buffer.append(chunk)
+                    if len(buffer) >= self.embed_batch:
+                        break
+                else:
+                    exhausted = True
+                if not buffer:
+                    break
+
+                vectors = encode_uncached([c["text"] for c in buffer], batch_size=min(self.embed_batch, 128))
+
+                for offset in range(0, len(buffer), self.upsert_batch):
+                    batch = buffer[offset:offset + self.upsert_batch]
+                    rows = vectors[offset:offset + self.upsert_batch]
+                    for c in batch:
+                        chunks_total += 1
+                        if c["last"]:
+                            last_complete_doc = c["ordinal"] + 1
+                            complete_chunks = chunks_total
+                    batch_marks[seq] = (last_complete_doc, complete_chunks)
+
+                    # bound in-flight upserts so memory stays flat on huge corpora
+                    while len(pending) >= self.workers * 2:
+                        done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                        for future in done:
+                            future.result()  # raises IngestionError after retries
+                            finished.add(pending.pop(future))
+                        advance_checkpoint()
+
+                    pending[pool.submit(self._upsert, list(batch), rows)] = seq
+                    seq += 1
+                docs_total = last_complete_doc
+
+                now = time.time()
+                if now - last_report >= self.progress_every:
+                    rate = (docs_total - skip) / (now - start)
+                    logger.info(f"📥 {docs_total} docs / {chunks_total} chunks ingested ({rate:.1f} docs/s)")
+                    last_report = now
+
+            for future in list(pending):
+                future.result()
+                finished.add(pending.pop(future))
+            advance_checkpoint()
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        elapsed = max(time.time() - start, 1e-9)
+        report = {
+            "status": "success",
+            "source": source,
+            "documents": docs_total - skip,
+            "chunks": chunks_total - chunks_base,
+            "resumed_from": skip,
+            "seconds": round(elapsed, 2),
+            "docs_per_sec": round((docs_total - skip) / elapsed, 2),
+            "chunks_per_sec": round((chunks_total - chunks_base) / elapsed, 2),
+        }
+        logger.info(
+            f"✅ ingested {report['documents']} docs ({report['chunks']} chunks) in {report['seconds']}s "
+            f"— {report['docs_per_sec']} docs/s"
+        )
+        return report
+
+
+# =============================================================
+# 🔹 background job (admin api)
+# =============================================================
+_job_lock = threading.Lock()
+_job: Dict[str, Any] = {"state": "idle"}
+
+
+def start_ingestion_job(source: str, checkpoint_path: Optional[str] = None, **options) -> dict:
+    """run one ingestion in a background thread; only one job at a time"""
+    if not os.path.exists(source):
+        return {"status": "error", "message": f"source not found: {source}"}
+    with _job_lock:
+        if _job.get("state") == "running":
+            return {"status": "error", "message": "an ingestion job is already running.", "job": dict(_job)}
+        _job.clear()
+        _job.update({"state": "running", "source": source, "started_at": time.time()})
+
+    def _work():
+        try:
+            report = IngestionPipeline(checkpoint_path=checkpoint_path).run(source, **options)
+            _job.update({"state": "finished", "report": report})
+        except Exception as e:
+            logger.error(f"❌ ingestion job failed: {e}")
+            _job.update({"state": "failed", "error": str(e)})
+        finally:
+            _job["finished_at"] = time.time()
+
+    threading.Thread(target=_work, name="ingestion-job", daemon=True).start()
+    return {"status": "success", "message": "ingestion started.", "job": dict(_job)}
+
+
+def ingestion_status() -> dict:
+    return {"status": "success", "job": dict(_job)}
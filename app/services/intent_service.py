@@ -1,3 +1,7 @@
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
 from app.utils.logger import logger
 
 # =============================================================
@@ -199,3 +203,40 @@ def detect_intent(query: str) -> str:
     except Exception as e:
         logger.error(f"❌ detect_intent failed: {e}")
         return "unknown"
+
+
+# =============================================================
+# 🏷️ document domains (payload tags for filtered retrieval)
+# =============================================================
+# whole-word patterns: documents are long, so substring hits ("ai" in
+# "said") would tag nearly everything
+_DOMAIN_PATTERNS = {
+    intent: re.compile(r"\b(?:" + "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True)) + r")\b")
+    for intent, keywords in INTENT_KEYWORDS.items()
+    if keywords
+}
+
+
+def detect_domains(text: str, limit: int = 3, min_share: float = 0.3) -> List[str]:
+    """
+    intents a document belongs to, strongest first: every intent whose
+    keyword hits reach min_share of the top intent's, at most `limit`.
+    """
+    text = (text or "").lower()
+    counts = Counter({intent: len(p.findall(text)) for intent, p in _DOMAIN_PATTERNS.items()})
+    ranked = [(intent, hits) for intent, hits in counts.most_common() if hits]
+    if not ranked:
+        return ["general"]
+    floor = max(1, ranked[0][1] * min_share)
+    return [intent for intent, hits in ranked[:limit] if hits >= floor]
+
+
+def document_domains(text: str, metadata: Dict[str, Any] | None = None) -> List[str]:
+    """explicit `domain` / `domains` metadata wins; otherwise keyword detection"""
+    metadata = metadata or {}
+    explicit = metadata.get("domains", metadata.get("domain"))
+    if isinstance(explicit, str) and explicit.strip():
+        return [d.strip().lower() for d in explicit.split(",") if d.strip()]
+    if isinstance(explicit, list) and explicit:
+        return [str(d).strip().lower() for d in explicit if str(d).strip()]
+    return detect_domains(text)
@@ -4,21 +4,19 @@ maharaga ml service
 handles model training, fine-tuning, and persistence (.pkl saving).
 automatically creates missing folders/files and integrates with
 maharaga's embedding + generation subsystems.
+
+a finished training run hot-swaps the served weights in its own process;
+every other worker notices the new checkpoint (mtime of metadata.pkl,
+written last by save_model) on its next request and swaps too.
 """
 
 import os
-import joblib
-import pandas as pd
-from datasets import Dataset
-from transformers import (
-    AutoTokenizer,
-    AutoModelForCausalLM,
-    Trainer,
-    TrainingArguments,
-)
+import threading
 from app.utils.logger import logger
 from app.utils.constants import MODEL_NAME
 from app.utils.embeddings import embedding_helper
+from app.services.generation_service import stream_generate
+from app.services.model_registry import model_registry, load_causal_lm
 
 # =============================================================
 # 🔹 constants and auto-path creation
@@ -31,12 +29,29 @@ TRAINED_METADATA_FILE = os.path.join(TRAINED_MODEL_DIR, "metadata.pkl")
 TRAINING_OUTPUT = os.path.join(ROOT_DIR, "training_output")
 LOG_DIR = os.path.join(ROOT_DIR, "logs")
 
+# registry key for the serving copy of the fine-tuned / base model
+ML_MODEL_KEY = "maharaga-ml"
+
 # ensure directories exist
 for folder in [MODEL_ROOT, TRAINED_MODEL_DIR, TRAINING_OUTPUT, LOG_DIR]:
     os.makedirs(folder, exist_ok=True)
 logger.info("📁 verified or created all required directories for maharaga ml service.")
 
 
+# =============================================================
+# 🔹 helpers
+# =============================================================
+def _release_when_done(pieces, lease):
+    """keep a registry lease alive for the lifetime of a token stream"""
+    try:
+        yield from pieces
+    finally:
+        close = getattr(pieces, "close", None)
+        if close:
+            close()
+        lease.release()
+
+
 # =============================================================
 # 🔹 maharaga ml service
 # =============================================================
@@ -45,27 +60,86 @@ class MaharagaMLService:
 
     def __init__(self):
         self.model_name = MODEL_NAME
+        # private trainable copy — only loaded for fine-tuning, never served
         self.model = None
         self.tokenizer = None
+        self._train_lock = threading.Lock()
+        # metadata.pkl mtime of the checkpoint this process serves (None = base model)
+        self._served_stamp = None
+        self._reload_lock = threading.Lock()
         logger.info(f"🧠 initializing maharaga ml service using base model: {self.model_name}")
-        self._load_or_initialize()
 
     # ---------------------------------------------------------
+    def _resolve_source(self) -> str:
+        """fine-tuned checkpoint if one exists; else the base transformer."""
+        if os.path.exists(os.path.join(TRAINED_MODEL_DIR, "config.json")):
+            return TRAINED_MODEL_DIR
+        return self.model_name
+
     def _load_or_initialize(self):
-        """load fine-tuned model if available; else load base transformer."""
+        """load a trainable copy of the fine-tuned or base model."""
         try:
-            if os.path.exists(os.path.join(TRAINED_MODEL_DIR, "config.json")):
-                self.model = AutoModelForCausalLM.from_pretrained(TRAINED_MODEL_DIR)
-                self.tokenizer = AutoTokenizer.from_pretrained(TRAINED_MODEL_DIR)
+            source = self._resolve_source()
+            self.model, self.tokenizer = load_causal_lm(source)
+            self.model.train()
+            if source == TRAINED_MODEL_DIR:
                 logger.info("✅ fine-tuned model loaded from disk.")
             else:
-                self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-                self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
                 logger.info("📦 base pretrained model loaded (no fine-tuned version found).")
         except Exception as e:
             logger.error(f"❌ model initialization failed: {e}")
             self.model, self.tokenizer = None, None
 
+    @staticmethod
+    def _checkpoint_stamp():
+        try:
+            return os.path.getmtime(TRAINED_METADATA_FILE)
+        except OSError:
+            return None
+
+    def _serving_source(self) -> str:
+        """source for the served model, reloading first if another worker saved a newer checkpoint"""
+        stamp = self._checkpoint_stamp()
+        if stamp != self._served_stamp:
+            with self._reload_lock:
+                if stamp != self._served_stamp:
+                    if model_registry.version(ML_MODEL_KEY):
+                        logger.info("🔁 newer fine-tuned checkpoint on disk; reloading serving model.")
+                        self.reload_serving_model()
+                    self._served_stamp = stamp  # also after a failed reload: don't retry every request
+        return self._resolve_source()
+
+    def warmup(self):
+        """load the served weights now instead of on the first request."""
+        try:
+            model_registry.get(ML_MODEL_KEY, self._serving_source())
+        except Exception as e:
+            logger.error(f"❌ serving model warmup failed: {e}")
+
+    def reload_serving_model(self) -> dict:
+        """hot-swap the served weights (in this process) to the current checkpoint on disk."""
+        try:
+            stamp = self._checkpoint_stamp()
+            entry = model_registry.swap(ML_MODEL_KEY, self._resolve_source())
+            self._served_stamp = stamp
+            return {"status": "success", "message": "serving model reloaded.", "model": entry.describe()}
+        except Exception as e:
+            logger.error(f"❌ serving model reload failed: {e}")
+            return {"status": "error", "message": str(e)}
+
+    def _publish(self, done: str) -> dict:
+        """save the trained weights and serve them (other workers follow via the checkpoint mtime)."""
+        saved = self.save_model()
+        if saved["status"] != "success":
+            return saved
+        reloaded = self.reload_serving_model()
+        if reloaded["status"] != "success":
+            return {
+                "status": "error",
+                "message": f"{done} and saved, but the serving reload failed: {reloaded['message']}",
+            }
+        return {"status": "success", "message": f"{done}, saved and now serving.", "model": reloaded["model"]}
+
     # ---------------------------------------------------------
     def _safe_create_file(self, path: str):
         """ensure file exists (empty if not)"""
@@ -80,6 +154,12 @@ class MaharagaMLService:
     # ---------------------------------------------------------
     def train_from_csv(self, csv_path: str, text_column: str = "text", epochs: int = 1):
         """fine-tunes model using csv file; auto-creates folder if missing."""
+        import pandas as pd
+        from datasets import Dataset
+        from transformers import Trainer, TrainingArguments
+
+        if not self._train_lock.acquire(blocking=False):
+            return {"status": "error", "message": "a training run is already in progress."}
         try:
             if not os.path.exists(csv_path):
                 logger.warning(f"⚠️ csv file not found at {csv_path}, creating placeholder.")
@@ -102,6 +182,10 @@ class MaharagaMLService:
             dataset = Dataset.from_dict({"text": texts})
             logger.info(f"📚 loaded {len(dataset)} samples from {csv_path}")
 
+            self._load_or_initialize()
+            if not self.model:
+                return {"status": "error", "message": "model could not be loaded for training."}
+
             def tokenize(batch):
                 return self.tokenizer(batch["text"], truncation=True, padding=True)
 
@@ -123,20 +207,31 @@ class MaharagaMLService:
             logger.info("⚙️ starting fine-tuning process...")
             trainer.train()
             logger.info("✅ fine-tuning completed successfully.")
-            self.save_model()
-            return {"status": "success", "message": "model fine-tuned and saved."}
+            return self._publish("model fine-tuned")
 
         except Exception as e:
             logger.error(f"❌ training failed: {e}")
             return {"status": "error", "message": str(e)}
+        finally:
+            self.model, self.tokenizer = None, None
+            self._train_lock.release()
 
     # ---------------------------------------------------------
     def train_from_text(self, texts: list[str], epochs: int = 1):
         """fine-tunes the model directly from a list of texts."""
+        from datasets import Dataset
+        from transformers import Trainer, TrainingArguments
+
+        if not self._train_lock.acquire(blocking=False):
+            return {"status": "error", "message": "a training run is already in progress."}
         try:
             if not texts or not isinstance(texts, list):
                 return {"status": "error", "message": "no valid text data provided."}
 
+            self._load_or_initialize()
+            if not self.model:
+                return {"status": "error", "message": "model could not be loaded for training."}
+
             dataset = Dataset.from_dict({"text": texts})
             def tokenize(batch):
                 return self.tokenizer(batch["text"], truncation=True, padding=True)
@@ -154,16 +249,20 @@ class MaharagaMLService:
             trainer = Trainer(model=self.model, args=training_args, train_dataset=dataset)
             logger.info("⚙️ fine-tuning with in-memory data...")
             trainer.train()
-            self.save_model()
             logger.info("✅ fine-tuning complete.")
-            return {"status": "success", "message": "in-memory fine-tuning completed."}
+            return self._publish("in-memory fine-tuning completed")
         except Exception as e:
             logger.error(f"❌ fine-tuning from text failed: {e}")
             return {"status": "error", "message": str(e)}
+        finally:
+            self.model, self.tokenizer = None, None
+            self._train_lock.release()
 
     # ---------------------------------------------------------
     def save_model(self):
         """save model weights, tokenizer, and metadata safely."""
+        import joblib
+
         try:
             os.makedirs(TRAINED_MODEL_DIR, exist_ok=True)
             self.model.save_pretrained(TRAINED_MODEL_DIR)
@@ -180,19 +279,41 @@ class MaharagaMLService:
     def generate_text(self, prompt: str, max_length: int = 150) -> str:
         """generate text safely using the fine-tuned or base model."""
         try:
-            if not self.model or not self.tokenizer:
-                self._load_or_initialize()
             if not prompt or not isinstance(prompt, str):
                 return "error: invalid prompt"
-            inputs = self.tokenizer(prompt, return_tensors="pt")
-            outputs = self.model.generate(**inputs, max_length=max_length)
-            text = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+            with model_registry.lease(ML_MODEL_KEY, self._serving_source()) as lm:
+                inputs = lm.tokenizer(prompt, return_tensors="pt")
+                outputs = lm.model.generate(
+                    **inputs, max_length=max_length, pad_token_id=lm.tokenizer.eos_token_id
+                )
+                text = lm.tokenizer.decode(outputs[0], skip_special_tokens=True)
             logger.info("🧩 text generated successfully.")
             return text.strip()
         except Exception as e:
             logger.error(f"❌ generation failed: {e}")
             return "error: generation failed"
 
+    # ---------------------------------------------------------
+    def stream_text(self, prompt: str, max_length: int = 150):
+        """return an iterator over generated text using the fine-tuned or base model."""
+        if not prompt or not isinstance(prompt, str):
+            return iter(["error: generation failed"])
+        lm = model_registry.acquire(ML_MODEL_KEY, self._serving_source())
+        try:
+            inputs = lm.tokenizer(prompt, return_tensors="pt")
+            pieces = stream_generate(
+                lm.model,
+                lm.tokenizer,
+                inputs,
+                skip_prompt=False,  # match generate_text(), which returns prompt + continuation
+                max_length=max_length,
+                pad_token_id=lm.tokenizer.eos_token_id,
+            )
+        except Exception:
+            lm.release()
+            raise
+        return _release_when_done(pieces, lm)
+
     # ---------------------------------------------------------
     def encode_text(self, text: str):
         """create embedding vector using sentence-transformer."""
@@ -203,3 +324,9 @@ class MaharagaMLService:
         except Exception as e:
             logger.error(f"❌ embedding generation failed: {e}")
             return None
+
+
+# =============================================================
+# ⚙️ global shared instance (weights live in the model registry)
+# =============================================================
+ml_service = MaharagaMLService()
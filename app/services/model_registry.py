@@ -0,0 +1,192 @@
+"""
+maharaga model registry
+-----------------------
+process-wide owner of loaded causal language models.
+
+models are loaded once per key and shared by every request. a key can
+be hot-swapped to a new checkpoint (e.g. a fresh fine-tune in
+models/trained) without a restart: new requests immediately get the new
+weights, and the old weights are released once the requests still
+holding a lease on them have finished.
+"""
+
+import gc
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from app.utils.logger import logger
+
+
+# =============================================================
+# 🔹 loader
+# =============================================================
+def load_causal_lm(source: str):
+    """load tokenizer + causal lm from a hub name or local directory"""
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(source)
+    model.eval()
+    return model, tokenizer
+
+
+# =============================================================
+# 🧩 loaded model handle
+# =============================================================
+class LoadedModel:
+    """one tokenizer + model pair with an in-flight lease counter"""
+
+    def __init__(self, key: str, source: str, model, tokenizer, version: int, load_seconds: float):
+        self.key = key
+        self.source = source
+        self.model = model
+        self.tokenizer = tokenizer
+        self.version = version
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+        self.retired = False
+        self._refs = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        return self._refs
+
+    def acquire(self) -> "LoadedModel":
+        with self._lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            drained = self.retired and self._refs <= 0
+        if drained:
+            self.free()
+
+    def free(self):
+        """drop references to the weights so they can be garbage collected"""
+        if self.model is None:
+            return
+        self.model, self.tokenizer = None, None
+        gc.collect()
+        logger.info(f"🧹 released weights for '{self.key}' v{self.version} ({self.source})")
+
+    def describe(self) -> dict:
+        return {
+            "key": self.key,
+            "source": self.source,
+            "version": self.version,
+            "in_flight": self._refs,
+            "load_seconds": round(self.load_seconds, 2),
+            "loaded_at": self.loaded_at,
+        }
+
+
+# =============================================================
+# 🗂️ model registry
+# =============================================================
+class ModelRegistry:
+    """hands out shared model instances keyed by name."""
+
+    def __init__(self, loader=load_causal_lm):
+        self._loader = loader
+        self._entries: Dict[str, LoadedModel] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+
+    # ---------------------------------------------------------
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _build(self, key: str, source: str) -> LoadedModel:
+        """load weights outside the registry lock so other keys stay usable"""
+        start = time.time()
+        logger.info(f"📦 loading model '{key}' from {source} ...")
+        model, tokenizer = self._loader(source)
+        with self._lock:
+            version = self._versions.get(key, 0) + 1
+            self._versions[key] = version
+        entry = LoadedModel(key, source, model, tokenizer, version, time.time() - start)
+        logger.info(f"✅ model '{key}' v{version} ready in {entry.load_seconds:.2f}s")
+        return entry
+
+    # ---------------------------------------------------------
+    def get(self, key: str, source: Optional[str] = None) -> LoadedModel:
+        """return the current entry for key, loading it from source on first use"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        if source is None:
+            raise KeyError(f"model '{key}' is not loaded and no source was given")
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._build(key, source)
+                with self._lock:
+                    self._entries[key] = entry
+        return entry
+
+    def acquire(self, key: str, source: Optional[str] = None) -> LoadedModel:
+        """lease the current model; callers must call .release() when done"""
+        while True:
+            entry = self.get(key, source).acquire()
+            if not entry.retired:
+                return entry
+            # lost a race with swap(); retry on the replacement
+            entry.release()
+
+    @contextmanager
+    def lease(self, key: str, source: Optional[str] = None) -> Iterator[LoadedModel]:
+        """context-managed acquire/release"""
+        entry = self.acquire(key, source)
+        try:
+            yield entry
+        finally:
+            entry.release()
+
+    # ---------------------------------------------------------
+    def swap(self, key: str, source: str) -> LoadedModel:
+        """
+        hot-swap key to a new checkpoint. in-flight requests keep the old
+        weights until they release them; new requests get the new ones.
+        """
+        with self._key_lock(key):
+            new_entry = self._build(key, source)
+            with self._lock:
+                old = self._entries.get(key)
+                self._entries[key] = new_entry
+        if old is not None:
+            old.retired = True
+            logger.info(f"🔁 model '{key}' swapped v{old.version} → v{new_entry.version}")
+            if old.in_flight <= 0:
+                old.free()
+        return new_entry
+
+    def unload(self, key: str):
+        """remove a model from the registry (freed once drained)"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+        if old is not None:
+            old.retired = True
+            if old.in_flight <= 0:
+                old.free()
+
+    def version(self, key: str) -> int:
+        """monotonic version counter for key (0 if never loaded)"""
+        return self._versions.get(key, 0)
+
+    def stats(self) -> dict:
+        return {key: entry.describe() for key, entry in list(self._entries.items())}
+
+
+# =============================================================
+# ⚙️ global shared instance
+# =============================================================
+model_registry = ModelRegistry()
@@ -1,6 +1,28 @@
+import re
 from app.utils.logger import logger
 from app.utils.constants import POLICY_RULES
 
+# words replaced by moderate_tone()
+TONE_MAP = {
+    "angry": "concerned",
+    "furious": "firm",
+    "stupid": "uninformed",
+    "hate": "dislike",
+    "kill": "stop",
+    "wrong": "incorrect",
+    "argument": "discussion",
+    "fight": "disagreement",
+}
+
+
+# whole words only ("whatever" keeps its "hat", "skills" its "kill")
+_TONE_RE = re.compile(r"\b(" + "|".join(map(re.escape, TONE_MAP)) + r")\b")
+
+
+def _word_patterns(terms: list[str]) -> list[tuple]:
+    # anchored at the word start, open at the end: inflections still match
+    return [(t, re.compile(rf"\b{re.escape(t)}\w*")) for t in terms]
+
 
 # =============================================================
 # ⚖️ maharaga policy & safety engine
@@ -14,10 +36,14 @@ class PolicyService:
             self.min_age = self.rules.get("min_age_access", 25)
             self.restricted = [r.lower() for r in self.rules.get("restricted_terms", [])]
             self.sensitive = [s.lower() for s in self.rules.get("sensitive_topics", [])]
+            # stem matching for the scans ("killing" is "kill", "skill" is not)
+            self._restricted_re = _word_patterns(self.restricted)
+            self._sensitive_re = _word_patterns(self.sensitive)
             logger.info("✅ policy service initialized successfully")
         except Exception as e:
             logger.error(f"❌ failed to initialize policy service: {e}")
             self.rules, self.restricted, self.sensitive, self.min_age = {}, [], [], 25
+            self._restricted_re, self._sensitive_re = [], []
 
     # ---------------------------------------------------------
     def check_age_restriction(self, user_age: int) -> bool:
@@ -33,7 +59,7 @@ class PolicyService:
         """detect direct restricted keywords in text"""
         try:
             t = text.lower()
-            return list({kw for kw in self.restricted if kw in t})
+            return list({kw for kw, pattern in self._restricted_re if pattern.search(t)})
         except Exception as e:
             logger.error(f"❌ scan_restricted failed: {e}")
             return []
@@ -43,7 +69,7 @@ class PolicyService:
         """detect topics that need caution"""
         try:
             t = text.lower()
-            return list({kw for kw in self.sensitive if kw in t})
+            return list({kw for kw, pattern in self._sensitive_re if pattern.search(t)})
         except Exception as e:
             logger.error(f"❌ scan_sensitive failed: {e}")
             return []
@@ -120,25 +146,76 @@ class PolicyService:
     def moderate_tone(self, response: str) -> str:
         """ensures calm, respectful tone in AI output"""
         try:
-            tone_map = {
-                "angry": "concerned",
-                "furious": "firm",
-                "stupid": "uninformed",
-                "hate": "dislike",
-                "kill": "stop",
-                "wrong": "incorrect",
-                "argument": "discussion",
-                "fight": "disagreement",
-            }
-            text = response.lower()
-            for word, replacement in tone_map.items():
-                text = text.replace(word, replacement)
+            text = _TONE_RE.sub(lambda m: TONE_MAP[m.group(1)], response.lower())
             return text.strip()
         except Exception as e:
             logger.error(f"❌ moderate_tone failed: {e}")
             return response.strip()
 
 
+    # ---------------------------------------------------------
+    def postprocess(self, text: str) -> str:
+        """full output pipeline: lowercase → mask restricted terms → soften tone"""
+        return self.moderate_tone(self.sanitize_output((text or "").lower()))
+
+    # ---------------------------------------------------------
+    def stream_filter(self) -> "StreamingPolicyFilter":
+        """create an incremental post-processor for one token stream"""
+        return StreamingPolicyFilter(self)
+
+
+# =============================================================
+# 🌊 incremental policy filter for token streams
+# =============================================================
+class StreamingPolicyFilter:
+    """
+    applies PolicyService.postprocess() to a growing token stream.
+
+    the filter re-runs over the accumulated text and only releases the
+    part that can no longer change: the trailing words are held back
+    until the longest restricted phrase could have been completed.
+    """
+
+    _WORD = re.compile(r"\S+")
+
+    def __init__(self, service: PolicyService):
+        self.service = service
+        self.raw = ""
+        self.emitted = 0
+        phrases = service.restricted + list(TONE_MAP)
+        self.hold_words = max((len(p.split()) for p in phrases), default=1)
+
+    def _stable_cut(self, out: str) -> int:
+        """index in `out` before which no future token can alter the text"""
+        starts = [m.start() for m in self._WORD.finditer(out)]
+        if len(starts) <= self.hold_words:
+            return 0
+        return starts[-self.hold_words]
+
+    def feed(self, piece: str) -> str:
+        """add a decoded piece; returns newly releasable output (may be empty)"""
+        self.raw += piece
+        out = self.service.postprocess(self.raw)
+        cut = self._stable_cut(out)
+        if cut <= self.emitted:
+            return ""
+        released = out[self.emitted:cut]
+        self.emitted = cut
+        return released
+
+    def finish(self) -> str:
+        """flush whatever is still held back once the stream ends"""
+        out = self.service.postprocess(self.raw)
+        released = out[self.emitted:]
+        self.emitted = len(out)
+        return released
+
+    @property
+    def text(self) -> str:
+        """full post-processed text seen so far"""
+        return self.service.postprocess(self.raw)
+
+
 # =============================================================
 # ⚙️ global instance + functional helpers
 # =============================================================
@@ -1,17 +1,46 @@
 """
 rag_service — retrieval-augmented generation utility
 handles context retrieval, prompt assembly, and fallback logic
+
+retrieval is hybrid: dense (MiniLM / qdrant) and lexical (bm25) searches
+run in parallel and are fused with reciprocal rank fusion; with
+RERANK_ENABLED the fused candidates are reranked by a cross-encoder
+within a per-request time budget. per-stage timings are returned with
+every assembled prompt and aggregated for /admin/metrics.
 """
 
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional
 from app.utils.logger import logger
+from app.utils.chunking import merge_chunks
+from app.utils.context_packing import ContextPacker
+from app.utils.simhash import drop_near_duplicates
 from app.services.vector_service import vector_service
+from app.services.rerank_service import rerank_service
+from app.services.generation_service import get_generator_tokenizer
 from app.utils.constants import (
     RAG_TOP_K,
     CONTEXT_SEPARATOR,
-    MAX_CONTEXT_CHARS,
-    MAX_PROMPT_CHARS,
-    SYSTEM_INSTRUCTIONS,
+    MAX_TOKENS,
+    GENERATOR_CONTEXT_TOKENS,
+    CONTEXT_TOKEN_MARGIN,
+    QUESTION_MAX_TOKENS,
+    CONTEXT_TOKEN_CACHE_SIZE,
+    SYSTEM_PROMPT_PREFIX,
+    HYBRID_CANDIDATES,
+    RRF_K,
+    INFERENCE_WORKERS,
+    NEAR_DUP_FILTER_ENABLED,
+)
+
+# lexical searches run here while the calling thread does the dense search
+_lexical_pool = ThreadPoolExecutor(max_workers=max(2, INFERENCE_WORKERS), thread_name_prefix="lexical")
+# packs retrieved passages into the generator's window (generator tokens, cached per chunk)
+context_packer = ContextPacker(
+    get_generator_tokenizer, window=GENERATOR_CONTEXT_TOKENS, cache_size=CONTEXT_TOKEN_CACHE_SIZE
 )
 
 
@@ -31,92 +60,243 @@ def _sanitize_text(text: str) -> str:
         return text or ""
 
 
-def _dedup_texts(items: List[str]) -> List[str]:
-    """remove duplicates and near-identical lines"""
-    seen, cleaned = set(), []
-    for t in items:
-        s = _sanitize_text(t)
-        if s and s not in seen:
-            seen.add(s)
-            cleaned.append(s)
-    return cleaned
-
-
-def _truncate_block(text: str, limit: int) -> str:
-    """truncate long blocks gracefully while preserving structure"""
-    if not text:
-        return ""
-    if len(text) <= limit:
-        return text
-    trimmed = text[: limit - 3].rstrip() + "..."
-    return trimmed
+def _dedup_passages(docs: List[Dict]) -> List[tuple]:
+    """(clean text, score) per distinct passage, keeping the best score of duplicates"""
+    best: Dict[str, float] = {}
+    for d in docs:
+        s = _sanitize_text(d.get("text", ""))
+        if s:
+            best[s] = max(best.get(s, float("-inf")), d.get("score") or 0.0)
+    return list(best.items())
 
 
 # =============================================================
 # 🔹 context builder
 # =============================================================
+def _render_prompt(question: str, context: str) -> str:
+    return (
+        f"{SYSTEM_PROMPT_PREFIX}"
+        f"<<context>>\n{context}\n"
+        f"{CONTEXT_SEPARATOR}"
+        f"<<question>> {question}\n"
+        f"<<answer>> respond precisely using only the context above. "
+        f"if the context is missing or insufficient, say 'insufficient context'."
+    )
+
+
 def build_contextual_prompt(query: str, context_docs: Optional[List[Dict]] = None) -> str:
     """
     build a fully structured prompt for the generation model.
     includes:
       • system behavior instructions
-      • joined, deduped contextual docs
-      • explicit question / answer cues
+      • deduped contextual docs (simhash near-duplicates dropped,
+        adjacent chunks of one document merged back into a single
+        passage), highest-scoring first, packed into the generator's
+        token window with room left for the answer
+      • explicit question / answer cues (the question cut to
+        QUESTION_MAX_TOKENS, so the scaffold always fits)
     """
     try:
-        q = _sanitize_text(query)
-        contexts = [(_sanitize_text(d.get("text", "")) or "") for d in (context_docs or [])]
-        contexts = _dedup_texts([c for c in contexts if c])
-
-        joined_context = CONTEXT_SEPARATOR.join(contexts)
-        joined_context = _truncate_block(joined_context, MAX_CONTEXT_CHARS)
-
-        prompt = (
-            f"<<system>> {SYSTEM_INSTRUCTIONS.lower().strip()}\n"
-            f"<<context>>\n{joined_context}\n"
-            f"{CONTEXT_SEPARATOR}"
-            f"<<question>> {q.lower()}\n"
-            f"<<answer>> respond precisely using only the context above. "
-            f"if the context is missing or insufficient, say 'insufficient context'."
-        )
+        q = _sanitize_text(query).lower()
+        docs = context_docs or []
+        if NEAR_DUP_FILTER_ENABLED:
+            docs = drop_near_duplicates(docs)
+        passages = _dedup_passages(merge_chunks(docs))
+
+        # room for question + context once the answer and the fixed scaffold are reserved
+        room = context_packer.window - MAX_TOKENS - context_packer.count(_render_prompt("", "")) - CONTEXT_TOKEN_MARGIN
+        question_tokens = context_packer.count(q)
+        if question_tokens > min(QUESTION_MAX_TOKENS, max(0, room)):
+            q = context_packer.truncate(q, min(QUESTION_MAX_TOKENS, max(0, room)))
+            logger.info(f"✂️ question cut from {question_tokens} tokens to fit the prompt")
+            question_tokens = context_packer.count(q)
+        budget = room - question_tokens
+        if budget <= 0 and passages:
+            logger.warning(f"⚠️ no room for context: {room} tokens left for question + context")
+        contexts, info = context_packer.pack(passages, max(0, budget), separator=CONTEXT_SEPARATOR)
+        if info["dropped"] or info["truncated"]:
+            logger.info(f"📦 context packed: {info} (budget {budget} tokens)")
 
-        prompt = _truncate_block(prompt, MAX_PROMPT_CHARS)
-        return prompt
+        return _render_prompt(q, CONTEXT_SEPARATOR.join(contexts))
 
     except Exception as e:
         logger.error(f"❌ build_contextual_prompt failed: {e}")
         return (
-            f"<<system>> {SYSTEM_INSTRUCTIONS.lower().strip()}\n"
+            f"{SYSTEM_PROMPT_PREFIX}"
             f"<<question>> {_sanitize_text(query)}\n"
             f"<<answer>>"
         )
 
 
+# =============================================================
+# 🔹 stage timings
+# =============================================================
+class StageTimings:
+    """rolling per-stage latency samples (ms) for the retrieval pipeline"""
+
+    def __init__(self, window: int = 512):
+        self._samples: Dict[str, deque] = {}
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record(self, timings: Dict[str, float]):
+        with self._lock:
+            for stage, ms in timings.items():
+                self._samples.setdefault(stage, deque(maxlen=self._window)).append(ms)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self._samples.items()}
+        return {
+            stage: {
+                "count": len(values),
+                "avg_ms": round(sum(values) / len(values), 2),
+                "p50_ms": round(values[len(values) // 2], 2),
+                "p95_ms": round(values[int(0.95 * (len(values) - 1))], 2),
+            }
+            for stage, values in snapshot.items()
+            if values
+        }
+
+
+retrieval_timings = StageTimings()
+
+
+def _ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+# =============================================================
+# 🔹 hybrid retrieval
+# =============================================================
+def reciprocal_rank_fusion(rankings: Dict[str, List[Dict]], k: int = RRF_K) -> List[Dict]:
+    """
+    fuse ranked result lists: score(d) = Σ 1 / (k + rank). documents are
+    matched by point id; each fused doc records which retrievers found it.
+    """
+    fused: Dict[str, Dict] = {}
+    for source, docs in rankings.items():
+        for rank, doc in enumerate(docs, start=1):
+            key = doc.get("id") or doc.get("text", "")
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = dict(doc, score=0.0, sources=[])
+            entry["score"] += 1.0 / (k + rank)
+            entry["sources"].append(source)
+    ranked = sorted(fused.values(), key=lambda d: d["score"], reverse=True)
+    for doc in ranked:
+        doc["score"] = round(doc["score"], 5)
+    return ranked
+
+
+class RetrievalCancelled(Exception):
+    """the caller no longer needs this retrieval (query blocked / answered from cache)"""
+
+
+def _check_cancel(cancel: Optional[threading.Event]):
+    if cancel is not None and cancel.is_set():
+        raise RetrievalCancelled()
+
+
+def hybrid_retrieve(
+    query: str,
+    k: Optional[int] = None,
+    cancel: Optional[threading.Event] = None,
+    vector=None,
+):
+    """
+    dense + lexical retrieval in parallel, rrf-fused, optionally reranked → (docs, timings).
+    `vector` is the query embedding, when the caller already has it.
+    raises RetrievalCancelled between stages once `cancel` is set.
+    """
+    k = k or RAG_TOP_K
+    deadline = rerank_service.deadline()
+    fetch = rerank_service.fetch_size(k)
+    candidates = max(fetch, HYBRID_CANDIDATES)
+    domains = vector_service.query_domains(query)  # same filter for both retrievers
+    timings: Dict[str, float] = {}
+
+    def _lexical():
+        start = time.perf_counter()
+        docs = vector_service.search_lexical(query, limit=candidates, domains=domains)
+        return docs, _ms(start)
+
+    pending = _lexical_pool.submit(_lexical) if vector_service.lexical is not None else None
+
+    start = time.perf_counter()
+    dense = vector_service.search_similar(query, limit=candidates, domains=domains, vector=vector) or []
+    timings["dense_ms"] = _ms(start)
+
+    lexical = []
+    if pending is not None:
+        wait_start = time.perf_counter()
+        lexical, timings["lexical_ms"] = pending.result()
+        timings["lexical_wait_ms"] = _ms(wait_start)  # time not hidden behind the dense search
+
+    _check_cancel(cancel)
+    start = time.perf_counter()
+    fused = reciprocal_rank_fusion({"dense": dense, "lexical": lexical}) if lexical else dense
+    if NEAR_DUP_FILTER_ENABLED:
+        # before the cut, so redundant copies do not take top-k slots
+        fused = drop_near_duplicates(fused)
+    fused = fused[:fetch]
+    timings["fusion_ms"] = _ms(start)
+
+    if not rerank_service.enabled:
+        return fused[:k], timings
+    _check_cancel(cancel)
+    start = time.perf_counter()
+    reranked, outcome = rerank_service.rerank(query, fused, k, deadline=deadline)
+    timings["rerank_ms"] = _ms(start)
+    if outcome not in ("reranked", "trimmed", "probed"):
+        logger.info(f"⏭️ rerank {outcome} ({len(fused)} candidates)")
+    return reranked, timings
+
+
 # =============================================================
 # 🔹 rag pipeline: retrieve + assemble + return
 # =============================================================
-def assemble_rag_prompt(query: str, intent: Optional[str] = None, k: Optional[int] = None) -> dict:
+def assemble_rag_prompt(
+    query: str,
+    k: Optional[int] = None,
+    cancel: Optional[threading.Event] = None,
+    vector=None,
+) -> dict:
     """
-    1️⃣ retrieves top-k semantic matches
+    1️⃣ retrieves top-k dense + lexical matches (within the query's domains), rrf-fused
     2️⃣ builds contextual prompt
-    3️⃣ returns structured payload (prompt + docs)
+    3️⃣ returns structured payload (prompt + docs + per-stage timings)
+    setting `cancel` stops the work at the next stage boundary (status "cancelled").
+    a precomputed query `vector` skips embedding the query again.
     """
     try:
-        k = k or RAG_TOP_K
+        total = time.perf_counter()
         if not vector_service:
             raise RuntimeError("vector service unavailable")
 
-        retrieved = vector_service.search_similar(query, limit=k) or []
+        _check_cancel(cancel)
+        retrieved, timings = hybrid_retrieve(query, k=k, cancel=cancel, vector=vector)
+        _check_cancel(cancel)
+
+        start = time.perf_counter()
         prompt = build_contextual_prompt(query, retrieved)
+        timings["prompt_ms"] = _ms(start)
+        timings["total_ms"] = _ms(total)
+        retrieval_timings.record(timings)
+        logger.info(f"⏱️ rag stages: {timings}")
 
         return {
             "status": "success",
             "prompt": prompt,
             "context_docs": retrieved,
             "count": len(retrieved),
+            "timings": timings,
             "message": "contextual prompt assembled successfully.",
         }
 
+    except RetrievalCancelled:
+        logger.info("🛑 rag retrieval cancelled by caller.")
+        return {"status": "cancelled", "prompt": "", "context_docs": [], "count": 0, "timings": {}}
     except Exception as e:
         logger.error(f"❌ assemble_rag_prompt failed: {e}")
         return {
@@ -124,6 +304,7 @@ def assemble_rag_prompt(query: str, intent: Optional[str] = None, k: Optional[in
             "prompt": build_contextual_prompt(query, []),
             "context_docs": [],
             "count": 0,
+            "timings": {},
             "message": "failed to assemble rag prompt.",
         }
 
@@ -131,7 +312,7 @@ def assemble_rag_prompt(query: str, intent: Optional[str] = None, k: Optional[in
 # =============================================================
 # 🔹 simplified retrieval for external modules
 # =============================================================
-def get_context_only(query: str, intent: Optional[str] = None, k: Optional[int] = None) -> List[Dict]:
+def get_context_only(query: str, k: Optional[int] = None) -> List[Dict]:
     """quick helper for controllers that only need retrieved docs"""
     try:
         k = k or RAG_TOP_K
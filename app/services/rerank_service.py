@@ -0,0 +1,222 @@
+"""
+maharaga reranker
+-----------------
+second retrieval stage: the first stage (dense + bm25) over-fetches
+RERANK_CANDIDATES passages cheaply, a small cross-encoder scores every
+(query, passage) pair in one batched forward pass, and the best
+RAG_TOP_K are kept.
+
+reranking is the most expensive part of retrieval, so it is guarded:
+  • skipped while the inference executor is backed up (RERANK_MAX_PENDING)
+  • fitted into the request's time budget (RERANK_BUDGET_MS) using a
+    running estimate of the cost per call and per pair — candidates are
+    trimmed from the tail, or reranking is skipped when not even top-k
+    would fit
+skipped requests keep the first-stage order. the model is warmed up when
+it loads (that pass is not measured), and every RERANK_PROBE_EVERY budget
+skips one top-k rerank runs anyway, so an estimate from a slow spell
+cannot disable reranking for good.
+"""
+
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.logger import logger
+from app.utils.resources import resources
+from app.utils.devices import load_device, place_on_accelerator
+from app.utils.executor import inference_executor
+from app.utils.constants import (
+    RERANK_ENABLED,
+    RERANK_MODEL,
+    RERANK_CANDIDATES,
+    RERANK_MAX_LENGTH,
+    RERANK_BUDGET_MS,
+    RERANK_MAX_PENDING,
+    RERANK_PROBE_EVERY,
+)
+
+# weight of the newest call in the running cost estimate
+_EMA_ALPHA = 0.2
+
+
+def _warm(model):
+    """one throwaway forward pass (lazy init, kernel selection) outside the cost model"""
+    model.predict([("warmup", "warmup")], show_progress_bar=False)
+    return model
+
+
+def _build_reranker():
+    """import sentence-transformers only when the cross-encoder is needed"""
+    from sentence_transformers import CrossEncoder
+
+    return _warm(CrossEncoder(RERANK_MODEL, max_length=RERANK_MAX_LENGTH, device=load_device()))
+
+
+def _after_fork(model):
+    """worker side: move to the gpu, then warm up again there"""
+    place_on_accelerator(model)
+    _warm(model)
+
+
+if RERANK_ENABLED:
+    # registered only when enabled, so warmup does not load an unused model
+    resources.register(
+        "reranker",
+        _build_reranker,
+        f"cross-encoder reranker ({RERANK_MODEL})",
+        post_fork=_after_fork,
+    )
+
+
+# =============================================================
+# 🧩 rerank service
+# =============================================================
+class RerankService:
+    """budgeted cross-encoder reranking of first-stage candidates."""
+
+    def __init__(self, enabled: bool, candidates: int, budget_ms: float, max_pending: int, probe_every: int):
+        self.enabled = enabled
+        self.candidates = max(1, candidates)
+        self.budget_ms = budget_ms
+        self.max_pending = max_pending
+        self.probe_every = max(1, probe_every)
+        # running estimate of one forward pass: fixed overhead + cost per pair,
+        # fitted to moving averages of (pairs, ms, pairs², pairs·ms)
+        self._overhead_ms: Optional[float] = None
+        self._pair_ms: Optional[float] = None
+        self._moments: Optional[List[float]] = None
+        self._budget_skips = 0
+        self._lock = threading.Lock()
+        self._counts = {
+            "reranked": 0, "trimmed": 0, "probed": 0, "skipped_load": 0, "skipped_budget": 0, "failed": 0
+        }
+
+    # ---------------------------------------------------------
+    def fetch_size(self, k: int) -> int:
+        """how many first-stage candidates to retrieve for a final top-k"""
+        return max(k, self.candidates) if self.enabled else k
+
+    def deadline(self) -> float:
+        """perf_counter() time by which a request started now must finish retrieval"""
+        return time.perf_counter() + self.budget_ms / 1000
+
+    def _estimate_ms(self, pairs: int) -> float:
+        if self._pair_ms is None:
+            return 0.0  # no measurement yet — let the first call through
+        return self._overhead_ms + self._pair_ms * pairs
+
+    def _observe(self, pairs: int, elapsed_ms: float):
+        """update the cost model: least-squares line through exponentially weighted calls"""
+        sample = [pairs, elapsed_ms, pairs * pairs, pairs * elapsed_ms]
+        with self._lock:
+            if self._moments is None or elapsed_ms < 0.5 * self._estimate_ms(pairs):
+                # first call, or far faster than predicted: the history is from a slower spell
+                self._moments = sample
+            else:
+                self._moments = [(1 - _EMA_ALPHA) * m + _EMA_ALPHA * s for m, s in zip(self._moments, sample)]
+            n, ms, nn, nms = self._moments
+            variance = nn - n * n
+            if variance > 1e-6:
+                # calls of different sizes separate the per-call overhead from the per-pair cost
+                pair_ms = max(0.0, (nms - n * ms) / variance)
+            else:
+                pair_ms = 0.8 * ms / n
+            self._pair_ms, self._overhead_ms = pair_ms, max(0.0, ms - pair_ms * n)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    # ---------------------------------------------------------
+    def rerank(
+        self, query: str, docs: List[Dict[str, Any]], k: int, deadline: Optional[float] = None
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        best k of docs by cross-encoder score → (docs, outcome). deadline is a
+        time.perf_counter() value the rerank must finish by. outcome is one
+        of: disabled, reranked, trimmed, probed (ran over budget to re-measure),
+        skipped_load, skipped_budget, failed.
+        """
+        if not self.enabled or len(docs) <= 1:
+            return docs[:k], "disabled"
+
+        if inference_executor.stats()["pending"] > self.max_pending:
+            self._count("skipped_load")
+            return docs[:k], "skipped_load"
+
+        candidates, probe = docs, False
+        if deadline is not None:
+            remaining_ms = (deadline - time.perf_counter()) * 1000
+            n = len(candidates)
+            while n > k and self._estimate_ms(n) > remaining_ms:
+                n -= 1
+            if self._estimate_ms(n) > remaining_ms:
+                with self._lock:
+                    self._budget_skips += 1
+                    probe = self._budget_skips >= self.probe_every
+                    if probe:
+                        self._budget_skips = 0
+                if not probe:
+                    self._count("skipped_budget")
+                    return docs[:k], "skipped_budget"
+            else:
+                with self._lock:
+                    self._budget_skips = 0
+            candidates = candidates[:n]
+
+        model = resources.try_get("reranker")
+        if model is None:
+            self._count("failed")
+            return docs[:k], "failed"
+
+        try:
+            start = time.perf_counter()
+            scores = model.predict(
+                [(query, doc.get("text", "")) for doc in candidates],
+                batch_size=len(candidates),  # one forward pass
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+            self._observe(len(candidates), (time.perf_counter() - start) * 1000)
+        except Exception as e:
+            logger.error(f"❌ rerank failed: {e}")
+            self._count("failed")
+            return docs[:k], "failed"
+
+        ranked = sorted(
+            (dict(doc, retrieval_score=doc.get("score"), score=round(float(s), 4)) for doc, s in zip(candidates, scores)),
+            key=lambda d: d["score"],
+            reverse=True,
+        )
+        if probe:
+            outcome = "probed"
+        else:
+            outcome = "trimmed" if len(candidates) < len(docs) else "reranked"
+        self._count(outcome)
+        return ranked[:k], outcome
+
+    # ---------------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "model": RERANK_MODEL if self.enabled else None,
+                "candidates": self.candidates,
+                "budget_ms": self.budget_ms,
+                "est_ms_per_pair": round(self._pair_ms, 3) if self._pair_ms is not None else None,
+                "est_overhead_ms": round(self._overhead_ms, 3) if self._overhead_ms is not None else None,
+                **self._counts,
+            }
+
+
+# =============================================================
+# 🔹 singleton instance
+# =============================================================
+rerank_service = RerankService(
+    RERANK_ENABLED,
+    candidates=RERANK_CANDIDATES,
+    budget_ms=RERANK_BUDGET_MS,
+    max_pending=RERANK_MAX_PENDING,
+    probe_every=RERANK_PROBE_EVERY,
+)
@@ -1,17 +1,94 @@
 """
 VectorService — semantic vector storage, retrieval, and management
 for the MAHARAGA RAG engine.
+
+QDRANT_COLLECTION is an alias. the physical collection behind it is named
+after the embedding schema it was built for:
+
+    maharaga_knowledge_base → maharaga_knowledge_base__<fingerprint>_<created>
+
+where the fingerprint hashes (embedding model, dimension, distance). all
+reads and writes go through the alias, so reindex() can fill a new
+collection for a different embedding model and swap the alias atomically.
+
+with VECTOR_BACKEND=local the same api is served by an embedded
+LocalVectorIndex instead (single node, tests). with qdrant, a local
+snapshot (snapshot_local_index()) answers searches while qdrant is down.
+
+every write is mirrored into a bm25 lexical index (search_lexical()),
+which rag_service fuses with the dense results.
 """
 
+import os
 import time
+import hashlib
+import threading
 import numpy as np
 from typing import List, Dict, Any
 from qdrant_client import QdrantClient
 from qdrant_client.http import models as qmodels
-from sentence_transformers import SentenceTransformer
 
 from app.utils.logger import logger
-from app.utils.constants import QDRANT_URL, QDRANT_COLLECTION, EMBEDDING_MODEL
+from app.utils.chunking import chunk_document
+from app.utils.simhash import simhash
+from app.services.intent_service import detect_domains, document_domains
+from app.utils.embeddings import embed_one, encode_uncached, get_embedder
+from app.utils.local_index import LocalVectorIndex
+from app.utils.bm25_index import BM25Index
+from app.services.rerank_service import rerank_service
+from app.utils.vector_quantization import quantization_config, search_params, stored_mode
+from app.utils.constants import (
+    QDRANT_URL,
+    QDRANT_COLLECTION,
+    EMBEDDING_MODEL,
+    INGEST_EMBED_BATCH,
+    VECTOR_BACKEND,
+    LOCAL_INDEX_DIR,
+    LOCAL_INDEX_FALLBACK,
+    LOCAL_INDEX_HNSW,
+    QDRANT_QUANTIZATION,
+    QDRANT_VECTORS_ON_DISK,
+    DOMAIN_FILTER_ENABLED,
+    DOMAIN_FILTER_MIN_HITS,
+    LEXICAL_INDEX_ENABLED,
+    LEXICAL_INDEX_DIR,
+    KB_VERSION_FILE,
+    RAG_TOP_K,
+)
+
+# keyword payload fields with an index (filtered search, stale-chunk deletes)
+PAYLOAD_INDEX_FIELDS = ("domains", "parent_id")
+# detected domains that do not narrow retrieval
+UNFILTERED_DOMAINS = ("general",)
+
+# sentence-transformers similarity function → qdrant distance
+_DISTANCES = {
+    "cosine": qmodels.Distance.COSINE,
+    "dot": qmodels.Distance.DOT,
+    "euclidean": qmodels.Distance.EUCLID,
+    "manhattan": qmodels.Distance.MANHATTAN,
+}
+
+
+# =============================================================
+# 🔹 collection schema
+# =============================================================
+def collection_schema(model) -> Dict[str, Any]:
+    """vector size / distance / fingerprint the given embedder needs"""
+    dim = int(model.get_sentence_embedding_dimension())
+    similarity = str(getattr(model, "similarity_fn_name", None) or "cosine")
+    distance = _DISTANCES.get(similarity, qmodels.Distance.COSINE)
+    # the onnx export of a model shares its vector space, so only the model
+    # name (not the runtime backend) goes into the fingerprint
+    fingerprint = hashlib.sha1(f"{EMBEDDING_MODEL}|{dim}|{distance.value}".encode()).hexdigest()[:10]
+    return {"model": EMBEDDING_MODEL, "dim": dim, "distance": distance, "fingerprint": fingerprint}
+
+
+def fingerprint_of(collection_name: str) -> str | None:
+    """fingerprint encoded in a physical collection name (None for legacy names)"""
+    if "__" not in collection_name:
+        return None
+    return collection_name.rsplit("__", 1)[1].rsplit("_", 1)[0]
 
 
 # =============================================================
@@ -20,122 +97,553 @@ from app.utils.constants import QDRANT_URL, QDRANT_COLLECTION, EMBEDDING_MODEL
 class VectorService:
     """Handles vector embeddings, storage, and retrieval for semantic search."""
 
+    # seconds to wait before retrying a failed connection
+    RETRY_COOLDOWN = 30.0
+
     def __init__(self):
-        """Initialize Qdrant and the embedding model safely"""
+        """cheap constructor — qdrant and the embedder are attached on first use"""
         self.qdrant = None
         self.model = None
+        self.backend = VECTOR_BACKEND
+        self.local = (
+            LocalVectorIndex(LOCAL_INDEX_DIR, use_hnsw=LOCAL_INDEX_HNSW, indexed_fields=PAYLOAD_INDEX_FIELDS)
+            if VECTOR_BACKEND == "local" or LOCAL_INDEX_FALLBACK
+            else None
+        )
+        self.lexical = BM25Index(LEXICAL_INDEX_DIR) if LEXICAL_INDEX_ENABLED else None
+        # qdrant is skipped (local snapshot serves) until this time after a failed search
+        self._qdrant_down_until = 0.0
+        self._ready = False
+        self._last_attempt = 0.0
+        self._init_lock = threading.Lock()
+        # schema of the current embedder and the physical collection behind the alias
+        self.schema = None
+        self.collection = None
+        self.schema_ok = False
+
+    # ---------------------------------------------------------
+    @property
+    def local_primary(self) -> bool:
+        return self.backend == "local"
+
+    @property
+    def kb_version(self) -> str:
+        """stamp of the last knowledge-base write by any process (keys the response cache)"""
+        try:
+            with open(KB_VERSION_FILE, "r", encoding="utf-8") as f:
+                return f.read().strip() or "0"
+        except OSError:
+            return "0"
+
+    def _touch_kb(self):
+        """stamp a knowledge-base change so every worker's cached rag answers go stale"""
+        try:
+            os.makedirs(os.path.dirname(KB_VERSION_FILE) or ".", exist_ok=True)
+            tmp = f"{KB_VERSION_FILE}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(f"{time.time_ns()}-{os.getpid()}")
+            os.replace(tmp, KB_VERSION_FILE)
+        except OSError as e:
+            logger.warning(f"⚠️ could not stamp the knowledge-base version: {e}")
+
+    def ensure_ready(self) -> bool:
+        """connect qdrant + resolve the shared embedder once (retried after a cooldown)"""
+        if self._ready:
+            return True
+        with self._init_lock:
+            if self._ready:
+                return True
+            if self._last_attempt and time.time() - self._last_attempt < self.RETRY_COOLDOWN:
+                return False
+            self._last_attempt = time.time()
+            self._connect()
+        return self._ready
+
+    def _connect(self):
+        """Initialize Qdrant and the embedding model safely"""
         start_time = time.time()
 
         try:
             logger.info("🧠 initializing vector service...")
-            self.model = SentenceTransformer(EMBEDDING_MODEL)
+            self.model = get_embedder()  # shared with EmbeddingHelper
+            self.schema = collection_schema(self.model)
             logger.info(f"✅ embedding model loaded: {EMBEDDING_MODEL}")
+        except Exception as e:
+            logger.error(f"❌ failed to initialize vector service: {e}")
+            self.model = None
+            return
 
-            self.qdrant = QdrantClient(url=QDRANT_URL, timeout=5.0)
-            logger.info(f"📡 connected to qdrant at {QDRANT_URL}")
-
-            self._ensure_collection()
+        try:
+            if self.local_primary:
+                self._ensure_local_index()
+            else:
+                self.qdrant = QdrantClient(url=QDRANT_URL, timeout=5.0)
+                logger.info(f"📡 connected to qdrant at {QDRANT_URL}")
+                self._ensure_collection()
             elapsed = round(time.time() - start_time, 2)
-            logger.info(f"⚙️ vector service ready in {elapsed}s")
+            logger.info(f"⚙️ vector service ready in {elapsed}s ({self.backend} backend)")
+            self._ready = True
 
         except Exception as e:
+            # the embedder stays loaded so the local snapshot can still serve searches
             logger.error(f"❌ failed to initialize vector service: {e}")
-            self.qdrant, self.model = None, None
+            self.qdrant = None
+
+    def _ensure_local_index(self):
+        """create the embedded index for the current schema, or check the existing one"""
+        self.local.create(self.schema["dim"], self.schema["distance"].value, self.schema["fingerprint"])
+        self.collection = LOCAL_INDEX_DIR
+        self.schema_ok = self._check_local_schema()
+        logger.info(f"💾 local vector index at {LOCAL_INDEX_DIR} ({len(self.local)} points)")
+
+    def _check_local_schema(self) -> bool:
+        info = self.local.info()
+        if not info["exists"]:
+            return False
+        if info["dim"] != self.schema["dim"] or info["fingerprint"] != self.schema["fingerprint"]:
+            logger.warning(
+                f"⚠️ local vector index was built for another embedding schema "
+                f"({info['dim']}-dim, {info['fingerprint']}) — run `python reindex.py`."
+            )
+            return False
+        return True
 
     # ---------------------------------------------------------
     def _ensure_collection(self):
-        """Ensure collection exists, or create one if missing."""
+        """resolve the alias, creating a collection sized for the embedder if none exists."""
         try:
-            collections = self.qdrant.get_collections().collections
-            existing = [c.name for c in collections]
-
-            if QDRANT_COLLECTION not in existing:
-                logger.info(f"📦 creating new collection: {QDRANT_COLLECTION}")
+            target = self._alias_target()
 
-                # Detect embedding dimension dynamically
-                sample_vec = np.random.rand(768).astype(np.float32)
-                self.qdrant.recreate_collection(
-                    collection_name=QDRANT_COLLECTION,
-                    vectors_config=qmodels.VectorParams(
-                        size=len(sample_vec),
-                        distance=qmodels.Distance.COSINE
-                    ),
+            if target is None and self.qdrant.collection_exists(QDRANT_COLLECTION):
+                # legacy layout: a plain collection under the alias name
+                target = QDRANT_COLLECTION
+                logger.warning(
+                    f"⚠️ '{QDRANT_COLLECTION}' is a plain collection, not an alias — "
+                    f"run `python reindex.py` to migrate it."
                 )
-                logger.info("✅ qdrant collection created successfully.")
+
+            if target is None:
+                target = self._create_collection(self.schema)
+                self._point_alias(target)
+                logger.info(f"✅ qdrant collection created: {QDRANT_COLLECTION} → {target}")
             else:
-                logger.info(f"📁 existing collection found: {QDRANT_COLLECTION}")
+                logger.info(f"📁 existing collection found: {QDRANT_COLLECTION} → {target}")
+
+            self.collection = target
+            self.schema_ok = self._check_schema(target)
+            self._ensure_payload_indexes(target)
         except Exception as e:
             logger.error(f"❌ collection check/create failed: {e}")
 
+    def _alias_target(self) -> str | None:
+        for alias in self.qdrant.get_aliases().aliases:
+            if alias.alias_name == QDRANT_COLLECTION:
+                return alias.collection_name
+        return None
+
+    def _create_collection(self, schema: Dict[str, Any]) -> str:
+        """new physical collection for the given schema; returns its name"""
+        name = f"{QDRANT_COLLECTION}__{schema['fingerprint']}_{int(time.time() * 1000)}"
+        self.qdrant.create_collection(
+            collection_name=name,
+            vectors_config=qmodels.VectorParams(
+                size=schema["dim"], distance=schema["distance"], on_disk=QDRANT_VECTORS_ON_DISK or None
+            ),
+            quantization_config=quantization_config(),
+        )
+        self._ensure_payload_indexes(name)
+        logger.info(f"📦 created {name} ({schema['dim']}-dim, quantization={QDRANT_QUANTIZATION})")
+        return name
+
+    def _ensure_payload_indexes(self, name: str):
+        """keyword indexes on the filtered payload fields (created once per collection)"""
+        existing = self.qdrant.get_collection(name).payload_schema or {}
+        for field in PAYLOAD_INDEX_FIELDS:
+            if field not in existing:
+                self.qdrant.create_payload_index(
+                    collection_name=name,
+                    field_name=field,
+                    field_schema=qmodels.PayloadSchemaType.KEYWORD,
+                    wait=True,
+                )
+                logger.info(f"🏷️ payload index created on {name}.{field}")
+
+    def _point_alias(self, target: str):
+        """(re)point QDRANT_COLLECTION at target in one atomic alias update"""
+        operations = []
+        if self._alias_target() is not None:
+            operations.append(qmodels.DeleteAliasOperation(delete_alias=qmodels.DeleteAlias(alias_name=QDRANT_COLLECTION)))
+        operations.append(
+            qmodels.CreateAliasOperation(
+                create_alias=qmodels.CreateAlias(collection_name=target, alias_name=QDRANT_COLLECTION)
+            )
+        )
+        self.qdrant.update_collection_aliases(change_aliases_operations=operations)
+
+    def _check_schema(self, name: str) -> bool:
+        """compare the stored collection against the configured embedder"""
+        config = self.qdrant.get_collection(name).config
+        params = config.params.vectors
+        quantization = stored_mode(config.quantization_config)
+        if quantization != QDRANT_QUANTIZATION:
+            logger.warning(
+                f"⚠️ collection {name} uses quantization={quantization}, configured {QDRANT_QUANTIZATION} — "
+                f"run `python reindex.py` to rebuild it with the new storage."
+            )
+        if isinstance(params, dict):
+            logger.warning(f"⚠️ collection {name} uses named vectors — schema not checked.")
+            return True
+        if params.size != self.schema["dim"] or params.distance != self.schema["distance"]:
+            logger.error(
+                f"❌ collection {name} holds {params.size}-dim {params.distance.value} vectors but "
+                f"{EMBEDDING_MODEL} produces {self.schema['dim']}-dim {self.schema['distance'].value} — "
+                f"run `python reindex.py`."
+            )
+            return False
+        stored = fingerprint_of(name)
+        if stored is not None and stored != self.schema["fingerprint"]:
+            logger.warning(
+                f"⚠️ collection {name} was built with a different embedding model "
+                f"(fingerprint {stored} ≠ {self.schema['fingerprint']}) — run `python reindex.py`."
+            )
+            return False
+        return True
+
     # ---------------------------------------------------------
-    def embed_text(self, text: str) -> List[float] | None:
-        """Generate normalized embedding vector."""
+    def collection_info(self) -> Dict[str, Any]:
+        """alias target, schema, and point count"""
+        if not self.ensure_ready() or not (self.qdrant or self.local_primary):
+            return {"status": "error", "message": "qdrant not connected."}
         try:
+            points = len(self.local) if self.local_primary else self.qdrant.count(QDRANT_COLLECTION, exact=False).count
+            return {
+                "status": "success",
+                "backend": self.backend,
+                "alias": QDRANT_COLLECTION,
+                "collection": self.collection,
+                "points": points,
+                "schema": {**self.schema, "distance": self.schema["distance"].value},
+                "schema_ok": self.schema_ok,
+                "quantization": "none" if self.local_primary else QDRANT_QUANTIZATION,
+                "local_index": self.local.info() if self.local is not None else None,
+            }
+        except Exception as e:
+            logger.error(f"❌ collection_info failed: {e}")
+            return {"status": "error", "message": str(e)}
+
+    # ---------------------------------------------------------
+    def reindex(self, batch_size: int = INGEST_EMBED_BATCH, drop_old: bool = False) -> Dict[str, Any]:
+        """
+        blue/green reindex: re-embed every stored chunk text with the
+        configured embedder into a new collection, then swap the alias.
+        the old collection keeps serving until the swap and is kept for
+        rollback unless drop_old. pause ingestion while this runs — writes
+        that land in the old collection after its scroll are not copied.
+        """
+        if self.local_primary:
+            return self._reindex_local(batch_size)
+        if not self.ensure_ready() or not self.qdrant:
+            raise RuntimeError("qdrant not connected")
+
+        start = time.time()
+        source, schema = self.collection, collection_schema(self.model)
+        target = self._create_collection(schema)
+        logger.info(f"🔁 reindexing {source} → {target} with {schema['model']} ({schema['dim']}-dim)")
+
+        copied = skipped = 0
+        offset = None
+        while True:
+            points, offset = self.qdrant.scroll(
+                collection_name=source, limit=batch_size, offset=offset, with_payload=True, with_vectors=False
+            )
+            keep = [p for p in points if p.payload and p.payload.get("text")]
+            skipped += len(points) - len(keep)
+            for p in keep:
+                p.payload.setdefault("domains", detect_domains(p.payload["text"]))
+                p.payload.setdefault("simhash", simhash(p.payload["text"]))
+            if keep:
+                vectors = encode_uncached([p.payload["text"] for p in keep], batch_size=batch_size)
+                self.upsert_batch([p.id for p in keep], vectors, [p.payload for p in keep], collection=target)
+                copied += len(keep)
+                logger.info(f"🔁 {copied} points re-embedded")
+            if offset is None:
+                break
+
+        if source == QDRANT_COLLECTION:
+            # a plain collection holds the alias name; it has to go before the alias can exist
+            logger.warning(f"⚠️ dropping legacy collection {source} — searches fail until the alias is created.")
+            self.qdrant.delete_collection(source)
+        self._point_alias(target)
+        self.collection, self.schema, self.schema_ok = target, schema, True
+        self._touch_kb()
+
+        if drop_old and source != QDRANT_COLLECTION:
+            self.qdrant.delete_collection(source)
+
+        report = {
+            "status": "success",
+            "alias": QDRANT_COLLECTION,
+            "previous": source if not drop_old and source != QDRANT_COLLECTION else None,
+            "collection": target,
+            "points": copied,
+            "skipped_without_text": skipped,
+            "seconds": round(time.time() - start, 2),
+        }
+        logger.info(f"✅ alias {QDRANT_COLLECTION} now points at {target} ({copied} points)")
+        return report
+
+    def _reindex_local(self, batch_size: int) -> Dict[str, Any]:
+        """rebuild the embedded index with the configured embedder and swap it in"""
+        if not self.ensure_ready():
+            raise RuntimeError("embedding model not initialized")
+        start, schema = time.time(), collection_schema(self.model)
+
+        def _batches():
+            for ids, _, payloads in self.local.iter_batches(batch_size):
+                keep = [(i, p) for i, p in zip(ids, payloads) if p.get("text")]
+                for _, p in keep:
+                    p.setdefault("domains", detect_domains(p["text"]))
+                    p.setdefault("simhash", simhash(p["text"]))
+                if keep:
+                    vectors = encode_uncached([p["text"] for _, p in keep], batch_size=batch_size)
+                    yield [i for i, _ in keep], vectors, [p for _, p in keep]
+
+        copied = self.local.replace_from(_batches(), schema["dim"], schema["distance"].value, schema["fingerprint"])
+        self.schema, self.schema_ok = schema, True
+        self._touch_kb()
+        return {
+            "status": "success",
+            "backend": "local",
+            "collection": LOCAL_INDEX_DIR,
+            "points": copied,
+            "seconds": round(time.time() - start, 2),
+        }
+
+    # ---------------------------------------------------------
+    def snapshot_local_index(self, batch_size: int = INGEST_EMBED_BATCH) -> Dict[str, Any]:
+        """mirror the qdrant collection (vectors + payloads) into the local fallback index"""
+        if self.local is None or self.local_primary:
+            return {"status": "error", "message": "local snapshot needs VECTOR_BACKEND=qdrant and LOCAL_INDEX_FALLBACK."}
+        if not self.ensure_ready() or not self.qdrant:
+            return {"status": "error", "message": "qdrant not connected."}
+        try:
+            start = time.time()
+
+            def _batches():
+                offset = None
+                while True:
+                    points, offset = self.qdrant.scroll(
+                        collection_name=QDRANT_COLLECTION,
+                        limit=batch_size,
+                        offset=offset,
+                        with_payload=True,
+                        with_vectors=True,
+                    )
+                    if points:
+                        yield [p.id for p in points], [p.vector for p in points], [p.payload or {} for p in points]
+                    if offset is None:
+                        break
+
+            count = self.local.replace_from(
+                _batches(), self.schema["dim"], self.schema["distance"].value, self.schema["fingerprint"]
+            )
+            return {"status": "success", "points": count, "seconds": round(time.time() - start, 2)}
+        except Exception as e:
+            logger.error(f"❌ snapshot_local_index failed: {e}")
+            return {"status": "error", "message": str(e)}
+
+    # ---------------------------------------------------------
+    def embed_text(self, text: str) -> np.ndarray | None:
+        """Generate normalized embedding vector (float32, coalesced with concurrent calls)."""
+        try:
+            self.ensure_ready()
             if not self.model:
                 raise ValueError("embedding model not initialized")
 
-            vector = self.model.encode(text, convert_to_numpy=True, normalize_embeddings=True)
-            return vector.tolist()
+            return embed_one(text)
         except Exception as e:
             logger.error(f"❌ embedding failed: {e}")
             return None
 
     # ---------------------------------------------------------
     def add_document(self, doc_id: str, text: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Add a document with an embedding to Qdrant."""
-        if not self.qdrant:
+        """Chunk a document, embed the chunks, and store them in Qdrant."""
+        self.ensure_ready()
+        if not self.qdrant and not self.local_primary:
             logger.warning("⚠️ qdrant not available — document not stored.")
             return {"status": "warning", "message": "qdrant not connected."}
 
         try:
-            vector = self.embed_text(text)
-            if not vector:
-                return {"status": "error", "message": "embedding failed."}
-
-            payload = metadata or {}
-            payload["text"] = text
-
-            self.qdrant.upsert(
-                collection_name=QDRANT_COLLECTION,
-                points=[
-                    qmodels.PointStruct(
-                        id=doc_id,
-                        vector=vector,
-                        payload=payload
-                    )
-                ],
-            )
-            logger.info(f"📥 vector document added id={doc_id}")
-            return {"status": "success", "message": "document embedded successfully."}
+            chunks = chunk_document(str(doc_id), text)
+            if not chunks:
+                return {"status": "error", "message": "document is empty."}
+
+            vectors = encode_uncached([c["text"] for c in chunks])
+            domains = document_domains(text, metadata)
+            payloads = [
+                {
+                    **(metadata or {}),
+                    "text": c["text"],
+                    "domains": domains,
+                    "simhash": simhash(c["text"]),
+                    "parent_id": c["parent_id"],
+                    "chunk_index": c["chunk_index"],
+                    "chunk_count": c["chunk_count"],
+                }
+                for c in chunks
+            ]
+            self.upsert_batch([c["id"] for c in chunks], vectors, payloads)
+            self.drop_stale_chunks({str(doc_id): len(chunks)})
+            logger.info(f"📥 vector document added id={doc_id} ({len(chunks)} chunks)")
+            return {"status": "success", "message": "document embedded successfully.", "chunks": len(chunks)}
         except Exception as e:
             logger.error(f"❌ add_document failed: {e}")
             return {"status": "error", "message": str(e)}
 
+    def drop_stale_chunks(self, chunk_counts: Dict[str, int]):
+        """remove chunks left over from longer earlier versions of documents ({parent_id: chunk_count})"""
+        if not chunk_counts:
+            return
+        stale = lambda p: (p.get("chunk_index") or 0) >= chunk_counts.get(p.get("parent_id"), float("inf"))  # noqa: E731
+        if self.lexical is not None:
+            self.lexical.delete_where(stale)
+        if self.local_primary:
+            self.local.delete_where(stale)
+        else:
+            # one filtered delete per distinct chunk count
+            by_count: Dict[int, List[str]] = {}
+            for parent_id, count in chunk_counts.items():
+                by_count.setdefault(count, []).append(parent_id)
+            for count, parent_ids in by_count.items():
+                self.qdrant.delete(
+                    collection_name=QDRANT_COLLECTION,
+                    points_selector=qmodels.FilterSelector(
+                        filter=qmodels.Filter(
+                            must=[
+                                qmodels.FieldCondition(key="parent_id", match=qmodels.MatchAny(any=parent_ids)),
+                                qmodels.FieldCondition(key="chunk_index", range=qmodels.Range(gte=count)),
+                            ]
+                        )
+                    ),
+                )
+        self._touch_kb()
+
     # ---------------------------------------------------------
-    def search_similar(self, query: str, limit: int = 3) -> List[Dict[str, Any]]:
-        """Retrieve semantically similar items from Qdrant."""
-        if not self.qdrant:
+    def upsert_batch(
+        self,
+        ids: List[Any],
+        vectors: np.ndarray,
+        payloads: List[Dict[str, Any]],
+        collection: str = QDRANT_COLLECTION,
+    ):
+        """
+        write many points in one request on the shared client. raises on
+        failure so bulk callers can retry.
+        """
+        if self.local_primary:
+            if not self.ensure_ready():
+                raise RuntimeError("vector service not ready")
+            self.local.upsert(list(ids), vectors, list(payloads))
+            self._index_lexical(ids, payloads)
+            self._touch_kb()
+            return
+        if not self.ensure_ready() or not self.qdrant:
+            raise RuntimeError("qdrant not connected")
+        self.qdrant.upsert(
+            collection_name=collection,
+            points=qmodels.Batch(
+                ids=list(ids),
+                # float32 matrix → wire format in one pass
+                vectors=np.asarray(vectors, dtype=np.float32).tolist(),
+                payloads=list(payloads),
+            ),
+            wait=True,
+        )
+        if collection == QDRANT_COLLECTION:
+            self._index_lexical(ids, payloads)
+        self._touch_kb()
+
+    def _index_lexical(self, ids: List[Any], payloads: List[Dict[str, Any]]):
+        if self.lexical is None:
+            return
+        try:
+            self.lexical.add([str(i) for i in ids], list(payloads))
+        except Exception as e:
+            # dense storage succeeded; rebuild_lexical_index() repairs the gap
+            logger.warning(f"⚠️ lexical index update failed: {e}")
+
+    def rebuild_lexical_index(self, batch_size: int = INGEST_EMBED_BATCH) -> Dict[str, Any]:
+        """rebuild (and compact) the bm25 index from the stored payloads"""
+        if self.lexical is None:
+            return {"status": "error", "message": "lexical index disabled (LEXICAL_INDEX_ENABLED=false)."}
+        if not self.ensure_ready() or not (self.qdrant or self.local_primary):
+            return {"status": "error", "message": "vector store not connected."}
+        try:
+            start = time.time()
+
+            def _batches():
+                if self.local_primary:
+                    for ids, _, payloads in self.local.iter_batches(batch_size):
+                        yield [str(i) for i in ids], payloads
+                    return
+                offset = None
+                while True:
+                    points, offset = self.qdrant.scroll(
+                        collection_name=QDRANT_COLLECTION, limit=batch_size, offset=offset, with_payload=True
+                    )
+                    if points:
+                        yield [str(p.id) for p in points], [p.payload or {} for p in points]
+                    if offset is None:
+                        break
+
+            count = self.lexical.rebuild(_batches())
+            return {"status": "success", "chunks": count, "seconds": round(time.time() - start, 2)}
+        except Exception as e:
+            logger.error(f"❌ rebuild_lexical_index failed: {e}")
+            return {"status": "error", "message": str(e)}
+
+    # ---------------------------------------------------------
+    def query_domains(self, query: str) -> List[str]:
+        """
+        domains to restrict a query to — detected with the same whole-word
+        classifier (detect_domains) that tags documents. [] = unfiltered.
+        """
+        if not DOMAIN_FILTER_ENABLED:
+            return []
+        domains = detect_domains(query)
+        return [] if set(domains) <= set(UNFILTERED_DOMAINS) else domains
+
+    def search_similar(
+        self,
+        query: str,
+        limit: int = 3,
+        domains: List[str] | None = None,
+        vector: np.ndarray | None = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Retrieve semantically similar items from Qdrant (or the local index).
+        only documents tagged with one of the query's domains are searched
+        (domains=None → query_domains(query), [] → unfiltered); too few hits
+        are topped up from the whole collection. pass `vector` when the
+        query is already embedded.
+        """
+        self.ensure_ready()
+        if not self.qdrant and self.local is None:
             logger.warning("⚠️ qdrant unavailable, returning empty search results.")
             return []
 
         try:
-            vector = self.embed_text(query)
-            if not vector:
+            if vector is None:
+                vector = self.embed_text(query)
+            if vector is None:
                 return []
 
-            results = self.qdrant.search(
-                collection_name=QDRANT_COLLECTION,
-                query_vector=vector,
-                limit=limit,
-            )
-
             formatted = [
-                {
-                    "text": r.payload.get("text", ""),
-                    "score": round(float(r.score), 4),
-                }
-                for r in results
-                if r.payload
+                self._format(point_id, score, payload)
+                for point_id, score, payload in self._filtered_query(
+                    vector, limit, self.query_domains(query) if domains is None else domains
+                )
+                if payload
             ]
 
             logger.info(f"🔎 {len(formatted)} results found for semantic query.")
@@ -144,21 +652,109 @@ class VectorService:
             logger.error(f"❌ search_similar failed: {e}")
             return []
 
+    @staticmethod
+    def _format(point_id, score: float, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": str(point_id),
+            "text": payload.get("text", ""),
+            "score": round(float(score), 4),
+            # lets callers merge neighbouring chunks of one document
+            "parent_id": payload.get("parent_id"),
+            "chunk_index": payload.get("chunk_index"),
+            # near-duplicate fingerprint (see app.utils.simhash)
+            "simhash": payload.get("simhash"),
+        }
+
+    # ---------------------------------------------------------
+    def search_lexical(
+        self, query: str, limit: int = 10, domains: List[str] | None = None
+    ) -> List[Dict[str, Any]]:
+        """bm25 keyword search over the stored chunks (same result shape and domain filter as search_similar)"""
+        if self.lexical is None:
+            return []
+        try:
+            domains = self.query_domains(query) if domains is None else domains
+            hits = self.lexical.search(query, limit, domains=domains or None)
+            if domains and len(hits) < min(limit, DOMAIN_FILTER_MIN_HITS):
+                seen = {h["id"] for h in hits}
+                hits += [h for h in self.lexical.search(query, limit) if h["id"] not in seen][: limit - len(hits)]
+            return [self._format(h["id"], h["score"], h["payload"]) for h in hits if h["payload"]]
+        except Exception as e:
+            logger.error(f"❌ search_lexical failed: {e}")
+            return []
+
+    def _filtered_query(self, vector: np.ndarray, limit: int, domains: List[str]) -> List[tuple]:
+        if not domains:
+            return self._query(vector, limit)
+        hits = self._query(vector, limit, domains)
+        if len(hits) >= min(limit, DOMAIN_FILTER_MIN_HITS):
+            return hits
+        logger.info(f"🏷️ {len(hits)} {domains} hits — topping up from the whole collection.")
+        seen = {point_id for point_id, _, _ in hits}
+        extra = [h for h in self._query(vector, limit) if h[0] not in seen]
+        return hits + extra[: limit - len(hits)]
+
+    def _query(self, vector: np.ndarray, limit: int, domains: List[str] | None = None) -> List[tuple]:
+        """(id, score, payload) from qdrant, or from the local index when qdrant is down"""
+        if self.qdrant is not None and not self.local_primary and time.time() >= self._qdrant_down_until:
+            try:
+                results = self.qdrant.query_points(
+                    collection_name=QDRANT_COLLECTION,
+                    query=vector,
+                    query_filter=(
+                        qmodels.Filter(must=[qmodels.FieldCondition(key="domains", match=qmodels.MatchAny(any=domains))])
+                        if domains
+                        else None
+                    ),
+                    limit=limit,
+                    search_params=search_params(),
+                ).points
+                return [(r.id, r.score, r.payload) for r in results]
+            except Exception as e:
+                if self.local is None:
+                    raise
+                self._qdrant_down_until = time.time() + self.RETRY_COOLDOWN
+                logger.warning(f"⚠️ qdrant search failed ({e}) — using the local snapshot for {self.RETRY_COOLDOWN:.0f}s.")
+        if self.local is None:
+            return []
+        match = {"domains": domains} if domains else None
+        return [(p["id"], p["score"], p["payload"]) for p in self.local.search(vector, limit, match=match)]
+
     # ---------------------------------------------------------
     def clear_collection(self):
-        """Delete all documents from the current collection."""
+        """Delete all documents: swap the alias to a fresh empty collection and drop the old one."""
         try:
+            self.ensure_ready()
+            if self.local_primary:
+                self.local.clear()
+                self._clear_lexical()
+                self._touch_kb()
+                logger.warning(f"🧹 cleared local vector index: {LOCAL_INDEX_DIR}")
+                return
             if not self.qdrant:
                 logger.warning("⚠️ qdrant unavailable, cannot clear collection.")
                 return
-            self.qdrant.delete_collection(QDRANT_COLLECTION)
-            logger.warning(f"🧹 cleared qdrant collection: {QDRANT_COLLECTION}")
+            old = self.collection
+            if old == QDRANT_COLLECTION:
+                self.qdrant.delete_collection(old)  # legacy plain collection
+            fresh = self._create_collection(self.schema)
+            self._point_alias(fresh)
+            self.collection, self.schema_ok = fresh, True
+            if old and old != QDRANT_COLLECTION:
+                self.qdrant.delete_collection(old)
+            self._clear_lexical()
+            self._touch_kb()
+            logger.warning(f"🧹 cleared qdrant collection: {QDRANT_COLLECTION} → {fresh}")
         except Exception as e:
             logger.error(f"❌ clear_collection failed: {e}")
 
+    def _clear_lexical(self):
+        if self.lexical is not None:
+            self.lexical.clear()
+
 
 # =============================================================
-# ⚙️ Global shared instance (singleton)
+# ⚙️ Global shared instance (singleton, connects lazily)
 # =============================================================
 try:
     vector_service = VectorService()
@@ -170,21 +766,23 @@ except Exception as e:
 # =============================================================
 # 🔹 Helper for external modules (rag_service, orchestrator)
 # =============================================================
-def retrieve_context(query: str, intent: str | None = None, k: int = 3):
+def retrieve_context(query: str, k: int = RAG_TOP_K):
     """
     lightweight wrapper around vector_service.search_similar()
-    so other modules can import a consistent interface.
+    so other modules can import a consistent interface. with reranking
+    enabled it over-fetches and keeps the cross-encoder's best k.
     """
     try:
         if not vector_service:
             logger.warning("⚠️ vector service not initialized — no retrieval possible.")
             return []
 
-        results = vector_service.search_similar(query, limit=k)
+        deadline = rerank_service.deadline()
+        results = vector_service.search_similar(query, limit=rerank_service.fetch_size(k))
         if not results:
             logger.info(f"ℹ️ no similar context found for: '{query[:50]}...'")
             return []
-        return results
+        return rerank_service.rerank(query, results, k, deadline=deadline)[0]
     except Exception as e:
         logger.error(f"❌ retrieve_context failed: {e}")
         return []
@@ -0,0 +1,174 @@
+"""
+maharaga micro-batching engine
+------------------------------
+collects work items that arrive within a short time window and hands
+them to a single batched call, then fans the results back out to every
+waiting caller. usable from both sync (thread) and async callers.
+"""
+
+import time
+import queue
+import asyncio
+import threading
+from bisect import bisect_left
+from concurrent.futures import Future
+from typing import Any, Callable, List
+
+from app.utils.logger import logger
+
+# queue-wait buckets (ms) used for the latency histogram
+WAIT_BUCKETS_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+# =============================================================
+# 🔹 errors
+# =============================================================
+class QueueFullError(RuntimeError):
+    """raised when a work queue cannot accept more items (backpressure)"""
+
+
+# =============================================================
+# 🧩 micro batcher
+# =============================================================
+class MicroBatcher:
+    """
+    dynamic batcher in front of an expensive batched function.
+
+    a background worker blocks for the first item, then keeps collecting
+    until `max_batch_size` items are gathered or `max_wait_ms` elapses,
+    and calls `process_fn(list_of_items)` once. `process_fn` must return
+    one result per item, in order.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        process_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10,
+        max_queue_size: int = 0,
+    ):
+        self.name = name
+        self.process_fn = process_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+        self.max_queue_size = max(0, int(max_queue_size))
+        self._queue: queue.Queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._worker: threading.Thread | None = None
+
+        # metrics (updated by submitters and the worker — guarded by _lock)
+        self._batches = 0
+        self._items = 0
+        self._rejected = 0
+        self._max_depth = 0
+        self._batch_hist: dict[int, int] = {}
+        self._wait_hist = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    # ---------------------------------------------------------
+    def _ensure_worker(self):
+        """start the background worker on first use"""
+        if self._worker and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(
+                target=self._run, name=f"{self.name}-batcher", daemon=True
+            )
+            self._worker.start()
+            logger.info(
+                f"⚙️ {self.name} batcher started "
+                f"(max_batch={self.max_batch_size}, max_wait={self.max_wait * 1000:.0f}ms)"
+            )
+
+    # ---------------------------------------------------------
+    def submit(self, item: Any) -> Future:
+        """enqueue one item and return a future for its result"""
+        self._ensure_worker()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFullError(f"{self.name} queue is full ({self.max_queue_size} pending).")
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self._max_depth = max(self._max_depth, depth)
+        return future
+
+    async def asubmit(self, item: Any) -> Any:
+        """async wrapper around submit()"""
+        return await asyncio.wrap_future(self.submit(item))
+
+    # ---------------------------------------------------------
+    def _collect(self) -> list:
+        """block for the first item, then gather until size or deadline"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """worker loop — never exits while the process is alive"""
+        while True:
+            batch = self._collect()
+            now = time.monotonic()
+
+            # drop callers that gave up while waiting
+            live = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+            if not live:
+                continue
+
+            size = len(live)
+            with self._lock:
+                for _, _, enqueued_at in live:
+                    waited_ms = (now - enqueued_at) * 1000
+                    self._wait_hist[bisect_left(WAIT_BUCKETS_MS, waited_ms)] += 1
+                self._batches += 1
+                self._items += size
+                self._batch_hist[size] = self._batch_hist.get(size, 0) + 1
+
+            try:
+                results = self.process_fn([item for item, _, _ in live])
+                if len(results) != size:
+                    raise RuntimeError(f"{self.name} batch returned {len(results)} results for {size} items")
+                for (_, future, _), result in zip(live, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"❌ {self.name} batch of {size} failed: {e}")
+                for _, future, _ in live:
+                    future.set_exception(e)
+
+    # ---------------------------------------------------------
+    def stats(self) -> dict:
+        """queue depth and batch-size / queue-wait histograms"""
+        with self._lock:
+            batches, items, rejected, max_depth = self._batches, self._items, self._rejected, self._max_depth
+            batch_hist = dict(sorted(self._batch_hist.items()))
+            wait_counts = list(self._wait_hist)
+        wait_hist = {f"<={b}ms": n for b, n in zip(WAIT_BUCKETS_MS, wait_counts)}
+        wait_hist[f">{WAIT_BUCKETS_MS[-1]}ms"] = wait_counts[-1]
+        return {
+            "name": self.name,
+            "queue_depth": self._queue.qsize(),
+            "max_queue_depth": max_depth,
+            "queue_capacity": self.max_queue_size or None,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "batches": batches,
+            "items": items,
+            "rejected": rejected,
+            "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+            "batch_size_histogram": batch_hist,
+            "queue_wait_histogram": wait_hist,
+        }
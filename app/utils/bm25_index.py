@@ -0,0 +1,228 @@
+"""
+maharaga lexical index
+----------------------
+okapi bm25 over the ingested chunks, for what dense MiniLM vectors miss:
+exact identifiers, verse references ("gita 2.47"), code symbols.
+
+  • tokens are lowercase word runs; dotted / colon / slash compounds are
+    kept whole and also split ("os.path" → os.path, os, path)
+  • the index is an append-only json-lines log (postings.log) of
+    per-chunk term frequencies, replayed into in-memory postings by
+    every process — incremental adds / deletes, flock-serialized writes,
+    picked up by forked workers and the ingest cli alike
+  • rebuild() rewrites the log from scratch (compaction) and swaps it in
+
+chunks carry a small payload copy (text, parent_id, chunk_index,
+domains, simhash) so lexical hits can be used without a vector-store lookup.
+"""
+
+import os
+import re
+import json
+import math
+import fcntl
+import heapq
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.utils.logger import logger
+
+_TOKEN = re.compile(r"\w+(?:[.:/'-]\w+)*")
+_SPLIT = re.compile(r"[.:/'-]")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i in into is it its of on or our she "
+    "so than that the their them then there these they this to was we were what when where which who "
+    "why will with you your".split()
+)
+# payload fields copied into the lexical index
+STORED_FIELDS = ("text", "parent_id", "chunk_index", "domains", "simhash")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in _TOKEN.findall((text or "").lower()):
+        if token not in STOPWORDS:
+            tokens.append(token)
+        if _SPLIT.search(token):
+            tokens.extend(part for part in _SPLIT.split(token) if part and part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """on-disk bm25 postings log with in-memory scoring."""
+
+    def __init__(self, directory: str, k1: float = 1.5, b: float = 0.75):
+        self.directory = directory
+        self.k1 = k1
+        self.b = b
+        self._log = None
+        self._pid = None
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.directory, "postings.log")
+
+    def _reset_state(self):
+        self._rows: Dict[Any, int] = {}  # point id → row
+        self._row_ids: List[Any] = []  # row → point id
+        self._docs: List[Optional[Dict[str, Any]]] = []  # row → stored payload (None = deleted)
+        self._terms: List[Tuple[str, ...]] = []  # row → distinct terms (for removal)
+        self._lengths: List[int] = []
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)  # term → row → tf
+        self._domains: Dict[str, Set[int]] = defaultdict(set)
+        self._total_length = 0
+
+    # =========================================================
+    # 🔹 log replay
+    # =========================================================
+    def _open(self):
+        try:
+            stale = self._log is not None and (
+                self._pid != os.getpid() or os.stat(self._log_path).st_ino != os.fstat(self._log.fileno()).st_ino
+            )
+        except FileNotFoundError:
+            stale = True
+        if self._log is not None and not stale:
+            return
+        # first use, forked child, or the log was replaced by rebuild()
+        if self._log is not None:
+            self._log.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self._log = open(self._log_path, "a+", encoding="utf-8")
+        self._pid, self._offset = os.getpid(), 0
+        self._reset_state()
+        self._sync()
+
+    def _sync(self):
+        size = os.fstat(self._log.fileno()).st_size
+        if size <= self._offset:
+            return
+        self._log.seek(self._offset)
+        for line in self._log:
+            if not line.endswith("\n"):
+                break  # partially written record; picked up next time
+            self._offset += len(line.encode("utf-8"))
+            record = json.loads(line)
+            self._remove(record["id"])
+            if not record.get("deleted"):
+                self._add(record["id"], record["tf"], record["len"], record["doc"])
+        self._log.seek(0, os.SEEK_END)
+
+    def _add(self, point_id, tf: Dict[str, int], length: int, doc: Dict[str, Any]):
+        row = len(self._docs)
+        self._rows[point_id] = row
+        self._row_ids.append(point_id)
+        self._docs.append(doc)
+        self._terms.append(tuple(tf))
+        self._lengths.append(length)
+        self._total_length += length
+        for term, count in tf.items():
+            self._postings[term][row] = count
+        for domain in doc.get("domains") or []:
+            self._domains[domain].add(row)
+
+    def _remove(self, point_id):
+        row = self._rows.pop(point_id, None)
+        if row is None:
+            return
+        for term in self._terms[row]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(row, None)
+                if not postings:
+                    del self._postings[term]
+        for domain in self._docs[row].get("domains") or []:
+            self._domains[domain].discard(row)
+        self._total_length -= self._lengths[row]
+        self._docs[row], self._terms[row], self._lengths[row] = None, (), 0
+
+    # =========================================================
+    # 🔹 writes
+    # =========================================================
+    @staticmethod
+    def _record(point_id, payload: Dict[str, Any]) -> str:
+        tokens = tokenize(payload.get("text", ""))
+        doc = {k: payload[k] for k in STORED_FIELDS if k in payload}
+        record = {"id": point_id, "tf": dict(Counter(tokens)), "len": len(tokens), "doc": doc}
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+    def _append(self, lines: str):
+        fcntl.flock(self._log.fileno(), fcntl.LOCK_EX)
+        try:
+            self._log.write(lines)
+            self._log.flush()
+            self._sync()
+        finally:
+            fcntl.flock(self._log.fileno(), fcntl.LOCK_UN)
+
+    def add(self, ids: List[Any], payloads: List[Dict[str, Any]]):
+        """index (or re-index) chunks by point id"""
+        lines = "".join(self._record(i, p or {}) for i, p in zip(ids, payloads))
+        with self._lock:
+            self._open()
+            self._append(lines)
+
+    def delete_where(self, predicate: Callable[[Dict[str, Any]], bool]) -> int:
+        with self._lock:
+            self._open()
+            self._sync()
+            doomed = [i for i, row in self._rows.items() if predicate(self._docs[row])]
+            if doomed:
+                self._append("".join(json.dumps({"id": i, "deleted": True}) + "\n" for i in doomed))
+            return len(doomed)
+
+    def rebuild(self, batches: Iterable[Tuple[List[Any], List[Dict[str, Any]]]]) -> int:
+        """write a fresh log from (ids, payloads) batches and swap it in"""
+        os.makedirs(self.directory, exist_ok=True)
+        staging = f"{self._log_path}.building-{os.getpid()}"
+        count = 0
+        with open(staging, "w", encoding="utf-8") as f:
+            for ids, payloads in batches:
+                f.write("".join(self._record(i, p or {}) for i, p in zip(ids, payloads)))
+                count += len(ids)
+        with self._lock:
+            os.replace(staging, self._log_path)
+            self._open()
+        logger.info(f"🔤 lexical index rebuilt: {count} chunks in {self.directory}")
+        return count
+
+    def clear(self):
+        self.rebuild([])
+
+    # =========================================================
+    # 🔹 reads
+    # =========================================================
+    def search(self, query: str, limit: int = 10, domains: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """top bm25 chunks as {id, score, payload}, best first (optionally only chunks in any of `domains`)"""
+        terms = set(tokenize(query))
+        with self._lock:
+            self._open()
+            self._sync()
+            n = len(self._rows)
+            if not n or not terms or limit <= 0:
+                return []
+            allowed = set().union(*(self._domains.get(d, set()) for d in domains)) if domains else None
+            avg_length = self._total_length / n or 1.0
+            scores: Dict[int, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1.0 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for row, tf in postings.items():
+                    if allowed is not None and row not in allowed:
+                        continue
+                    norm = self.k1 * (1.0 - self.b + self.b * self._lengths[row] / avg_length)
+                    scores[row] += idf * tf * (self.k1 + 1.0) / (tf + norm)
+            top = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            return [{"id": self._row_ids[row], "score": score, "payload": self._docs[row]} for row, score in top]
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._open()
+            self._sync()
+            return len(self._rows)
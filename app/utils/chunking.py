@@ -0,0 +1,204 @@
+"""
+maharaga chunking
+-----------------
+splits documents into overlapping passages sized for the embedding model
+before they are stored, so one knowledge-base point holds one passage.
+
+  • sizes are counted in embedder tokens (MiniLM truncates at 256)
+  • chunks are packed from whole sentences; a sentence longer than the
+    window is cut at token boundaries
+  • consecutive chunks share up to CHUNK_OVERLAP_TOKENS of trailing
+    sentences, so an answer spanning a boundary is kept together
+  • every chunk carries its parent document id and index; its point id
+    is derived from both, so re-ingesting a document is idempotent
+
+merge_chunks() puts neighbouring retrieved chunks of one document back
+together (dropping the overlap) before they are placed in a prompt.
+"""
+
+import re
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.utils.logger import logger
+from app.utils.constants import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+# namespace for deterministic chunk (point) ids
+CHUNK_NAMESPACE = uuid.UUID("6f1c1d1e-5a0b-4b59-9a8e-4d6172616761")
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?।])\s+|\n\s*\n")
+_FALLBACK_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def chunk_id(parent_id: str, chunk_index: int) -> str:
+    """stable qdrant id for one chunk of one document"""
+    return str(uuid.uuid5(CHUNK_NAMESPACE, f"{parent_id}#{chunk_index}"))
+
+
+def split_sentences(text: str) -> List[str]:
+    return [" ".join(s.split()) for s in _SENTENCE_SPLIT.split(text or "") if s and s.strip()]
+
+
+# =============================================================
+# 🔹 token counting
+# =============================================================
+class TokenCounter:
+    """token lengths / token-boundary splits with the embedder's tokenizer"""
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+        self.special = tokenizer.num_special_tokens_to_add() if tokenizer is not None else 0
+
+    def lengths(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        if self.tokenizer is None:
+            return [len(_FALLBACK_TOKEN.findall(t)) for t in texts]
+        ids = self.tokenizer(texts, add_special_tokens=False)["input_ids"]
+        return [len(i) for i in ids]
+
+    def split(self, text: str, max_tokens: int) -> List[str]:
+        """cut one over-long sentence into <= max_tokens pieces"""
+        if self.tokenizer is None:
+            words = text.split()
+            return [" ".join(words[i:i + max_tokens]) for i in range(0, len(words), max_tokens)]
+        offsets = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        pieces = []
+        for start in range(0, len(offsets), max_tokens):
+            window = offsets[start:start + max_tokens]
+            piece = text[window[0][0]:window[-1][1]].strip()
+            if piece:
+                pieces.append(piece)
+        return pieces
+
+
+_warned_fallback = False
+
+
+def default_counter() -> TokenCounter:
+    """counter backed by the shared embedder's tokenizer (word estimate if unavailable)"""
+    global _warned_fallback
+    try:
+        from app.utils.embeddings import get_embedder
+
+        return TokenCounter(get_embedder().tokenizer)
+    except Exception as e:
+        if not _warned_fallback:
+            logger.warning(f"⚠️ embedder tokenizer unavailable, estimating chunk sizes from words: {e}")
+            _warned_fallback = True
+        return TokenCounter(None)
+
+
+# =============================================================
+# 🔹 chunker
+# =============================================================
+def chunk_text(
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    counter: Optional[TokenCounter] = None,
+) -> List[str]:
+    """sentence-packed passages of <= max_tokens model tokens with sentence overlap"""
+    counter = counter or default_counter()
+    budget = max(8, max_tokens - counter.special)
+
+    sentences: List[str] = []
+    for sentence, length in zip(*_with_lengths(split_sentences(text), counter)):
+        sentences.extend([sentence] if length <= budget else counter.split(sentence, budget))
+    sentences, lengths = _with_lengths(sentences, counter)
+
+    chunks: List[str] = []
+    current: List[int] = []  # indices into sentences
+    size = 0
+    for i, length in enumerate(lengths):
+        if current and size + length > budget:
+            chunks.append(" ".join(sentences[j] for j in current))
+            # carry trailing sentences (up to overlap_tokens) into the next chunk
+            carried, carried_size = [], 0
+            for j in reversed(current):
+                if carried_size + lengths[j] > overlap_tokens:
+                    break
+                carried.insert(0, j)
+                carried_size += lengths[j]
+            if carried_size + length > budget:
+                carried, carried_size = [], 0
+            current, size = carried, carried_size
+        current.append(i)
+        size += length
+    if current:
+        chunks.append(" ".join(sentences[j] for j in current))
+    return chunks
+
+
+def _with_lengths(sentences: List[str], counter: TokenCounter):
+    return sentences, counter.lengths(sentences)
+
+
+def chunk_document(
+    parent_id: str,
+    text: str,
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+    counter: Optional[TokenCounter] = None,
+) -> List[Dict[str, Any]]:
+    """chunks of one document with stable ids and parent linkage"""
+    pieces = chunk_text(text, max_tokens, overlap_tokens, counter)
+    return [
+        {
+            "id": chunk_id(parent_id, index),
+            "parent_id": parent_id,
+            "chunk_index": index,
+            "chunk_count": len(pieces),
+            "text": piece,
+        }
+        for index, piece in enumerate(pieces)
+    ]
+
+
+# =============================================================
+# 🔹 merge retrieved chunks back into passages
+# =============================================================
+def _join_overlapping(left: str, right: str, max_words: int = 200) -> str:
+    """concatenate two neighbouring chunks, dropping the words they share"""
+    a, b = left.split(), right.split()
+    for k in range(min(len(a), len(b), max_words), 0, -1):
+        if a[-k:] == b[:k]:
+            return " ".join(a + b[k:])
+    return " ".join(a + b)
+
+
+def merge_chunks(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    merge retrieved chunks that are consecutive pieces of the same parent
+    document. keeps the best-first order of the input; merged passages
+    take the best score of their parts. docs without parent_id pass through.
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    order: List[Any] = []
+    for doc in docs:
+        parent = doc.get("parent_id")
+        if parent is None or doc.get("chunk_index") is None:
+            order.append(doc)
+            continue
+        if parent not in groups:
+            groups[parent] = []
+            order.append(parent)
+        groups[parent].append(doc)
+
+    merged: List[Dict[str, Any]] = []
+    for item in order:
+        if isinstance(item, dict):
+            merged.append(item)
+            continue
+        run: Optional[Dict[str, Any]] = None
+        for doc in sorted(groups[item], key=lambda d: d["chunk_index"]):
+            if run is not None and doc["chunk_index"] == run["chunk_index"] + 1:
+                run["text"] = _join_overlapping(run["text"], doc.get("text", ""))
+                run["score"] = max(run.get("score", 0.0), doc.get("score", 0.0))
+                run["chunk_index"] = doc["chunk_index"]
+                continue
+            if run is not None:
+                merged.append(run)
+            run = dict(doc)
+        merged.append(run)
+    return merged
@@ -16,21 +16,119 @@ ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 # =============================================================
 MODEL_NAME = os.getenv("MODEL_NAME", "distilgpt2")
 MAX_TOKENS = int(os.getenv("MAX_TOKENS", 150))
+# reuse precomputed attention keys/values for the static rag system prefix
+PREFIX_CACHE_ENABLED = os.getenv("PREFIX_CACHE_ENABLED", "true").lower() == "true"
+# fp32 | int8 (dynamic quantization, cpu) | bf16 (native bf16 hardware only)
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "fp32").lower()
+
+# =============================================================
+# 🔹 generation batching
+# =============================================================
+GEN_BATCH_MAX_SIZE = int(os.getenv("GEN_BATCH_MAX_SIZE", 8))
+GEN_BATCH_MAX_WAIT_MS = float(os.getenv("GEN_BATCH_MAX_WAIT_MS", 15))
+GEN_BATCH_QUEUE_SIZE = int(os.getenv("GEN_BATCH_QUEUE_SIZE", 128))
+
+# =============================================================
+# 🔹 inference executor (keeps blocking work off the event loop)
+# =============================================================
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", 2))
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", 32))
+INFERENCE_TORCH_THREADS = int(os.getenv("INFERENCE_TORCH_THREADS", 0))  # 0 = torch default
+
+# =============================================================
+# 🔹 response cache (orchestrator answers)
+# =============================================================
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1024))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 3600))  # seconds, 0 = no expiry
+# semantic tier: serve near-duplicate questions above this cosine similarity
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "true").lower() == "true"
+RESPONSE_CACHE_SIM_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SIM_THRESHOLD", 0.92))
+# stamped by every knowledge-base write (from any process); keys cached rag answers
+KB_VERSION_FILE = os.getenv("KB_VERSION_FILE", "data/kb_version")
 
 # =============================================================
 # 🔹 embedding / vector db configuration
 # =============================================================
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+# torch | onnx (onnx runtime on cpu; needs `pip install optimum[onnxruntime]`)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+# "" = fp32 onnx, or a dynamic int8 profile: avx512_vnni | avx512 | avx2 | arm64
+EMBEDDING_ONNX_QUANTIZE = os.getenv("EMBEDDING_ONNX_QUANTIZE", "").lower()
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", "models/onnx")
+# embedding cache: in-process lru + optional memory-mapped disk tier ("" = off)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", 10000))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "")
+EMBEDDING_CACHE_DISK_ENTRIES = int(os.getenv("EMBEDDING_CACHE_DISK_ENTRIES", 200000))
+# single-text embedding calls are coalesced into one encode() batch
+EMBED_BATCH_MAX_SIZE = int(os.getenv("EMBED_BATCH_MAX_SIZE", 32))
+EMBED_BATCH_MAX_WAIT_MS = float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", 5))
+EMBED_BATCH_QUEUE_SIZE = int(os.getenv("EMBED_BATCH_QUEUE_SIZE", 512))
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "maharaga_knowledge_base")
+# stored vector quantization: none | scalar (int8) | product (see utils/vector_quantization.py)
+QDRANT_QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none").lower()
+QDRANT_SCALAR_QUANTILE = float(os.getenv("QDRANT_SCALAR_QUANTILE", 0.99))
+QDRANT_PQ_COMPRESSION = os.getenv("QDRANT_PQ_COMPRESSION", "x16").lower()
+# re-rank oversampled quantized candidates with the original float32 vectors
+QDRANT_QUANTIZATION_RESCORE = os.getenv("QDRANT_QUANTIZATION_RESCORE", "true").lower() == "true"
+QDRANT_QUANTIZATION_OVERSAMPLING = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", 2.0))
+# keep the float32 originals on disk (only the quantized copy stays in ram)
+QDRANT_VECTORS_ON_DISK = os.getenv("QDRANT_VECTORS_ON_DISK", "false").lower() == "true"
+# qdrant | local (embedded memory-mapped index, no external service)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "data/vector_index")
+# with the qdrant backend, serve searches from the last local snapshot while qdrant is down
+LOCAL_INDEX_FALLBACK = os.getenv("LOCAL_INDEX_FALLBACK", "true").lower() == "true"
+# approximate hnsw search over the local index (needs `pip install hnswlib`)
+LOCAL_INDEX_HNSW = os.getenv("LOCAL_INDEX_HNSW", "false").lower() == "true"
+
+# =============================================================
+# 🔹 bulk ingestion
+# =============================================================
+# chunk sizes are in embedder tokens (all-MiniLM-L6-v2 reads at most 256)
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 256))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 48))
+INGEST_EMBED_BATCH = int(os.getenv("INGEST_EMBED_BATCH", 256))
+INGEST_UPSERT_BATCH = int(os.getenv("INGEST_UPSERT_BATCH", 128))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 4))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", 5))
 
 # =============================================================
 # 🔹 rag configuration
 # =============================================================
 RAG_TOP_K = int(os.getenv("RAG_TOP_K", 3))
 CONTEXT_SEPARATOR = "\n---\n"
-MAX_CONTEXT_CHARS = int(os.getenv("MAX_CONTEXT_CHARS", 3000))
-MAX_PROMPT_CHARS = int(os.getenv("MAX_PROMPT_CHARS", 6000))
+# prompt budget: context is packed (in generator tokens) into the model window minus
+# MAX_TOKENS for the answer, the prompt scaffold (question included) and a small margin
+GENERATOR_CONTEXT_TOKENS = int(os.getenv("GENERATOR_CONTEXT_TOKENS", 0))  # 0 = from the tokenizer
+CONTEXT_TOKEN_MARGIN = int(os.getenv("CONTEXT_TOKEN_MARGIN", 16))
+QUESTION_MAX_TOKENS = int(os.getenv("QUESTION_MAX_TOKENS", 128))  # longer questions are cut to this
+CONTEXT_TOKEN_CACHE_SIZE = int(os.getenv("CONTEXT_TOKEN_CACHE_SIZE", 4096))  # chunk → token count
+# restrict retrieval to documents tagged with one of the query's keyword domains (payload `domains`)
+DOMAIN_FILTER_ENABLED = os.getenv("DOMAIN_FILTER_ENABLED", "true").lower() == "true"
+# fewer filtered hits than this → top up from an unfiltered search
+DOMAIN_FILTER_MIN_HITS = int(os.getenv("DOMAIN_FILTER_MIN_HITS", 2))
+# hybrid retrieval: bm25 lexical index fused with dense results (reciprocal rank fusion)
+LEXICAL_INDEX_ENABLED = os.getenv("LEXICAL_INDEX_ENABLED", "true").lower() == "true"
+LEXICAL_INDEX_DIR = os.getenv("LEXICAL_INDEX_DIR", "data/lexical_index")
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 10))  # fetched per retriever before fusion
+RRF_K = int(os.getenv("RRF_K", 60))
+# near-duplicate passages (simhash hamming distance <= this, of 64 bits) are dropped before prompting.
+# copies with a few percent of words changed land around 5-12 bits apart, unrelated text 20+
+NEAR_DUP_FILTER_ENABLED = os.getenv("NEAR_DUP_FILTER_ENABLED", "true").lower() == "true"
+SIMHASH_MAX_DISTANCE = int(os.getenv("SIMHASH_MAX_DISTANCE", 10))
+# two-stage retrieval: over-fetch candidates, rerank them with a cross-encoder, keep RAG_TOP_K
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 20))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", 256))  # query + passage tokens per pair
+# retrieval + rerank time budget per request; reranking is trimmed or skipped to stay inside it
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 150))
+# after this many budget skips in a row, one top-k rerank runs anyway to re-measure the cost
+RERANK_PROBE_EVERY = int(os.getenv("RERANK_PROBE_EVERY", 20))
+# skip reranking while more inference calls than this are pending (running + queued)
+RERANK_MAX_PENDING = int(os.getenv("RERANK_MAX_PENDING", INFERENCE_WORKERS))
 
 # =============================================================
 # 🧘‍♂️ system prompt personality
@@ -45,6 +143,8 @@ SYSTEM_INSTRUCTIONS = (
     "avoid speculation, bias, or emotional exaggeration. "
     "respond in lowercase for consistency and simplicity."
 )
+# identical leading block of every rag prompt (its kv cache is shared across requests)
+SYSTEM_PROMPT_PREFIX = f"<<system>> {SYSTEM_INSTRUCTIONS.lower().strip()}\n"
 
 # =============================================================
 # ⚖️ policy / safety configuration
@@ -0,0 +1,138 @@
+"""
+maharaga context packing
+------------------------
+fits retrieved passages into the generator's context window, counted in
+the generator's own tokens:
+
+  budget = window − MAX_TOKENS (answer) − prompt scaffold − margin
+
+passages are taken best-score first and packed greedily: one that does
+not fit is skipped and smaller, lower-ranked ones may still fill the
+gap. when not even the best passage fits, it is cut at a token boundary
+instead of sending no context at all.
+
+token counts are cached per passage text (lru), so passages retrieved
+again by later queries are not re-tokenized.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.utils.logger import logger
+
+DEFAULT_WINDOW = 1024  # gpt-2 family
+_CHARS_PER_TOKEN = 3.0  # conservative estimate when no tokenizer is available
+
+
+# =============================================================
+# 🧩 context packer
+# =============================================================
+class ContextPacker:
+    """token-budgeted greedy packing of scored passages."""
+
+    def __init__(self, tokenizer_factory: Callable[[], Any], window: int = 0, cache_size: int = 4096):
+        self._tokenizer_factory = tokenizer_factory
+        self._tokenizer = None
+        self._tokenizer_failed = False
+        self._window = window
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._cache_size = max(0, cache_size)
+        self._lock = threading.Lock()
+        self._counts = {"packs": 0, "packed": 0, "dropped": 0, "truncated": 0, "cache_hits": 0, "cache_misses": 0}
+
+    # ---------------------------------------------------------
+    @property
+    def tokenizer(self):
+        if self._tokenizer is None and not self._tokenizer_failed:
+            try:
+                self._tokenizer = self._tokenizer_factory()
+            except Exception as e:
+                self._tokenizer_failed = True
+                logger.warning(f"⚠️ generator tokenizer unavailable, estimating prompt tokens from characters: {e}")
+        return self._tokenizer
+
+    @property
+    def window(self) -> int:
+        """generator context length in tokens"""
+        if self._window:
+            return self._window
+        limit = getattr(self.tokenizer, "model_max_length", 0) or 0
+        return int(limit) if 0 < limit < 1_000_000 else DEFAULT_WINDOW
+
+    def count(self, text: str) -> int:
+        """uncached token count (prompt scaffolds, queries)"""
+        if not text:
+            return 0
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return math.ceil(len(text) / _CHARS_PER_TOKEN)
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def count_cached(self, text: str) -> int:
+        """token count of a passage, remembered across requests"""
+        with self._lock:
+            n = self._cache.get(text)
+            if n is not None:
+                self._cache.move_to_end(text)
+                self._counts["cache_hits"] += 1
+                return n
+            self._counts["cache_misses"] += 1
+        n = self.count(text)
+        if self._cache_size:
+            with self._lock:
+                self._cache[text] = n
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return n
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """first max_tokens tokens of text"""
+        if max_tokens <= 0:
+            return ""
+        tokenizer = self.tokenizer
+        if tokenizer is None:
+            return text[: int(max_tokens * _CHARS_PER_TOKEN)].rstrip()
+        ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+        return tokenizer.decode(ids[:max_tokens]).strip()
+
+    # ---------------------------------------------------------
+    def pack(
+        self, passages: List[Tuple[str, float]], budget: int, separator: str = ""
+    ) -> Tuple[List[str], Dict[str, int]]:
+        """
+        greedily choose passages (text, score) for a token budget. returns the
+        chosen texts best-first and {tokens, packed, dropped, truncated}.
+        """
+        ranked = [text for text, _ in sorted(passages, key=lambda p: p[1] or 0.0, reverse=True)]
+        sep_tokens = self.count(separator)
+        chosen: List[str] = []
+        used, truncated = 0, 0
+        for text in ranked:
+            cost = self.count_cached(text) + (sep_tokens if chosen else 0)
+            if used + cost <= budget:
+                chosen.append(text)
+                used += cost
+        if not chosen and ranked and budget > 0:
+            cut = self.truncate(ranked[0], budget)
+            if cut:
+                chosen, used, truncated = [cut], self.count(cut), 1
+
+        info = {"tokens": used, "packed": len(chosen), "dropped": len(ranked) - len(chosen), "truncated": truncated}
+        with self._lock:
+            self._counts["packs"] += 1
+            self._counts["packed"] += info["packed"]
+            self._counts["dropped"] += info["dropped"]
+            self._counts["truncated"] += truncated
+        return chosen, info
+
+    # ---------------------------------------------------------
+    def stats(self) -> Dict[str, Optional[int]]:
+        with self._lock:
+            return {
+                "window": self.window if self._tokenizer is not None or self._tokenizer_failed or self._window else None,
+                "cached_chunks": len(self._cache),
+                "estimated": self._tokenizer_failed,
+                **self._counts,
+            }
@@ -0,0 +1,54 @@
+"""
+maharaga device placement
+-------------------------
+which device the models run on, and when they may be moved there.
+
+a cuda context does not survive fork, so the preforking master must not
+touch the gpu: while it preloads, placement is deferred — weights are
+loaded on the cpu (shared copy-on-write) and every worker moves its
+models to the gpu after fork (resources.after_fork()). on cpu-only
+hosts nothing is deferred and the master prepares the final weights.
+"""
+
+import os
+
+from app.utils.logger import logger
+
+# ask nvml whether a gpu exists instead of initialising cuda (fork-safe)
+os.environ.setdefault("PYTORCH_NVML_BASED_CUDA_CHECK", "1")
+
+_deferred = False
+
+
+def accelerator() -> str:
+    """"cuda" when torch sees a gpu, else "cpu" (does not create a cuda context)"""
+    try:
+        import torch
+
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except Exception:
+        return "cpu"
+
+
+def defer_placement(deferred: bool = True):
+    """set by the preforking master while it loads weights (cleared in each worker)"""
+    global _deferred
+    _deferred = deferred
+
+
+def placement_pending() -> bool:
+    """true while models headed for a gpu must stay on the cpu"""
+    return _deferred and accelerator() != "cpu"
+
+
+def load_device() -> str | None:
+    """device argument for model constructors: "cpu" while placement is pending, else auto"""
+    return "cpu" if placement_pending() else None
+
+
+def place_on_accelerator(model):
+    """post-fork hook for sentence-transformers / cross-encoder models loaded on the cpu"""
+    device = accelerator()
+    if device != "cpu" and getattr(model, "backend", "torch") == "torch":
+        model.to(device)
+        logger.info(f"🎮 {type(model).__name__} moved to {device} in worker {os.getpid()}")
@@ -0,0 +1,348 @@
+"""
+maharaga embedding cache
+------------------------
+bounded cache of sentence embeddings keyed by hash(model name + normalized
+text) → float32 vector. the model name may be given as a callable, resolved
+on first use (the embedder label is only known once the model is built).
+
+  • memory tier — in-process lru of read-only numpy vectors
+  • disk tier   — optional memory-mapped float32 matrix + append-only key
+                  log in EMBEDDING_CACHE_DIR. it survives restarts and is
+                  shared by forked workers (an flock on a lock file
+                  serializes creation and writes, readers hold it shared
+                  and pick up other workers' rows from the log). rows are
+                  reused ring-style once the file is full; each time the
+                  ring wraps the log is compacted to one line per row.
+"""
+
+import os
+import json
+import fcntl
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Union
+
+import numpy as np
+
+from app.utils.logger import logger
+
+
+def normalize_text(text: str) -> str:
+    """unicode nfc + collapsed whitespace (case is left to the tokenizer)"""
+    return " ".join(unicodedata.normalize("NFC", text or "").split())
+
+
+# =============================================================
+# 🔹 disk tier
+# =============================================================
+class DiskVectorStore:
+    """memory-mapped float32 rows + `key row` log, safe across processes."""
+
+    def __init__(self, directory: str, model_name: str, capacity: int):
+        self.directory = directory
+        self.model_name = model_name
+        self.capacity = max(1, int(capacity))
+        self.dim: int | None = None
+        self._rows: "OrderedDict[str, int]" = OrderedDict()  # key → row, allocation order
+        self._keys_by_row: dict = {}
+        self._offset = 0
+        self._next_row = 0
+        self._matrix = None
+        self._log = None
+        self._lockfile = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    @property
+    def _matrix_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.directory, "index.log")
+
+    @property
+    def _lock_path(self) -> str:
+        return os.path.join(self.directory, "lock")
+
+    @contextmanager
+    def _flock(self, mode: int):
+        fcntl.flock(self._lockfile.fileno(), mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lockfile.fileno(), fcntl.LOCK_UN)
+
+    # ---------------------------------------------------------
+    def _open(self, dim: int | None) -> bool:
+        """open (or create) the files for this process; False if not possible yet"""
+        if self._log is not None and self._pid == os.getpid():
+            return True
+        if self._pid != os.getpid():
+            # a forked child must not share the parent's file description (flock)
+            self._lockfile = None
+        self._log, self._matrix, self._pid = None, None, os.getpid()
+        self._rows.clear()
+        self._keys_by_row.clear()
+        self._offset = self._next_row = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        if self._lockfile is None:
+            self._lockfile = open(self._lock_path, "a+", encoding="utf-8")
+        # exclusive: only one process checks, resets or creates the files
+        with self._flock(fcntl.LOCK_EX):
+            return self._open_files(dim)
+
+    def _open_files(self, dim: int | None) -> bool:
+        meta = None
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        if meta and (meta.get("model") != self.model_name or meta.get("capacity") != self.capacity):
+            logger.warning("⚠️ embedding disk cache belongs to another model/capacity; resetting it.")
+            self._reset()
+            meta = None
+        if meta is None:
+            if dim is None:
+                return False  # nothing stored yet and nothing to store
+            meta = {"model": self.model_name, "dim": int(dim), "capacity": self.capacity}
+            self._reset()
+            with open(self._meta_path, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+        self.dim = int(meta["dim"])
+        mode = "r+" if os.path.exists(self._matrix_path) else "w+"
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode=mode, shape=(self.capacity, self.dim))
+        self._log = open(self._log_path, "a+", encoding="utf-8")
+        self._sync()
+        return True
+
+    def _reset(self):
+        for path in (self._meta_path, self._matrix_path, self._log_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _reopen_log(self):
+        """replay a replaced (compacted) log from the start"""
+        self._log.close()
+        self._log = open(self._log_path, "a+", encoding="utf-8")
+        self._rows.clear()
+        self._keys_by_row.clear()
+        self._offset = self._next_row = 0
+        self._sync()
+
+    def _compact(self):
+        """rewrite the log as one line per live row, in allocation order (under LOCK_EX)"""
+        tmp = self._log_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.writelines(f"{key} {row}\n" for key, row in self._rows.items())
+        os.replace(tmp, self._log_path)
+        self._reopen_log()
+
+    def _sync(self):
+        """apply log lines appended since the last read (by any process); call under the flock"""
+        if os.fstat(self._log.fileno()).st_ino != os.stat(self._log_path).st_ino:
+            self._reopen_log()  # compacted by another process
+            return
+        size = os.fstat(self._log.fileno()).st_size
+        if size <= self._offset:
+            return
+        self._log.seek(self._offset)
+        for line in self._log:
+            if not line.endswith("\n"):
+                break  # partially written line; picked up next time
+            self._offset += len(line.encode("utf-8"))
+            key, _, row = line.strip().partition(" ")
+            if not row:
+                continue
+            row = int(row)
+            old = self._keys_by_row.get(row)
+            if old is not None:
+                self._rows.pop(old, None)
+            self._rows.pop(key, None)
+            self._rows[key] = row
+            self._keys_by_row[row] = key
+            self._next_row = (row + 1) % self.capacity
+        self._log.seek(0, os.SEEK_END)
+
+    # ---------------------------------------------------------
+    def get(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            if not self._open(None):
+                return None
+            # shared lock: no writer can reuse the row between the catch-up and the read
+            with self._flock(fcntl.LOCK_SH):
+                self._sync()
+                row = self._rows.get(key)
+                if row is None:
+                    return None
+                return np.array(self._matrix[row], dtype=np.float32)
+
+    def put(self, key: str, vector: np.ndarray):
+        with self._lock:
+            if not self._open(vector.shape[-1]) or vector.shape[-1] != self.dim:
+                return
+            with self._flock(fcntl.LOCK_EX):
+                self._sync()
+                if key in self._rows:
+                    return
+                row = self._next_row
+                # vector first, then the log line that publishes it
+                self._matrix[row] = vector
+                self._log.write(f"{key} {row}\n")
+                self._log.flush()
+                self._sync()
+                if self._next_row == 0:
+                    self._compact()  # the ring wrapped: drop the lines of overwritten rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+# =============================================================
+# 🧩 embedding cache
+# =============================================================
+class EmbeddingCache:
+    """lru (+ optional disk) cache of float32 embeddings with hit/miss counters."""
+
+    def __init__(
+        self,
+        model_name: Union[str, Callable[[], str]],
+        max_entries: int = 10000,
+        disk_dir: str = "",
+        disk_entries: int = 200000,
+    ):
+        self._model_name = model_name
+        self.max_entries = max(0, int(max_entries))
+        self._disk_dir = disk_dir
+        self._disk_entries = disk_entries
+        self._disk: DiskVectorStore | None = None
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    # ---------------------------------------------------------
+    @property
+    def model_name(self) -> str:
+        if callable(self._model_name):
+            self._model_name = self._model_name()
+        return self._model_name
+
+    @property
+    def disk(self) -> DiskVectorStore | None:
+        if self._disk is None and self._disk_dir:
+            with self._lock:
+                if self._disk is None:
+                    self._disk = DiskVectorStore(self._disk_dir, self.model_name, self._disk_entries)
+        return self._disk
+
+    def key(self, text: str) -> str:
+        raw = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    @staticmethod
+    def _frozen(vector) -> np.ndarray:
+        """contiguous float32 read-only view (copies only if dtype/layout differ)"""
+        vector = np.ascontiguousarray(vector, dtype=np.float32).reshape(-1)
+        vector.setflags(write=False)  # shared between callers
+        return vector
+
+    # ---------------------------------------------------------
+    def get(self, text: str, record: bool = True) -> np.ndarray | None:
+        """cached vector for text (read-only), or None. record=False skips the counters"""
+        key = self.key(text)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += record
+                return vector
+        if self.disk is not None:
+            try:
+                vector = self.disk.get(key)
+            except Exception as e:
+                logger.warning(f"⚠️ embedding disk cache read failed: {e}")
+                vector = None
+            if vector is not None:
+                vector = self._frozen(vector)
+                self._remember(key, vector)
+                with self._lock:
+                    self.disk_hits += record
+                return vector
+        with self._lock:
+            self.misses += record
+        return None
+
+    def put(self, text: str, vector) -> np.ndarray:
+        """store a vector; returns the cached read-only float32 copy"""
+        key = self.key(text)
+        vector = self._frozen(vector)
+        self._remember(key, vector)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, vector)
+            except Exception as e:
+                logger.warning(f"⚠️ embedding disk cache write failed: {e}")
+        return vector
+
+    # ---------------------------------------------------------
+    def encode_rows(
+        self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray], record: bool = True
+    ) -> List[np.ndarray]:
+        """
+        one read-only float32 vector per text. only texts missing from the
+        cache are passed (once each) to encode_fn; fresh rows are views
+        into its output matrix, not copies.
+        """
+        vectors: list = [self.get(t, record) for t in texts]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            encoded = np.asarray(encode_fn(missing), dtype=np.float32)
+            fresh = {t: self.put(t, row) for t, row in zip(missing, encoded)}
+            vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+        return vectors
+
+    def encode(
+        self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray], record: bool = True
+    ) -> Optional[np.ndarray]:
+        """(n, dim) float32 matrix for texts (see encode_rows)"""
+        vectors = self.encode_rows(texts, encode_fn, record)
+        if not vectors:
+            return None
+        return np.stack(vectors)
+
+    # ---------------------------------------------------------
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "model": None if callable(self._model_name) else self._model_name,
+            "memory_entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "disk_entries": len(self._disk) if self._disk is not None else None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+        }
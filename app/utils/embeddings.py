@@ -1,9 +1,174 @@
-from sentence_transformers import SentenceTransformer
+import os
 from app.utils.logger import logger
-from app.utils.constants import EMBEDDING_MODEL
+from app.utils.constants import (
+    EMBEDDING_MODEL,
+    EMBEDDING_BACKEND,
+    EMBEDDING_ONNX_QUANTIZE,
+    EMBEDDING_ONNX_DIR,
+    INFERENCE_TORCH_THREADS,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_DISK_ENTRIES,
+    EMBED_BATCH_MAX_SIZE,
+    EMBED_BATCH_MAX_WAIT_MS,
+    EMBED_BATCH_QUEUE_SIZE,
+)
+from app.utils.resources import resources
+from app.utils.devices import load_device, place_on_accelerator
+from app.utils.batching import MicroBatcher
+from app.utils.embedding_cache import EmbeddingCache
 import numpy as np
 
 
+# =============================================================
+# 🔹 shared embedder (one copy per process)
+# =============================================================
+def embedder_id(backend: str | None = None, quantize: str = EMBEDDING_ONNX_QUANTIZE) -> str:
+    """
+    model + backend label; vectors from different backends are not mixed in
+    caches. without a backend, labels the embedder actually built (an onnx
+    build that fell back to torch is labelled torch).
+    """
+    if backend is None:
+        backend = getattr(get_embedder(), "backend", "torch")
+    if backend != "onnx":
+        return EMBEDDING_MODEL
+    return f"{EMBEDDING_MODEL}@onnx-{quantize or 'fp32'}"
+
+
+def build_onnx_embedder(model_name: str = EMBEDDING_MODEL, quantize: str = "", export_dir: str = EMBEDDING_ONNX_DIR):
+    """
+    sentence-transformer running on onnx runtime. the onnx export (and the
+    optional dynamic int8 variant) is written to export_dir once and
+    reused on later starts.
+    """
+    import onnxruntime as ort
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    local_dir = os.path.join(export_dir, model_name.replace("/", "__"))
+    if not os.path.exists(os.path.join(local_dir, "onnx", "model.onnx")):
+        logger.info(f"📤 exporting {model_name} to onnx → {local_dir}")
+        SentenceTransformer(model_name, backend="onnx").save_pretrained(local_dir)
+
+    file_name = "onnx/model.onnx"
+    if quantize:
+        file_name = f"onnx/model_qint8_{quantize}.onnx"
+        if not os.path.exists(os.path.join(local_dir, file_name)):
+            logger.info(f"🔧 quantizing onnx embedder to int8 ({quantize})")
+            export_dynamic_quantized_onnx_model(
+                SentenceTransformer(local_dir, backend="onnx"), quantize, local_dir
+            )
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if INFERENCE_TORCH_THREADS:
+        options.intra_op_num_threads = INFERENCE_TORCH_THREADS
+    return SentenceTransformer(
+        local_dir,
+        backend="onnx",
+        model_kwargs={"file_name": file_name, "provider": "CPUExecutionProvider", "session_options": options},
+    )
+
+
+def _build_embedder():
+    """import sentence-transformers (and torch / onnx runtime) only when the model is needed"""
+    if EMBEDDING_BACKEND == "onnx":
+        try:
+            return build_onnx_embedder(EMBEDDING_MODEL, EMBEDDING_ONNX_QUANTIZE)
+        except Exception as e:
+            logger.error(f"❌ onnx embedder unavailable, falling back to torch: {e}")
+
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(EMBEDDING_MODEL, device=load_device())
+
+
+resources.register(
+    "embedder",
+    _build_embedder,
+    f"sentence embedder ({embedder_id(EMBEDDING_BACKEND)})",
+    post_fork=place_on_accelerator,
+)
+
+
+def get_embedder():
+    """the process-wide sentence-transformer used by every embedding caller"""
+    return resources.get("embedder")
+
+
+# =============================================================
+# 🔹 cached encoding (shared by EmbeddingHelper and VectorService)
+# =============================================================
+embedding_cache = EmbeddingCache(
+    embedder_id,  # resolved once the embedder is built
+    max_entries=EMBEDDING_CACHE_SIZE,
+    disk_dir=EMBEDDING_CACHE_DIR,
+    disk_entries=EMBEDDING_CACHE_DISK_ENTRIES,
+)
+
+
+def _encoder(batch_size: int, show_progress_bar: bool):
+    def _encode(missing: list[str]) -> np.ndarray:
+        return get_embedder().encode(
+            missing,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=show_progress_bar,
+        )
+
+    return _encode
+
+
+def encode_texts(
+    texts: list[str], batch_size: int = 32, show_progress_bar: bool = False, record: bool = True
+) -> np.ndarray | None:
+    """normalized float32 embeddings (n, dim); only cache misses reach the model"""
+    return embedding_cache.encode(texts, _encoder(batch_size, show_progress_bar), record=record)
+
+
+def encode_uncached(texts: list[str], batch_size: int = 64) -> np.ndarray:
+    """large-batch encoding that bypasses the cache (bulk ingestion)"""
+    return np.asarray(_encoder(batch_size, False)(texts), dtype=np.float32)
+
+
+# =============================================================
+# 🔹 request coalescing for single-text callers
+# =============================================================
+def _embed_batch(texts: list[str]) -> list[np.ndarray]:
+    # identical texts in a batch are encoded once (EmbeddingCache.encode);
+    # hit/miss was already counted by the caller's fast-path lookup
+    return embedding_cache.encode_rows(texts, _encoder(EMBED_BATCH_MAX_SIZE, False), record=False)
+
+
+embedding_batcher = MicroBatcher(
+    "embedding",
+    _embed_batch,
+    max_batch_size=EMBED_BATCH_MAX_SIZE,
+    max_wait_ms=EMBED_BATCH_MAX_WAIT_MS,
+    max_queue_size=EMBED_BATCH_QUEUE_SIZE,
+)
+
+
+def embed_one(text: str) -> np.ndarray:
+    """
+    one normalized float32 embedding (read-only). cache hits return at
+    once; misses from concurrent callers share a single encode() batch.
+    """
+    cached = embedding_cache.get(text)
+    if cached is not None:
+        return cached
+    return embedding_batcher.submit(text).result()
+
+
+async def aembed_one(text: str) -> np.ndarray:
+    """async variant of embed_one() (does not block the event loop)"""
+    cached = embedding_cache.get(text)
+    if cached is not None:
+        return cached
+    return await embedding_batcher.asubmit(text)
+
+
 # =============================================================
 # 🧠 Embedding Helper Class
 # =============================================================
@@ -11,26 +176,25 @@ class EmbeddingHelper:
     """handles semantic embeddings for text vectors used in RAG, search, and AI reasoning."""
 
     def __init__(self):
-        self.model = None
+        self.model = None  # resolved on first use
         self.model_name = EMBEDDING_MODEL
-        self._load_model()
 
     # ---------------------------------------------------------
     def _load_model(self):
-        """load the embedding model safely and efficiently"""
+        """resolve the shared embedding model from the resource container"""
         try:
             logger.info(f"🧠 loading embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
+            self.model = get_embedder()
             logger.info("✅ embedding model loaded successfully.")
         except Exception as e:
             logger.error(f"❌ failed to load embedding model: {e}")
             self.model = None
 
     # ---------------------------------------------------------
-    def get_vector(self, text: str) -> list | None:
+    def get_vector(self, text: str) -> np.ndarray | None:
         """
         generate a normalized embedding for a single text input.
-        returns a list of floats or None on failure.
+        returns a float32 numpy vector or None on failure.
         """
         if not text or not isinstance(text, str):
             logger.warning("⚠️ empty or invalid text provided for embedding.")
@@ -43,49 +207,39 @@ class EmbeddingHelper:
                 return None
 
         try:
-            embedding = self.model.encode(
-                text,
-                normalize_embeddings=True,
-                show_progress_bar=False
-            )
-            return embedding.tolist()
+            return embed_one(text)
         except Exception as e:
             logger.error(f"❌ embedding generation failed: {e}")
             return None
 
     # ---------------------------------------------------------
-    def get_batch_vectors(self, texts: list[str]) -> list[list[float]]:
+    def get_batch_vectors(self, texts: list[str]) -> np.ndarray:
         """
         generate embeddings for a list of texts.
-        returns a list of vector lists (each normalized).
+        returns a float32 (n, dim) matrix of normalized vectors.
         """
         if not texts or not isinstance(texts, list):
             logger.warning("⚠️ invalid or empty batch input for embeddings.")
-            return []
+            return np.empty((0, 0), dtype=np.float32)
 
         if not self.model:
             self._load_model()
 
         try:
-            embeddings = self.model.encode(
-                texts,
-                normalize_embeddings=True,
-                show_progress_bar=True,
-                batch_size=8,
-            )
-            return embeddings.tolist()
+            return encode_texts(texts, batch_size=8, show_progress_bar=True)
         except Exception as e:
             logger.error(f"❌ batch embedding generation failed: {e}")
-            return []
+            return np.empty((0, 0), dtype=np.float32)
 
     # ---------------------------------------------------------
-    def cosine_similarity(self, vec_a: list, vec_b: list) -> float:
+    def cosine_similarity(self, vec_a, vec_b) -> float:
         """compute cosine similarity between two vectors."""
         try:
-            if not vec_a or not vec_b:
+            if vec_a is None or vec_b is None or len(vec_a) == 0 or len(vec_b) == 0:
                 return 0.0
-            a = np.array(vec_a)
-            b = np.array(vec_b)
+            # no copy for float32 arrays; lists are converted once
+            a = np.asarray(vec_a, dtype=np.float32)
+            b = np.asarray(vec_b, dtype=np.float32)
             sim = np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b))
             return float(sim)
         except Exception as e:
@@ -0,0 +1,125 @@
+"""
+maharaga inference executor
+---------------------------
+bounded worker pool that keeps blocking model inference (generation,
+sentence embeddings, vector search) off the asyncio event loop.
+when too much work is already pending it refuses new work with
+QueueFullError, which the app turns into a 503 instead of letting
+latency grow without bound.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+from app.utils.logger import logger
+from app.utils.batching import QueueFullError
+from app.utils.constants import (
+    INFERENCE_WORKERS,
+    INFERENCE_QUEUE_SIZE,
+    INFERENCE_TORCH_THREADS,
+)
+
+
+# =============================================================
+# 🧩 inference executor
+# =============================================================
+class InferenceExecutor:
+    """thread pool with admission control for blocking inference calls."""
+
+    def __init__(self, name: str, max_workers: int, max_pending: int, torch_threads: int = 0):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        # pending = running + queued; never less than the worker count
+        self.max_pending = max(self.max_workers, int(max_pending))
+        self.torch_threads = max(0, int(torch_threads))
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+        self._pool: ThreadPoolExecutor | None = None
+
+    # ---------------------------------------------------------
+    def _configure_torch(self):
+        """apply intra-op thread settings once (torch keeps them process-wide)"""
+        if not self.torch_threads:
+            return
+        try:
+            import torch
+
+            torch.set_num_threads(self.torch_threads)
+            logger.info(f"🧵 torch intra-op threads set to {self.torch_threads}")
+        except Exception as e:
+            logger.warning(f"⚠️ could not configure torch threads: {e}")
+
+    def _ensure_pool(self) -> ThreadPoolExecutor:
+        """create the pool lazily so importing this module stays cheap"""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._configure_torch()
+                    self._pool = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix=f"{self.name}-worker"
+                    )
+                    logger.info(
+                        f"⚙️ {self.name} executor ready "
+                        f"(workers={self.max_workers}, max_pending={self.max_pending})"
+                    )
+        return self._pool
+
+    # ---------------------------------------------------------
+    def _release(self, _future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, fn: Callable, *args: Any, **kwargs: Any) -> Future:
+        """schedule fn(*args, **kwargs) or raise QueueFullError when saturated"""
+        pool = self._ensure_pool()
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise QueueFullError(f"{self.name} executor saturated ({self._pending} pending).")
+            self._pending += 1
+            self._submitted += 1
+        try:
+            future = pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """await a blocking call without stalling the event loop"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    # ---------------------------------------------------------
+    def stats(self) -> dict:
+        """current load of the executor"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "workers": self.max_workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        """stop accepting work and let running calls finish"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# =============================================================
+# 🔹 singleton instance
+# =============================================================
+inference_executor = InferenceExecutor(
+    "inference",
+    max_workers=INFERENCE_WORKERS,
+    max_pending=INFERENCE_QUEUE_SIZE,
+    torch_threads=INFERENCE_TORCH_THREADS,
+)
@@ -0,0 +1,434 @@
+"""
+maharaga local vector index
+---------------------------
+embedded, dependency-free vector store with the same point model as the
+qdrant collection (id, float32 vector, json payload).
+
+  • vectors live in a memory-mapped float32 matrix (vectors.f32) that
+    doubles when full; points.log is an append-only json-lines log of
+    upserts / deletes that every process replays, so forked workers
+    share one index (writes are serialized with an flock)
+  • search is an exact numpy top-k over the matrix, or an hnsw graph
+    when LOCAL_INDEX_HNSW is on and `hnswlib` is installed
+  • keyword payload fields (indexed_fields) keep in-memory postings, so
+    a `match={"domains": "health"}` search only scores matching rows
+    (a list value matches any of its entries)
+  • replace_from() rebuilds the whole index in a side directory and
+    swaps it in, which is how a qdrant snapshot is mirrored
+
+used by VectorService as the primary store (VECTOR_BACKEND=local) or as
+the read-only fallback when qdrant is unreachable.
+"""
+
+import os
+import json
+import time
+import fcntl
+import shutil
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.utils.logger import logger
+
+try:
+    import hnswlib
+except ImportError:  # optional
+    hnswlib = None
+
+DISTANCES = ("Cosine", "Dot", "Euclid")
+
+
+class LocalVectorIndex:
+    """memory-mapped float32 points + json payload log, exact or hnsw top-k."""
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, directory: str, use_hnsw: bool = False, indexed_fields: Tuple[str, ...] = ()):
+        self.directory = directory
+        self.indexed_fields = tuple(indexed_fields)
+        self.use_hnsw = use_hnsw and hnswlib is not None
+        if use_hnsw and hnswlib is None:
+            logger.warning("⚠️ LOCAL_INDEX_HNSW is on but hnswlib is not installed — using exact search.")
+        self.meta: Optional[Dict[str, Any]] = None
+        self._matrix = None
+        self._log = None
+        self._pid = None
+        self._inode = None
+        self._offset = 0
+        self._ids: Dict[Any, int] = {}  # point id → row
+        self._row_ids: List[Any] = []  # row → point id
+        self._payloads: List[Optional[Dict[str, Any]]] = []  # row → payload (None = deleted)
+        self._live = np.zeros(0, dtype=bool)
+        # field → value → rows, for indexed_fields
+        self._postings: Dict[str, Dict[Any, Set[int]]] = {f: defaultdict(set) for f in self.indexed_fields}
+        self._graph = None
+        self._graph_dirty = True
+        self._lock = threading.Lock()
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, "meta.json")
+
+    @property
+    def _matrix_path(self) -> str:
+        return os.path.join(self.directory, "vectors.f32")
+
+    @property
+    def _log_path(self) -> str:
+        return os.path.join(self.directory, "points.log")
+
+    # =========================================================
+    # 🔹 files
+    # =========================================================
+    @staticmethod
+    def _write_meta(directory: str, meta: Dict[str, Any]):
+        tmp = os.path.join(directory, f"meta.json.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(directory, "meta.json"))
+
+    def _open(self) -> bool:
+        """(re)open the files for this process; False when no index exists"""
+        try:
+            inode = os.stat(self._meta_path).st_ino
+        except FileNotFoundError:
+            self._close()
+            return False
+        if self._log is not None and self._pid == os.getpid() and inode == self._inode:
+            return True
+
+        # first use, forked child, or the directory was swapped by replace_from()
+        self._close()
+        with open(self._meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._pid, self._inode = os.getpid(), inode
+        self._log = open(self._log_path, "a+", encoding="utf-8")
+        self._map()
+        self._sync()
+        return True
+
+    def _close(self):
+        if self._log is not None:
+            self._log.close()
+        self.meta, self._matrix, self._log, self._inode = None, None, None, None
+        self._offset = 0
+        self._ids.clear()
+        self._row_ids.clear()
+        self._payloads.clear()
+        self._live = np.zeros(0, dtype=bool)
+        self._postings = {f: defaultdict(set) for f in self.indexed_fields}
+        self._graph, self._graph_dirty = None, True
+
+    def _map(self):
+        self._matrix = np.memmap(
+            self._matrix_path, dtype=np.float32, mode="r+", shape=(self.meta["capacity"], self.meta["dim"])
+        )
+
+    def _grow(self, rows: int):
+        """double the matrix until it holds `rows` (caller holds the flock)"""
+        capacity = self.meta["capacity"]
+        while capacity < rows:
+            capacity *= 2
+        if capacity == self.meta["capacity"]:
+            return
+        self._matrix.flush()
+        with open(self._matrix_path, "r+b") as f:
+            f.truncate(capacity * self.meta["dim"] * 4)
+        self.meta["capacity"] = capacity
+        self._write_meta(self.directory, self.meta)
+        self._inode = os.stat(self._meta_path).st_ino
+        self._map()
+
+    def _sync(self):
+        """replay log records appended since the last read (by any process)"""
+        size = os.fstat(self._log.fileno()).st_size
+        if size <= self._offset:
+            return
+        self._log.seek(self._offset)
+        for line in self._log:
+            if not line.endswith("\n"):
+                break  # partially written record; picked up next time
+            self._offset += len(line.encode("utf-8"))
+            record = json.loads(line)
+            row = record.get("row")
+            if record.get("deleted"):
+                row = self._ids.pop(record["id"], None)
+                if row is not None:
+                    self._index_payload(row, self._payloads[row], add=False)
+                    self._payloads[row] = self._row_ids[row] = None
+                    self._live[row] = False
+            else:
+                self._ids[record["id"]] = row
+                if row >= len(self._payloads):
+                    grow = row + 1 - len(self._payloads)
+                    self._payloads.extend([None] * grow)
+                    self._row_ids.extend([None] * grow)
+                if row >= len(self._live):
+                    extra = max(row + 1 - len(self._live), len(self._live))
+                    self._live = np.concatenate([self._live, np.zeros(extra, dtype=bool)])
+                self._index_payload(row, self._payloads[row], add=False)
+                self._payloads[row] = record.get("payload") or {}
+                self._index_payload(row, self._payloads[row], add=True)
+                self._row_ids[row] = record["id"]
+                self._live[row] = True
+                if row >= self._matrix.shape[0]:
+                    # another process grew the matrix
+                    with open(self._meta_path, "r", encoding="utf-8") as f:
+                        self.meta = json.load(f)
+                    self._map()
+            self._graph_dirty = True
+        self._log.seek(0, os.SEEK_END)
+
+    def _index_payload(self, row: int, payload: Optional[Dict[str, Any]], add: bool):
+        if not payload:
+            return
+        for field in self.indexed_fields:
+            values = payload.get(field)
+            for value in values if isinstance(values, list) else [values]:
+                if value is None:
+                    continue
+                rows = self._postings[field][value]
+                if add:
+                    rows.add(row)
+                else:
+                    rows.discard(row)
+
+    def _match_rows(self, match: Dict[str, Any]) -> Optional[Set[int]]:
+        """rows whose indexed payload fields all contain the given values (lists: any of them)"""
+        rows = None
+        for field, value in match.items():
+            if field not in self._postings:
+                raise ValueError(f"payload field '{field}' is not indexed in the local index")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            hits = set().union(*(self._postings[field].get(v, set()) for v in values))
+            rows = set(hits) if rows is None else rows & hits
+        return rows
+
+    # =========================================================
+    # 🔹 writes
+    # =========================================================
+    def create(self, dim: int, distance: str = "Cosine", fingerprint: str = ""):
+        """initialise an empty index in place (no-op if one already exists)"""
+        with self._lock:
+            if os.path.exists(self._meta_path):
+                return
+            self._init_dir(self.directory, dim, distance, fingerprint)
+
+    @classmethod
+    def _init_dir(cls, directory: str, dim: int, distance: str, fingerprint: str):
+        if distance not in DISTANCES:
+            raise ValueError(f"unsupported distance for the local index: {distance}")
+        os.makedirs(directory, exist_ok=True)
+        meta = {
+            "dim": int(dim),
+            "distance": distance,
+            "fingerprint": fingerprint,
+            "capacity": cls.INITIAL_CAPACITY,
+            "created_at": time.time(),
+        }
+        with open(os.path.join(directory, "vectors.f32"), "wb") as f:
+            f.truncate(meta["capacity"] * meta["dim"] * 4)
+        open(os.path.join(directory, "points.log"), "w").close()
+        cls._write_meta(directory, meta)
+
+    def _prepare(self, vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.meta["dim"])
+        if self.meta["distance"] == "Cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1.0, norms)
+        return vectors
+
+    def upsert(self, ids: List[Any], vectors, payloads: List[Dict[str, Any]]):
+        with self._lock:
+            if not self._open():
+                raise RuntimeError(f"local vector index not initialised: {self.directory}")
+            vectors = self._prepare(vectors)
+            fcntl.flock(self._log.fileno(), fcntl.LOCK_EX)
+            try:
+                self._sync()
+                next_row = len(self._payloads)
+                rows = []
+                for point_id in ids:
+                    row = self._ids.get(point_id)
+                    if row is None:
+                        row, next_row = next_row, next_row + 1
+                    rows.append(row)
+                self._grow(next_row)
+                # vectors first, then the log records that publish them
+                self._matrix[rows] = vectors
+                self._matrix.flush()
+                self._log.write(
+                    "".join(
+                        json.dumps({"id": i, "row": r, "payload": p}, ensure_ascii=False) + "\n"
+                        for i, r, p in zip(ids, rows, payloads)
+                    )
+                )
+                self._log.flush()
+                self._sync()
+            finally:
+                fcntl.flock(self._log.fileno(), fcntl.LOCK_UN)
+
+    def delete_where(self, predicate: Callable[[Dict[str, Any]], bool]) -> int:
+        """delete every point whose payload matches; returns the count"""
+        with self._lock:
+            if not self._open():
+                return 0
+            fcntl.flock(self._log.fileno(), fcntl.LOCK_EX)
+            try:
+                self._sync()
+                doomed = [i for i, row in self._ids.items() if predicate(self._payloads[row])]
+                if doomed:
+                    self._log.write("".join(json.dumps({"id": i, "deleted": True}) + "\n" for i in doomed))
+                    self._log.flush()
+                    self._sync()
+                return len(doomed)
+            finally:
+                fcntl.flock(self._log.fileno(), fcntl.LOCK_UN)
+
+    def replace_from(
+        self,
+        batches: Iterable[Tuple[List[Any], Any, List[Dict[str, Any]]]],
+        dim: int,
+        distance: str = "Cosine",
+        fingerprint: str = "",
+    ) -> int:
+        """
+        build a fresh index from (ids, vectors, payloads) batches in a side
+        directory, then swap it in. readers keep the old files until their
+        next call notices the new meta.json.
+        """
+        staging = f"{self.directory}.building-{os.getpid()}"
+        shutil.rmtree(staging, ignore_errors=True)
+        self._init_dir(staging, dim, distance, fingerprint)
+        fresh = LocalVectorIndex(staging, indexed_fields=self.indexed_fields)
+        count = 0
+        for ids, vectors, payloads in batches:
+            fresh.upsert(ids, vectors, payloads)
+            count += len(ids)
+        fresh._close()
+
+        retired = f"{self.directory}.retired-{os.getpid()}"
+        with self._lock:
+            if os.path.exists(self.directory):
+                os.rename(self.directory, retired)
+            os.rename(staging, self.directory)
+            self._close()
+        shutil.rmtree(retired, ignore_errors=True)
+        logger.info(f"💾 local vector index rebuilt: {count} points in {self.directory}")
+        return count
+
+    def clear(self):
+        """drop every point, keeping dim / distance / fingerprint"""
+        with self._lock:
+            meta = dict(self.meta) if self._open() else None
+        if meta is not None:
+            self.replace_from([], meta["dim"], meta["distance"], meta.get("fingerprint", ""))
+
+    # =========================================================
+    # 🔹 reads
+    # =========================================================
+    def _graph_search(self, query: np.ndarray, limit: int, rows: Optional[Set[int]]):
+        if self._graph is None or self._graph_dirty:
+            all_rows = np.fromiter(self._ids.values(), dtype=np.int64, count=len(self._ids))
+            space = {"Cosine": "ip", "Dot": "ip", "Euclid": "l2"}[self.meta["distance"]]
+            graph = hnswlib.Index(space=space, dim=self.meta["dim"])
+            graph.init_index(max_elements=max(len(all_rows), 1), ef_construction=200, M=16)
+            if len(all_rows):
+                graph.add_items(np.asarray(self._matrix[all_rows]), all_rows)
+            self._graph, self._graph_dirty = graph, False
+        self._graph.set_ef(max(64, limit * 4))
+        k = min(limit, len(self._ids) if rows is None else len(rows))
+        if k == 0:
+            return [], []
+        allowed = None if rows is None else (lambda label: label in rows)
+        labels, distances = self._graph.knn_query(query[None, :], k=k, filter=allowed)
+        if self.meta["distance"] == "Euclid":
+            scores = -np.sqrt(np.maximum(distances[0], 0.0))
+        else:
+            scores = 1.0 - distances[0]
+        return labels[0], scores
+
+    def _exact_search(self, query: np.ndarray, limit: int, rows: Optional[Set[int]]):
+        if rows is not None:
+            # filtered: score only the matching rows
+            candidates = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            matrix = self._matrix[candidates]
+        else:
+            n = len(self._payloads)
+            candidates, matrix = None, self._matrix[:n]
+        if self.meta["distance"] == "Euclid":
+            scores = -np.linalg.norm(matrix - query, axis=1)
+        else:
+            scores = matrix @ query
+        if candidates is None:
+            live = self._live[:n]
+            scores = np.where(live, scores, -np.inf)
+            k = min(limit, int(live.sum()))
+        else:
+            k = min(limit, len(candidates))
+        if k == 0:
+            return [], []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return (top if candidates is None else candidates[top]), scores[top]
+
+    def search(self, vector, limit: int = 3, match: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """top-k points as {id, score, payload}, best first (optionally only rows matching `match`)"""
+        with self._lock:
+            if not self._open():
+                return []
+            self._sync()
+            if not self._ids or limit <= 0:
+                return []
+            if np.size(vector) != self.meta["dim"]:
+                raise ValueError(f"query has {np.size(vector)} dims, local index holds {self.meta['dim']}")
+            query = self._prepare(vector)[0]
+            allowed = self._match_rows(match) if match else None
+            if self.use_hnsw:
+                rows, scores = self._graph_search(query, limit, allowed)
+            else:
+                rows, scores = self._exact_search(query, limit, allowed)
+            return [
+                {"id": self._row_ids[int(r)], "score": float(s), "payload": self._payloads[int(r)]}
+                for r, s in zip(rows, scores)
+                if self._payloads[int(r)] is not None
+            ]
+
+    def iter_batches(self, batch_size: int = 256):
+        """(ids, vectors, payloads) batches over a point-in-time copy of the index"""
+        with self._lock:
+            if not self._open():
+                return
+            self._sync()
+            points = [(i, row, self._payloads[row]) for i, row in self._ids.items()]
+        for start in range(0, len(points), batch_size):
+            batch = points[start:start + batch_size]
+            with self._lock:
+                vectors = np.array(self._matrix[[row for _, row, _ in batch]], dtype=np.float32)
+            yield [i for i, _, _ in batch], vectors, [p for _, _, p in batch]
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            if not self._open():
+                return {"exists": False, "directory": self.directory}
+            self._sync()
+            return {
+                "exists": True,
+                "directory": self.directory,
+                "points": len(self._ids),
+                "dim": self.meta["dim"],
+                "distance": self.meta["distance"],
+                "fingerprint": self.meta.get("fingerprint", ""),
+                "created_at": self.meta.get("created_at"),
+                "search": "hnsw" if self.use_hnsw else "exact",
+            }
+
+    def __len__(self) -> int:
+        with self._lock:
+            if not self._open():
+                return 0
+            self._sync()
+            return len(self._ids)
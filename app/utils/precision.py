@@ -0,0 +1,117 @@
+"""
+maharaga inference precision
+----------------------------
+optional reduced-precision modes for the generator:
+
+  • fp32  — weights as loaded (default)
+  • int8  — dynamic int8 quantization of every linear layer (cpu only).
+            weights are stored as int8, activations are quantized on the
+            fly per batch; typically ~2x faster matmuls and ~4x smaller
+            linear weights on x86.
+  • bf16  — bfloat16 weights + activations, only where the hardware has
+            native bf16 (cuda with bf16 support, or cpus with avx512_bf16
+            / amx). otherwise it falls back to fp32.
+
+validate a mode with benchmarks/precision_compare.py before enabling it.
+"""
+
+from app.utils.logger import logger
+
+PRECISIONS = ("fp32", "int8", "bf16")
+
+
+# =============================================================
+# 🔹 hardware checks
+# =============================================================
+def _cpu_flags() -> set:
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def bf16_supported(device: str) -> bool:
+    """true when bf16 runs natively (not emulated) on device"""
+    import torch
+
+    if device.startswith("cuda"):
+        return torch.cuda.is_available() and torch.cuda.is_bf16_supported()
+    return bool(_cpu_flags() & {"avx512_bf16", "amx_bf16"})
+
+
+# =============================================================
+# 🔹 conversions
+# =============================================================
+def _conv1d_to_linear(model) -> int:
+    """
+    gpt-2 style models use transformers' Conv1D (x @ W + b) instead of
+    nn.Linear, which quantize_dynamic does not recognise. swap each one
+    for an equivalent nn.Linear with the transposed weight.
+    """
+    import torch.nn as nn
+    from transformers.pytorch_utils import Conv1D
+
+    swapped = 0
+    for parent in list(model.modules()):
+        for name, child in list(parent.named_children()):
+            if not isinstance(child, Conv1D):
+                continue
+            n_in, n_out = child.weight.shape
+            linear = nn.Linear(n_in, n_out, bias=child.bias is not None)
+            linear.weight.data = child.weight.data.t().contiguous()
+            if child.bias is not None:
+                linear.bias.data = child.bias.data
+            setattr(parent, name, linear)
+            swapped += 1
+    return swapped
+
+
+def quantize_int8(model):
+    """dynamic int8 quantization of all linear layers (returns the new model)"""
+    import torch
+    import torch.nn as nn
+
+    swapped = _conv1d_to_linear(model)
+    if swapped:
+        logger.info(f"🔧 converted {swapped} conv1d layers to linear for quantization")
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+# =============================================================
+# 🚀 entry point
+# =============================================================
+def apply_precision(model, precision: str, device: str = "cpu"):
+    """
+    convert a loaded fp32 model to the requested precision.
+    returns (model, effective_precision); unsupported modes fall back to fp32.
+    """
+    import torch
+
+    precision = (precision or "fp32").lower()
+    if precision not in PRECISIONS:
+        logger.warning(f"⚠️ unknown inference precision '{precision}', using fp32.")
+        return model, "fp32"
+
+    try:
+        if precision == "int8":
+            if device != "cpu":
+                logger.warning("⚠️ dynamic int8 quantization is cpu-only, using fp32.")
+                return model, "fp32"
+            model = quantize_int8(model)
+        elif precision == "bf16":
+            if not bf16_supported(device):
+                logger.warning(f"⚠️ no native bf16 on {device}, using fp32.")
+                return model, "fp32"
+            model = model.to(dtype=torch.bfloat16)
+    except Exception as e:
+        logger.error(f"❌ {precision} conversion failed, using fp32: {e}")
+        return model, "fp32"
+
+    if precision != "fp32":
+        logger.info(f"⚡ generator running in {precision}")
+    return model, precision
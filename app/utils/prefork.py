@@ -0,0 +1,133 @@
+"""
+maharaga preforking server
+--------------------------
+preload-then-fork process model for production.
+
+`uvicorn --workers N` spawns fresh interpreters, so every worker loads
+its own copy of distilgpt2 and MiniLM. here the master process loads
+the cpu weights once, freezes the gc so collections don't dirty the
+shared pages, binds the listening socket and then forks the workers.
+tensor storage stays in copy-on-write pages shared by all workers, which
+only pay for their own activations and python objects.
+
+nothing that does not survive fork is created in the master: gpu
+placement is deferred (app.utils.devices) and network clients such as
+qdrant's are opened by the post_fork hook in each worker.
+
+only use on linux/macos (os.fork). thread pools and batcher threads are
+created lazily, so no thread exists in the master at fork time.
+"""
+
+import gc
+import os
+import signal
+import socket
+import time
+from typing import Callable, Optional
+
+import uvicorn
+
+from app.utils.logger import logger
+from app.utils.devices import defer_placement
+
+
+# =============================================================
+# 🔹 listening socket shared by every worker
+# =============================================================
+def _bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+# =============================================================
+# 🔹 worker body (runs in the forked child)
+# =============================================================
+def _run_worker(app, sock: socket.socket, log_level: str, post_fork: Optional[Callable[[], None]]):
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    defer_placement(False)
+    try:
+        if post_fork:
+            post_fork()
+        config = uvicorn.Config(app, log_level=log_level, workers=1)
+        uvicorn.Server(config).run(sockets=[sock])
+    except Exception as e:
+        logger.error(f"❌ worker {os.getpid()} crashed: {e}")
+        os._exit(1)
+    os._exit(0)
+
+
+# =============================================================
+# 🚀 master: preload, fork, supervise
+# =============================================================
+def serve_preforked(
+    app,
+    host: str,
+    port: int,
+    workers: int,
+    warmup: Optional[Callable[[], None]] = None,
+    post_fork: Optional[Callable[[], None]] = None,
+    log_level: str = "info",
+):
+    """load shared weights once, then fork `workers` uvicorn servers (each runs post_fork first)"""
+    if warmup:
+        start = time.time()
+        logger.info("🔥 preloading models in master before fork...")
+        defer_placement(True)
+        warmup()
+        logger.info(f"✅ preload finished in {time.time() - start:.1f}s")
+
+    # move everything allocated so far out of gc tracking: collections in
+    # the children would otherwise write to (and un-share) these pages
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind_socket(host, port)
+    children: dict[int, int] = {}
+    stopping = False
+
+    def spawn(slot: int):
+        pid = os.fork()
+        if pid == 0:
+            _run_worker(app, sock, log_level, post_fork)
+        children[pid] = slot
+        logger.info(f"👷 worker {slot} started (pid {pid})")
+
+    def shutdown(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        logger.info(f"🛑 master received signal {signum}, stopping workers...")
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    for slot in range(max(1, workers)):
+        spawn(slot)
+
+    # supervise: restart crashed workers until asked to stop
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        slot = children.pop(pid, None)
+        if slot is None:
+            continue
+        if not stopping:
+            logger.warning(f"⚠️ worker {slot} (pid {pid}) exited with status {status}; restarting.")
+            time.sleep(1)
+            spawn(slot)
+
+    sock.close()
+    logger.info("✅ all workers stopped.")
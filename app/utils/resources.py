@@ -0,0 +1,177 @@
+"""
+maharaga resource container
+---------------------------
+single place that owns the heavy, process-wide resources (generator,
+sentence embedder, ...). each resource is registered with a factory and
+built lazily on first use, exactly once, no matter how many modules ask
+for it. load time and memory footprint are recorded for the startup
+report. resources built by the preforking master can register a
+post_fork hook that finishes their setup in every worker (gpu placement).
+"""
+
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List
+
+from app.utils.logger import logger
+
+
+# =============================================================
+# 🔹 memory helpers
+# =============================================================
+def _rss_bytes() -> int:
+    """current resident set size of this process (0 if unknown)"""
+    try:
+        with open("/proc/self/statm", "r", encoding="utf-8") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return 0
+
+
+def _tensor_bytes(obj: Any) -> int:
+    """bytes held by parameters + buffers of a torch module (or its .model)"""
+    for candidate in (obj, getattr(obj, "model", None)):
+        if candidate is not None and hasattr(candidate, "parameters"):
+            try:
+                total = sum(p.numel() * p.element_size() for p in candidate.parameters())
+                total += sum(b.numel() * b.element_size() for b in candidate.buffers())
+                return int(total)
+            except Exception:
+                return 0
+    return 0
+
+
+def _mb(n: int) -> float:
+    return round(n / (1024 * 1024), 1)
+
+
+# =============================================================
+# 🧩 resource container
+# =============================================================
+class ResourceContainer:
+    """lazily built, shared resources with load-time / memory accounting."""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._post_fork: Dict[str, Callable[[Any], None]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._info: Dict[str, dict] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    # ---------------------------------------------------------
+    def register(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        description: str = "",
+        post_fork: Callable[[Any], None] | None = None,
+    ):
+        """declare a resource; nothing is built until get(name) is called"""
+        with self._lock:
+            self._factories[name] = factory
+            if post_fork is not None:
+                self._post_fork[name] = post_fork
+            self._locks.setdefault(name, threading.Lock())
+            self._info.setdefault(name, {"name": name, "description": description, "loaded": False})
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    # ---------------------------------------------------------
+    def get(self, name: str) -> Any:
+        """return the shared instance, building it on first use"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        if name not in self._factories:
+            raise KeyError(f"unknown resource '{name}'")
+
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is not None:
+                return instance
+
+            rss_before = _rss_bytes()
+            start = time.perf_counter()
+            try:
+                instance = self._factories[name]()
+            except Exception as e:
+                self._info[name].update({"loaded": False, "error": str(e)})
+                raise
+            elapsed = time.perf_counter() - start
+
+            self._instances[name] = instance
+            self._info[name].update(
+                {
+                    "loaded": True,
+                    "error": None,
+                    "load_seconds": round(elapsed, 2),
+                    "tensor_mb": _mb(_tensor_bytes(instance)),
+                    "rss_delta_mb": _mb(max(0, _rss_bytes() - rss_before)),
+                }
+            )
+            logger.info(
+                f"📦 resource '{name}' ready in {elapsed:.2f}s "
+                f"({self._info[name]['tensor_mb']} MB weights)"
+            )
+            return instance
+
+    def try_get(self, name: str) -> Any | None:
+        """like get(), but logs and returns None when the resource cannot load"""
+        try:
+            return self.get(name)
+        except Exception as e:
+            logger.error(f"❌ resource '{name}' unavailable: {e}")
+            return None
+
+    def release(self, name: str):
+        """drop the shared instance; the next get() rebuilds it"""
+        with self._locks.get(name, self._lock):
+            self._instances.pop(name, None)
+            if name in self._info:
+                self._info[name]["loaded"] = False
+
+    def warmup(self, names: List[str] | None = None):
+        """build the given (default: all registered) resources now"""
+        for name in names or list(self._factories):
+            self.try_get(name)
+
+    def after_fork(self):
+        """run the post_fork hooks of the resources inherited from the master"""
+        for name, hook in self._post_fork.items():
+            instance = self._instances.get(name)
+            if instance is None:
+                continue
+            try:
+                hook(instance)
+            except Exception as e:
+                logger.error(f"❌ post-fork setup of '{name}' failed: {e}")
+
+    # ---------------------------------------------------------
+    def report(self) -> List[dict]:
+        """per-resource load time and memory footprint"""
+        return [dict(info) for info in self._info.values()]
+
+    def log_report(self):
+        """print the resource table at startup"""
+        logger.info("──────────────────────────────────────────────")
+        logger.info(f"📊 shared resources (process rss: {_mb(_rss_bytes())} MB)")
+        for info in self.report():
+            if info.get("loaded"):
+                logger.info(
+                    f"   • {info['name']}: {info['load_seconds']}s, "
+                    f"weights {info['tensor_mb']} MB, rss +{info['rss_delta_mb']} MB"
+                )
+            elif info.get("error"):
+                logger.info(f"   • {info['name']}: failed — {info['error']}")
+            else:
+                logger.info(f"   • {info['name']}: not loaded yet (lazy)")
+        logger.info("──────────────────────────────────────────────")
+
+
+# =============================================================
+# 🔹 singleton instance
+# =============================================================
+resources = ResourceContainer()
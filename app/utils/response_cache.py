@@ -0,0 +1,236 @@
+"""
+maharaga response cache
+-----------------------
+two-tier cache for finished orchestrator answers.
+
+  • exact tier    — normalized query + mode + scope → response payload
+  • semantic tier — optional; query embeddings of cached answers are kept
+                    next to them, and a new question whose embedding is at
+                    least `threshold` cosine-similar to a cached one (same
+                    mode and scope) is served that answer.
+
+the scope string carries the model version (and, for rag mode, the
+knowledge-base version), so entries produced by an older model or
+against an older knowledge base are never served: they simply stop
+matching and age out. entries are bounded by an LRU limit and a TTL.
+caches are per process; the ttl bounds staleness across workers.
+"""
+
+import re
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from app.utils.logger import logger
+
+_PUNCT_TAIL = re.compile(r"[\s?!.,;:]+$")
+
+
+def normalize_query(query: str) -> str:
+    """lowercase, collapse whitespace, drop trailing punctuation"""
+    return _PUNCT_TAIL.sub("", " ".join((query or "").lower().split()))
+
+
+# =============================================================
+# 🧩 response cache
+# =============================================================
+class ResponseCache:
+    """lru + ttl response cache with an optional semantic tier."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        embed_fn: Optional[Callable[[str], object]] = None,
+        similarity_threshold: float = 0.92,
+        enabled: bool = True,
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.embed_fn = embed_fn
+        self.threshold = float(similarity_threshold)
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        # semantic index per (mode, scope): keys + row-aligned unit vectors
+        self._index: dict = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidations": 0,
+        }
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.enabled and self.embed_fn is not None
+
+    # ---------------------------------------------------------
+    @staticmethod
+    def _key(mode: str, query: str, scope: str) -> str:
+        raw = f"{mode}|{scope}|{normalize_query(query)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _expired(self, entry: dict) -> bool:
+        return self.ttl > 0 and time.time() - entry["created"] > self.ttl
+
+    def _drop(self, key: str):
+        """remove an entry and its semantic row (lock held)"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        index = self._index.get((entry["mode"], entry["scope"]))
+        if index and key in index["keys"]:
+            row = index["keys"].index(key)
+            index["keys"].pop(row)
+            index["vectors"] = np.delete(index["vectors"], row, axis=0)
+
+    # ---------------------------------------------------------
+    def get(self, mode: str, query: str, scope: str) -> dict | None:
+        """exact-tier lookup (cheap, safe to call on the event loop)"""
+        if not self.enabled:
+            return None
+        key = self._key(mode, query, scope)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                self._drop(key)
+                self._counters["expired"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["exact_hits"] += 1
+            return dict(entry["payload"], cache="exact")
+
+    def get_similar(self, mode: str, query: str, scope: str, vector=None) -> dict | None:
+        """
+        semantic-tier lookup. embeds normalize_query(query) unless that
+        embedding is passed as `vector` (embedding — run it off the event loop).
+        """
+        if not self.semantic_enabled:
+            self._miss()
+            return None
+        with self._lock:
+            index = self._index.get((mode, scope))
+            if not index or not index["keys"]:
+                self._counters["misses"] += 1
+                return None
+
+        vector = self._embed(query) if vector is None else self._unit(vector)
+        if vector is None:
+            self._miss()
+            return None
+
+        with self._lock:
+            index = self._index.get((mode, scope))
+            if not index or not index["keys"]:
+                self._counters["misses"] += 1
+                return None
+            scores = index["vectors"] @ vector
+            row = int(np.argmax(scores))
+            score = float(scores[row])
+            key = index["keys"][row]
+            entry = self._entries.get(key)
+            if score < self.threshold or entry is None or self._expired(entry):
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["semantic_hits"] += 1
+            return dict(entry["payload"], cache="semantic", cache_similarity=round(score, 4))
+
+    def _miss(self):
+        with self._lock:
+            self._counters["misses"] += 1
+
+    def _embed(self, query: str):
+        try:
+            return self._unit(self.embed_fn(normalize_query(query)))
+        except Exception as e:
+            logger.warning(f"⚠️ response cache embedding failed: {e}")
+            return None
+
+    @staticmethod
+    def _unit(vector):
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    # ---------------------------------------------------------
+    def put(self, mode: str, query: str, scope: str, payload: dict):
+        """store a finished answer in the exact tier"""
+        if not self.enabled:
+            return
+        key = self._key(mode, query, scope)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = {
+                "mode": mode,
+                "scope": scope,
+                "query": normalize_query(query),
+                "payload": dict(payload),
+                "created": time.time(),
+            }
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._counters["evictions"] += 1
+
+    def index(self, mode: str, query: str, scope: str, vector=None):
+        """add a stored answer to the semantic tier (embeds unless `vector` is given)"""
+        if not self.semantic_enabled:
+            return
+        vector = self._embed(query) if vector is None else self._unit(vector)
+        if vector is None:
+            return
+        key = self._key(mode, query, scope)
+        with self._lock:
+            if key not in self._entries:
+                return
+            # a newer scope for this mode makes older semantic rows unreachable
+            for stale in [s for s in self._index if s[0] == mode and s[1] != scope]:
+                del self._index[stale]
+            index = self._index.setdefault(
+                (mode, scope), {"keys": [], "vectors": np.empty((0, vector.shape[0]), dtype=np.float32)}
+            )
+            if key in index["keys"]:
+                return
+            index["keys"].append(key)
+            index["vectors"] = np.vstack([index["vectors"], vector[None, :]])
+
+    # ---------------------------------------------------------
+    def invalidate(self, mode: str | None = None, reason: str = ""):
+        """drop every entry (or only those of one mode)"""
+        with self._lock:
+            keys = [k for k, e in self._entries.items() if mode is None or e["mode"] == mode]
+            for key in keys:
+                self._drop(key)
+            for scope in [s for s in self._index if mode is None or s[0] == mode]:
+                del self._index[scope]
+            self._counters["invalidations"] += 1
+        logger.info(f"🧹 response cache invalidated ({len(keys)} entries){f': {reason}' if reason else ''}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._counters["exact_hits"] + self._counters["semantic_hits"] + self._counters["misses"]
+            hits = self._counters["exact_hits"] + self._counters["semantic_hits"]
+            return {
+                "enabled": self.enabled,
+                "semantic": self.semantic_enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "threshold": self.threshold,
+                **self._counters,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            }
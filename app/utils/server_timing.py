@@ -0,0 +1,43 @@
+"""
+maharaga server timing
+----------------------
+per-request stage durations, reported in the standard `Server-Timing`
+response header (shown by browser devtools, visible with curl -i):
+
+    Server-Timing: embed;dur=6.1, safety;dur=0.2, intent;dur=0.3, retrieval;dur=18.4, ...
+
+controllers record stages on request.state; the middleware installed by
+create_app() adds the request total and writes the header. stages that
+ran concurrently overlap, so durations need not add up to the total.
+"""
+
+import time
+from typing import Any, Awaitable, Dict, Optional
+
+from fastapi import Request
+
+
+def stage_timings(request: Request) -> Dict[str, float]:
+    """this request's stage → milliseconds map"""
+    timings = getattr(request.state, "server_timing", None)
+    if timings is None:
+        timings = request.state.server_timing = {}
+    return timings
+
+
+def record(request: Optional[Request], stage: str, ms: float):
+    if request is not None:
+        stage_timings(request)[stage] = round(ms, 2)
+
+
+async def timed(request: Optional[Request], stage: str, awaitable: Awaitable) -> Any:
+    """await and record how long it took (also when it fails or is cancelled)"""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        record(request, stage, (time.perf_counter() - start) * 1000)
+
+
+def header_value(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={ms}" for stage, ms in timings.items())
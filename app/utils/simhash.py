@@ -0,0 +1,81 @@
+"""
+maharaga simhash
+----------------
+64-bit simhash fingerprints of chunk text for near-duplicate detection.
+
+  • features are lowercase word 3-shingles (single words for very short
+    texts), each hashed with blake2b
+  • two texts are near-duplicates when their fingerprints differ in at
+    most SIMHASH_MAX_DISTANCE bits (hamming distance)
+
+fingerprints are computed once at ingestion and stored in the chunk
+payload as a 16-char hex string (qdrant integers are signed 64-bit).
+"""
+
+import re
+import hashlib
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.utils.constants import SIMHASH_MAX_DISTANCE
+
+BITS = 64
+_SHIFTS = np.arange(BITS, dtype=np.uint64)
+_WORD = re.compile(r"\w+")
+
+
+def _features(text: str, shingle: int = 3) -> List[str]:
+    words = _WORD.findall((text or "").lower())
+    if len(words) < shingle:
+        return words
+    return [" ".join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)]
+
+
+def simhash(text: str) -> str:
+    """64-bit simhash of text as hex ("" for empty text)"""
+    features = _features(text)
+    if not features:
+        return ""
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "big") for f in features),
+        dtype=np.uint64,
+        count=len(features),
+    )
+    # a fingerprint bit is set when most features have it set
+    ones = ((hashes[:, None] >> _SHIFTS) & np.uint64(1)).sum(axis=0)
+    value = sum(1 << bit for bit in np.flatnonzero(2 * ones > len(features)).tolist())
+    return f"{value:016x}"
+
+
+def hamming(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def drop_near_duplicates(
+    docs: Iterable[Dict[str, Any]], max_distance: int = SIMHASH_MAX_DISTANCE
+) -> List[Dict[str, Any]]:
+    """
+    keep the first (best-ranked) of every group of near-duplicate docs.
+    uses the stored payload fingerprint, computing it for docs without one.
+    neighbouring chunks of the same parent are kept — merge_chunks() joins
+    those and removes their overlap.
+    """
+    kept: List[Dict[str, Any]] = []
+    prints: List[Optional[str]] = []
+    for doc in docs:
+        fp = doc.get("simhash") or simhash(doc.get("text", ""))
+        duplicate = fp and any(
+            other and hamming(fp, other) <= max_distance and not _neighbours(doc, kept_doc)
+            for other, kept_doc in zip(prints, kept)
+        )
+        if not duplicate:
+            kept.append(doc)
+            prints.append(fp)
+    return kept
+
+
+def _neighbours(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    if a.get("parent_id") is None or a.get("parent_id") != b.get("parent_id"):
+        return False
+    return abs((a.get("chunk_index") or 0) - (b.get("chunk_index") or 0)) == 1
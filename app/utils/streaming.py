@@ -0,0 +1,67 @@
+"""
+maharaga streaming helpers
+--------------------------
+turns a token iterator into a chunked NDJSON response body, running the
+policy post-processing incrementally so clients get the first words
+while the model is still decoding.
+"""
+
+import json
+from typing import Iterable, Iterator
+
+from app.utils.logger import logger
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+# =============================================================
+# 🔹 ndjson event stream
+# =============================================================
+def _event(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+def ndjson_token_stream(
+    pieces: Iterable[str],
+    text_filter=None,
+    meta: dict | None = None,
+    fallback: str | None = None,
+) -> Iterator[str]:
+    """
+    wrap decoded text pieces as NDJSON events:
+      {"event": "start", ...meta}
+      {"event": "token", "text": "..."}   (repeated)
+      {"event": "end", "response": "<full text>"}
+    `text_filter` is a StreamingPolicyFilter (feed/finish/text).
+    """
+    yield _event({"event": "start", **(meta or {})})
+
+    sent = []
+    try:
+        for piece in pieces:
+            text = text_filter.feed(piece) if text_filter else piece
+            if text:
+                sent.append(text)
+                yield _event({"event": "token", "text": text})
+
+        if text_filter:
+            tail = text_filter.finish()
+            if tail:
+                sent.append(tail)
+                yield _event({"event": "token", "text": tail})
+
+        response = "".join(sent).strip()
+        if not response and fallback:
+            response = fallback
+            yield _event({"event": "token", "text": fallback})
+
+        yield _event({"event": "end", "status": "success", "response": response})
+
+    except Exception as e:
+        logger.error(f"❌ token stream failed: {e}")
+        yield _event({"event": "error", "status": "error", "message": "generation stream interrupted."})
+    finally:
+        # propagate client disconnects to the generator so decoding stops
+        close = getattr(pieces, "close", None)
+        if close:
+            close()
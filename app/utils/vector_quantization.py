@@ -0,0 +1,83 @@
+"""
+maharaga vector quantization
+----------------------------
+qdrant storage settings for knowledge-base vectors.
+
+  none     float32 vectors in ram (4 bytes / dim)
+  scalar   int8 copy in ram (1 byte / dim, ~4x smaller); search runs on
+           the int8 copy
+  product  product-quantized codes in ram (QDRANT_PQ_COMPRESSION, x16 =
+           0.25 bytes / dim); much smaller, noticeably lossier
+
+with rescoring on, qdrant fetches limit × oversampling candidates from
+the quantized copy and re-ranks them with the original float32 vectors,
+which can then live on disk (QDRANT_VECTORS_ON_DISK). use
+benchmarks/quantization_recall.py to pick settings for a corpus.
+"""
+
+from qdrant_client.http import models as qmodels
+
+from app.utils.constants import (
+    QDRANT_QUANTIZATION,
+    QDRANT_SCALAR_QUANTILE,
+    QDRANT_PQ_COMPRESSION,
+    QDRANT_QUANTIZATION_RESCORE,
+    QDRANT_QUANTIZATION_OVERSAMPLING,
+)
+
+MODES = ("none", "scalar", "product")
+
+
+def quantization_config(
+    mode: str = QDRANT_QUANTIZATION,
+    quantile: float = QDRANT_SCALAR_QUANTILE,
+    compression: str = QDRANT_PQ_COMPRESSION,
+    always_ram: bool = True,
+):
+    """collection quantization_config for a mode (None for float32 only)"""
+    if mode not in MODES:
+        raise ValueError(f"unknown quantization mode: {mode} (expected one of {MODES})")
+    if mode == "scalar":
+        return qmodels.ScalarQuantization(
+            scalar=qmodels.ScalarQuantizationConfig(
+                type=qmodels.ScalarType.INT8, quantile=quantile, always_ram=always_ram
+            )
+        )
+    if mode == "product":
+        return qmodels.ProductQuantization(
+            product=qmodels.ProductQuantizationConfig(
+                compression=qmodels.CompressionRatio(compression), always_ram=always_ram
+            )
+        )
+    return None
+
+
+def search_params(
+    mode: str = QDRANT_QUANTIZATION,
+    rescore: bool = QDRANT_QUANTIZATION_RESCORE,
+    oversampling: float = QDRANT_QUANTIZATION_OVERSAMPLING,
+):
+    """query-time search params matching a mode (None for float32 only)"""
+    if mode == "none":
+        return None
+    return qmodels.SearchParams(
+        quantization=qmodels.QuantizationSearchParams(rescore=rescore, oversampling=oversampling)
+    )
+
+
+def stored_mode(config) -> str:
+    """mode of an existing collection's quantization_config"""
+    if isinstance(config, qmodels.ScalarQuantization):
+        return "scalar"
+    if isinstance(config, qmodels.ProductQuantization):
+        return "product"
+    return "none" if config is None else type(config).__name__.lower()
+
+
+def bytes_per_vector(mode: str, dim: int, compression: str = QDRANT_PQ_COMPRESSION) -> float:
+    """ram per vector for the searched copy (float32 originals excluded)"""
+    if mode == "scalar":
+        return float(dim)
+    if mode == "product":
+        return dim * 4 / int(compression.lstrip("x"))
+    return dim * 4.0
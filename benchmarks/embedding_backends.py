@@ -0,0 +1,183 @@
+"""
+embedding backend parity + throughput
+-------------------------------------
+compares the onnx runtime embedder (EMBEDDING_BACKEND=onnx, optionally
+int8 via EMBEDDING_ONNX_QUANTIZE) against the pytorch sentence-transformer
+on a fixed corpus:
+
+  parity      per-sentence cosine between the backend's vector and the
+              pytorch vector (mean / min), and top-k retrieval overlap for
+              a set of queries over the corpus
+  throughput  sentences/s at batch size 1 (query path) and --batch-size
+              (ingestion path), plus single-query p50 / p95 latency
+
+exits with status 1 when a backend's minimum cosine falls below its
+threshold, so it can gate enabling the backend in production.
+
+usage:
+    python benchmarks/embedding_backends.py --quantize avx512_vnni
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from app.utils.constants import EMBEDDING_MODEL, EMBEDDING_ONNX_DIR  # noqa: E402
+from app.utils.embeddings import build_onnx_embedder  # noqa: E402
+
+CORPUS = [
+    "dharma is the moral order that sustains the universe and society.",
+    "karma describes how intentional actions shape future experiences.",
+    "the bhagavad gita is a dialogue between arjuna and krishna.",
+    "meditation trains attention and awareness to calm the mind.",
+    "ahimsa means non-violence in thought, word and deed.",
+    "yoga unites breath, posture and concentration.",
+    "the upanishads explore the nature of atman and brahman.",
+    "compassion is the wish for others to be free from suffering.",
+    "a balanced diet includes vegetables, grains, proteins and fats.",
+    "photosynthesis converts sunlight, water and carbon dioxide into sugar.",
+    "the heart pumps blood through arteries and veins.",
+    "binary search halves the search interval at every step.",
+    "python lists are dynamic arrays of object references.",
+    "an operating system schedules processes and manages memory.",
+    "inflation is a general rise in prices over time.",
+    "democracy is government by the people through elected representatives.",
+    "the ramayana tells the story of rama, sita and hanuman.",
+    "gravity attracts masses toward each other.",
+    "sleep is essential for memory consolidation.",
+    "prime numbers have exactly two divisors.",
+    "forgiveness releases resentment toward someone who caused harm.",
+    "the mahabharata contains the kurukshetra war.",
+    "vaccines train the immune system to recognise pathogens.",
+    "a hash table maps keys to buckets through a hash function.",
+]
+
+QUERIES = [
+    "what is dharma?",
+    "who speaks in the gita?",
+    "how does meditation help?",
+    "what does non-violence mean?",
+    "how do plants make food?",
+    "what does the heart do?",
+    "how does binary search work?",
+    "what is a hash map?",
+]
+
+
+# =============================================================
+# 🔹 measurements
+# =============================================================
+def _encode(model, texts, batch_size=32):
+    return model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+
+
+def parity(reference, candidate, k: int) -> dict:
+    ref_docs, cand_docs = _encode(reference, CORPUS), _encode(candidate, CORPUS)
+    cosines = np.sum(ref_docs * cand_docs, axis=1)
+
+    ref_q, cand_q = _encode(reference, QUERIES), _encode(candidate, QUERIES)
+    overlaps = []
+    for rq, cq in zip(ref_q, cand_q):
+        top_ref = set(np.argsort(-(ref_docs @ rq))[:k])
+        top_cand = set(np.argsort(-(cand_docs @ cq))[:k])
+        overlaps.append(len(top_ref & top_cand) / k)
+    return {
+        "cos_mean": float(cosines.mean()),
+        "cos_min": float(cosines.min()),
+        f"top{k}_overlap": float(np.mean(overlaps)),
+    }
+
+
+def throughput(model, rounds: int, batch_size: int) -> dict:
+    texts = (CORPUS * ((batch_size // len(CORPUS)) + 1))[:batch_size]
+    _encode(model, QUERIES)  # warm-up
+
+    latencies = []
+    for _ in range(rounds):
+        for q in QUERIES:
+            start = time.perf_counter()
+            _encode(model, [q], batch_size=1)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        _encode(model, texts, batch_size=batch_size)
+    batched = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "single_per_s": len(latencies) / sum(latencies),
+        "batch_per_s": rounds * batch_size / batched,
+    }
+
+
+# =============================================================
+# 🔹 report
+# =============================================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--quantize", default="", help="also test int8: avx512_vnni | avx512 | avx2 | arm64")
+    parser.add_argument("--export-dir", default=EMBEDDING_ONNX_DIR)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--min-cosine", type=float, default=0.999, help="threshold for fp32 onnx")
+    parser.add_argument("--min-cosine-int8", type=float, default=0.97, help="threshold for int8 onnx")
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    reference = SentenceTransformer(args.model)
+    backends = [("torch", reference, None)]
+    backends.append(("onnx-fp32", build_onnx_embedder(args.model, "", args.export_dir), args.min_cosine))
+    if args.quantize:
+        backends.append(
+            (
+                f"onnx-int8-{args.quantize}",
+                build_onnx_embedder(args.model, args.quantize, args.export_dir),
+                args.min_cosine_int8,
+            )
+        )
+
+    print(f"\nmodel {args.model}, {len(CORPUS)} docs / {len(QUERIES)} queries, {args.rounds} rounds")
+    header = (
+        f"{'backend':<22} {'cos mean':>9} {'cos min':>8} {'top-k':>6} "
+        f"{'p50 ms':>7} {'p95 ms':>7} {'1/s':>8} {'batch/s':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+
+    failed = []
+    for name, model, threshold in backends:
+        p = parity(reference, model, args.top_k)
+        t = throughput(model, args.rounds, args.batch_size)
+        print(
+            f"{name:<22} {p['cos_mean']:>9.5f} {p['cos_min']:>8.5f} {p[f'top{args.top_k}_overlap']:>6.2f} "
+            f"{t['p50_ms']:>7.2f} {t['p95_ms']:>7.2f} {t['single_per_s']:>8.1f} {t['batch_per_s']:>9.1f}"
+        )
+        if threshold is not None and p["cos_min"] < threshold:
+            failed.append(f"{name}: min cosine {p['cos_min']:.5f} < {threshold}")
+
+    if failed:
+        print("\nparity check FAILED:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+    print("\nparity check passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+precision comparison harness
+----------------------------
+loads the generator once per inference precision (fp32 / int8 / bf16,
+see app/utils/precision.py) and runs the same fixed prompt set through
+each with greedy decoding, reporting:
+
+  • latency   — median / p95 ms per prompt and generated tokens per second
+  • size      — serialized weight size
+  • accuracy  — agreement with the fp32 reference:
+                  exact      share of prompts whose greedy output is identical
+                  prefix     mean fraction of reference tokens matched before
+                             the first divergence
+                  top1       next-token top-1 agreement along the reference
+                             continuation (teacher forced)
+                  nll Δ      change in mean per-token nll of the reference
+                             continuation (lower is better, 0 for fp32)
+
+usage:
+    python benchmarks/precision_compare.py --precisions fp32,int8,bf16 --repeats 3
+
+run it on the production hardware before setting INFERENCE_PRECISION.
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import torch  # noqa: E402
+from transformers import AutoModelForCausalLM, AutoTokenizer  # noqa: E402
+
+from app.utils.constants import MODEL_NAME, SYSTEM_PROMPT_PREFIX  # noqa: E402
+from app.utils.precision import PRECISIONS, apply_precision  # noqa: E402
+
+# fixed prompt set: plain chat prompts + rag-shaped prompts
+PROMPTS = [
+    "what is dharma?",
+    "explain the difference between knowledge and wisdom.",
+    "how can a person stay calm under pressure?",
+    "summarize the idea of non-attachment in two sentences.",
+    (
+        f"{SYSTEM_PROMPT_PREFIX}<<context>>\nthe bhagavad gita is a 700-verse dialogue between "
+        "arjuna and krishna set on the battlefield of kurukshetra.\n---\n"
+        "<<question>> who speaks in the bhagavad gita?\n<<answer>>"
+    ),
+    (
+        f"{SYSTEM_PROMPT_PREFIX}<<context>>\nmeditation is the practice of training attention "
+        "and awareness to reach a mentally clear and emotionally calm state.\n---\n"
+        "<<question>> what is meditation for?\n<<answer>>"
+    ),
+    (
+        f"{SYSTEM_PROMPT_PREFIX}<<context>>\nahimsa means non-violence towards all living "
+        "beings in thought, word and deed.\n---\n<<question>> define ahimsa.\n<<answer>>"
+    ),
+    f"{SYSTEM_PROMPT_PREFIX}<<context>>\n\n---\n<<question>> what is the capital of mars?\n<<answer>>",
+]
+
+
+# =============================================================
+# 🔹 helpers
+# =============================================================
+def _load(model_name: str, precision: str):
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    model = AutoModelForCausalLM.from_pretrained(model_name)
+    model.eval()
+    model, effective = apply_precision(model, precision, "cpu")
+    return model, tokenizer, effective
+
+
+def _size_mb(model) -> float:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def _generate(model, tokenizer, prompt: str, max_new_tokens: int):
+    inputs = tokenizer(prompt, return_tensors="pt")
+    start = time.perf_counter()
+    with torch.inference_mode():
+        out = model.generate(
+            **inputs, max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=tokenizer.pad_token_id
+        )
+    elapsed = time.perf_counter() - start
+    return out[0, inputs["input_ids"].shape[1]:].tolist(), elapsed
+
+
+def _score_reference(model, tokenizer, prompt: str, reference: list[int]) -> tuple[float, float]:
+    """(mean nll, top-1 agreement) of the reference continuation under model"""
+    if not reference:
+        return 0.0, 1.0
+    prompt_ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+    ids = torch.cat([prompt_ids, torch.tensor([reference])], dim=1)
+    with torch.inference_mode():
+        logits = model(input_ids=ids).logits.float()
+    start = prompt_ids.shape[1] - 1
+    pred = logits[0, start:-1]
+    target = ids[0, start + 1:]
+    nll = torch.nn.functional.cross_entropy(pred, target).item()
+    top1 = (pred.argmax(-1) == target).float().mean().item()
+    return nll, top1
+
+
+def _common_prefix(a: list[int], b: list[int]) -> float:
+    if not b:
+        return 1.0
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n / len(b)
+
+
+# =============================================================
+# 🔹 one precision run
+# =============================================================
+def run(model_name: str, precision: str, repeats: int, max_new_tokens: int, reference: dict | None):
+    model, tokenizer, effective = _load(model_name, precision)
+    if effective != precision:
+        return {"precision": precision, "skipped": f"not supported here (fell back to {effective})"}
+
+    _generate(model, tokenizer, PROMPTS[0], 8)  # warm-up
+
+    latencies, tokens, outputs = [], 0, {}
+    for prompt in PROMPTS:
+        for _ in range(repeats):
+            generated, elapsed = _generate(model, tokenizer, prompt, max_new_tokens)
+            latencies.append(elapsed * 1000)
+            tokens += len(generated)
+        outputs[prompt] = generated
+
+    result = {
+        "precision": precision,
+        "size_mb": round(_size_mb(model), 1),
+        "median_ms": round(statistics.median(latencies), 1),
+        "p95_ms": round(sorted(latencies)[int(0.95 * (len(latencies) - 1))], 1),
+        "tokens_per_s": round(tokens / (sum(latencies) / 1000), 1),
+        "outputs": outputs,
+    }
+
+    reference = reference or outputs
+    nlls, top1s, exact, prefix = [], [], 0, []
+    for prompt in PROMPTS:
+        nll, top1 = _score_reference(model, tokenizer, prompt, reference[prompt])
+        nlls.append(nll)
+        top1s.append(top1)
+        exact += outputs[prompt] == reference[prompt]
+        prefix.append(_common_prefix(outputs[prompt], reference[prompt]))
+    result.update(
+        {
+            "nll": statistics.mean(nlls),
+            "top1": round(statistics.mean(top1s), 3),
+            "exact": round(exact / len(PROMPTS), 3),
+            "prefix": round(statistics.mean(prefix), 3),
+        }
+    )
+    del model
+    return result
+
+
+# =============================================================
+# 🔹 report
+# =============================================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--precisions", default=",".join(PRECISIONS))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-new-tokens", type=int, default=48)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--json", action="store_true", help="print raw results as json")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    precisions = [p.strip() for p in args.precisions.split(",") if p.strip()]
+    # fp32 is always measured first: it is the accuracy reference
+    precisions = ["fp32"] + [p for p in precisions if p != "fp32"]
+
+    results, reference, base_nll = [], None, None
+    for precision in precisions:
+        print(f"… measuring {precision}", file=sys.stderr)
+        result = run(args.model, precision, args.repeats, args.max_new_tokens, reference)
+        if reference is None:
+            reference, base_nll = result["outputs"], result["nll"]
+        if "nll" in result:
+            result["nll_delta"] = round(result.pop("nll") - base_nll, 4)
+        result.pop("outputs", None)
+        results.append(result)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\nmodel {args.model}, {len(PROMPTS)} prompts x {args.repeats}, {args.max_new_tokens} new tokens, greedy")
+    header = f"{'precision':<10} {'size MB':>8} {'median ms':>10} {'p95 ms':>8} {'tok/s':>7} {'exact':>6} {'prefix':>7} {'top1':>6} {'nll Δ':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        if "skipped" in r:
+            print(f"{r['precision']:<10} {r['skipped']}")
+            continue
+        print(
+            f"{r['precision']:<10} {r['size_mb']:>8.1f} {r['median_ms']:>10.1f} {r['p95_ms']:>8.1f} "
+            f"{r['tokens_per_s']:>7.1f} {r['exact']:>6.2f} {r['prefix']:>7.2f} {r['top1']:>6.2f} {r['nll_delta']:>8.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
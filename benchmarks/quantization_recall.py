@@ -0,0 +1,189 @@
+"""
+stored-vector quantization: recall@k vs latency
+-----------------------------------------------
+builds one qdrant collection per storage setting from the same corpus,
+runs a held-out query set against each and compares with exact float32
+brute force (numpy):
+
+  recall@k   |approx top-k ∩ exact top-k| / k, averaged over queries
+  p50 / p95  per-query latency of query_points
+  ram MB     searched copy of the vectors (float32 originals excluded
+             when they are on disk)
+
+settings: none, scalar int8, product quantization (--pq ratios), each
+with and without rescoring (and the --oversampling values).
+
+the corpus is either simulated (clustered unit vectors, default) or a
+jsonl / txt file embedded with --model; with a file, --holdout lines are
+kept out of the index and used as queries. needs a real qdrant server
+(--url): the in-process ":memory:" mode ignores quantization.
+
+usage:
+    python benchmarks/quantization_recall.py --url http://localhost:6333 --points 50000
+    python benchmarks/quantization_recall.py --url http://localhost:6333 \\
+        --corpus data/corpus.jsonl --model sentence-transformers/all-MiniLM-L6-v2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models as qmodels  # noqa: E402
+
+from app.utils.vector_quantization import bytes_per_vector, quantization_config, search_params  # noqa: E402
+
+COLLECTION = "bench_quantization"
+
+
+# =============================================================
+# 🔹 data
+# =============================================================
+def simulated(points: int, queries: int, dim: int, clusters: int = 64):
+    """clustered unit vectors; queries are perturbed members of the same clusters"""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+
+    def sample(n, spread):
+        x = centers[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+        return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+    return sample(points, 0.6), sample(queries, 0.7)
+
+
+def from_corpus(path: str, model_name: str, holdout: int, limit: int):
+    from sentence_transformers import SentenceTransformer
+
+    texts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            texts.append(json.loads(line).get("text", "") if path.endswith(".jsonl") else line)
+            if limit and len(texts) >= limit + holdout:
+                break
+    texts = [t for t in texts if t]
+    rng = np.random.default_rng(0)
+    order = rng.permutation(len(texts))
+    held, indexed = order[:holdout], order[holdout:]
+    model = SentenceTransformer(model_name)
+    encode = lambda items: model.encode(  # noqa: E731
+        items, batch_size=128, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=True
+    ).astype(np.float32)
+    return encode([texts[i] for i in indexed]), encode([texts[i] for i in held])
+
+
+def exact_topk(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+# =============================================================
+# 🔹 one setting
+# =============================================================
+def build(client: QdrantClient, corpus: np.ndarray, mode: str, compression: str, on_disk: bool, batch: int = 1024):
+    if client.collection_exists(COLLECTION):
+        client.delete_collection(COLLECTION)
+    client.create_collection(
+        COLLECTION,
+        vectors_config=qmodels.VectorParams(
+            size=corpus.shape[1], distance=qmodels.Distance.COSINE, on_disk=on_disk or None
+        ),
+        quantization_config=quantization_config(mode, compression=compression),
+        # index right away so the hnsw graph (and quantized copy) exist before querying
+        optimizers_config=qmodels.OptimizersConfigDiff(indexing_threshold=0),
+    )
+    for start in range(0, len(corpus), batch):
+        chunk = corpus[start:start + batch]
+        client.upsert(
+            COLLECTION,
+            points=qmodels.Batch(ids=list(range(start, start + len(chunk))), vectors=chunk.tolist()),
+            wait=True,
+        )
+    while client.get_collection(COLLECTION).status != qmodels.CollectionStatus.GREEN:
+        time.sleep(0.5)
+
+
+def measure(client: QdrantClient, queries: np.ndarray, truth: np.ndarray, k: int, params) -> dict:
+    for q in queries[:10]:  # warm-up
+        client.query_points(COLLECTION, query=q, limit=k, search_params=params)
+    recalls, latencies = [], []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = client.query_points(COLLECTION, query=q, limit=k, search_params=params).points
+        latencies.append(time.perf_counter() - start)
+        recalls.append(len({h.id for h in hits} & set(expected.tolist())) / k)
+    latencies.sort()
+    return {
+        "recall": statistics.mean(recalls),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+    }
+
+
+# =============================================================
+# 🔹 report
+# =============================================================
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:6333")
+    parser.add_argument("--points", type=int, default=20000, help="simulated corpus size / corpus line limit")
+    parser.add_argument("--queries", type=int, default=500, help="simulated held-out queries")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--corpus", default="", help="jsonl (text field) or txt file instead of simulated vectors")
+    parser.add_argument("--model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--holdout", type=int, default=500, help="corpus lines used as queries")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq", default="x16,x32", help="product quantization ratios to test")
+    parser.add_argument("--oversampling", default="1.0,2.0,4.0")
+    parser.add_argument("--on-disk", action="store_true", help="store the float32 originals on disk")
+    args = parser.parse_args()
+
+    if args.url == ":memory:":
+        print("⚠️ ':memory:' qdrant ignores quantization — every setting will report float32 numbers.")
+    client = QdrantClient(url=args.url) if args.url != ":memory:" else QdrantClient(":memory:")
+
+    if args.corpus:
+        corpus, queries = from_corpus(args.corpus, args.model, args.holdout, args.points)
+    else:
+        corpus, queries = simulated(args.points, args.queries, args.dim)
+    truth = exact_topk(corpus, queries, args.k)
+    n, dim = corpus.shape
+    oversampling = [float(x) for x in args.oversampling.split(",") if x]
+
+    settings = [("none", "x16")] + [("scalar", "x16")] + [("product", r) for r in args.pq.split(",") if r]
+    print(f"\n{n} points, {len(queries)} held-out queries, dim {dim}, recall@{args.k}, originals on disk: {args.on_disk}")
+    header = f"{'storage':<14} {'rescore':>8} {'oversmp':>8} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7} {'ram MB':>8}"
+    print(header)
+    print("-" * len(header))
+
+    for mode, ratio in settings:
+        build(client, corpus, mode, ratio, args.on_disk)
+        ram = n * bytes_per_vector(mode, dim, ratio) / 2**20
+        if mode != "none" and not args.on_disk:
+            ram += n * dim * 4 / 2**20  # originals stay in ram too
+        label = mode if mode != "product" else f"product {ratio}"
+        variants = [(None, None)] if mode == "none" else [(False, 1.0)] + [(True, o) for o in oversampling]
+        for rescore, factor in variants:
+            params = None if rescore is None else search_params(mode, rescore=rescore, oversampling=factor)
+            r = measure(client, queries, truth, args.k, params)
+            print(
+                f"{label:<14} {str(rescore if rescore is not None else '-'):>8} {factor or '-':>8} "
+                f"{r['recall']:>7.3f} {r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {ram:>8.1f}"
+            )
+
+    client.delete_collection(COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
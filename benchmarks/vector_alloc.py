@@ -0,0 +1,157 @@
+"""
+vector allocation microbenchmark
+--------------------------------
+compares the per-query memory traffic of the old list-based vector path
+with the float32 array path now used by EmbeddingHelper / VectorService:
+
+  list path   encoder output → .tolist() → np.array(list) for cosine
+              similarity → python float list handed to qdrant
+  array path  encoder output row (read-only float32 view) → cosine on the
+              array → the array handed to qdrant
+
+for each path it reports, per query, the python heap bytes allocated at
+peak (tracemalloc), the number of allocated blocks still alive mid-query,
+and wall time. by default the encoder output is simulated (random unit
+vectors) so only the conversion overhead is measured; --model runs the
+real MiniLM, and --qdrant adds an in-process (":memory:") qdrant search.
+
+usage:
+    python benchmarks/vector_alloc.py --queries 2000 --dim 384 --qdrant
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+
+# =============================================================
+# 🔹 encoders
+# =============================================================
+def _fake_encoder(dim: int):
+    rng = np.random.default_rng(0)
+
+    def encode(texts):
+        out = rng.standard_normal((len(texts), dim)).astype(np.float32)
+        return out / np.linalg.norm(out, axis=1, keepdims=True)
+
+    return encode
+
+
+def _model_encoder(name: str):
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(name)
+    return lambda texts: model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+
+# =============================================================
+# 🔹 the two pipelines
+# =============================================================
+def list_path(encode, text: str, reference, qdrant=None):
+    vector = encode([text])[0].tolist()  # old embed_text / get_vector
+    a, b = np.array(vector), np.array(reference)  # old cosine_similarity
+    score = float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+    if qdrant is not None:
+        qdrant.query_points("bench", query=vector, limit=3)
+    return score
+
+
+def array_path(encode, text: str, reference, qdrant=None):
+    vector = np.ascontiguousarray(encode([text])[0], dtype=np.float32)
+    vector.setflags(write=False)
+    a, b = np.asarray(vector, dtype=np.float32), np.asarray(reference, dtype=np.float32)
+    score = float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+    if qdrant is not None:
+        qdrant.query_points("bench", query=vector, limit=3)
+    return score
+
+
+# =============================================================
+# 🔹 measurement
+# =============================================================
+def measure(fn, encode, queries: int, reference, qdrant=None) -> dict:
+    texts = [f"what does verse {i} say about dharma?" for i in range(queries)]
+    for t in texts[:20]:  # warm-up
+        fn(encode, t, reference, qdrant)
+
+    gc.collect()
+    peaks, times = [], []
+    tracemalloc.start()
+    for t in texts:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        fn(encode, t, reference, qdrant)
+        times.append(time.perf_counter() - start)
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - base)
+    tracemalloc.stop()
+
+    # blocks alive while a converted vector is held (the boxed floats)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    convert = (lambda v: v.tolist()) if fn is list_path else (lambda v: v)
+    held = [convert(encode([t])[0]) for t in texts[:100]]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, "filename")) / len(held)
+    del held
+
+    return {
+        "peak_kb": statistics.mean(peaks) / 1024,
+        "blocks": blocks,
+        "us": statistics.median(times) * 1e6,
+    }
+
+
+def _qdrant(dim: int, points: int, encode):
+    from qdrant_client import QdrantClient
+    from qdrant_client.http import models as qmodels
+
+    client = QdrantClient(":memory:")
+    client.create_collection(
+        "bench", vectors_config=qmodels.VectorParams(size=dim, distance=qmodels.Distance.COSINE)
+    )
+    vectors = encode([f"doc {i}" for i in range(points)])
+    client.upload_collection("bench", vectors=vectors, ids=list(range(points)), wait=True)
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--model", default="", help="sentence-transformers model (default: simulated encoder)")
+    parser.add_argument("--qdrant", action="store_true", help="include an in-process qdrant search")
+    parser.add_argument("--points", type=int, default=1000)
+    args = parser.parse_args()
+
+    encode = _model_encoder(args.model) if args.model else _fake_encoder(args.dim)
+    dim = len(encode(["probe"])[0])
+    reference = encode(["reference"])[0]
+    qdrant = _qdrant(dim, args.points, encode) if args.qdrant else None
+
+    results = {
+        "list": measure(list_path, encode, args.queries, reference, qdrant),
+        "array": measure(array_path, encode, args.queries, reference, qdrant),
+    }
+
+    print(f"\n{args.queries} queries, dim {dim}, encoder {args.model or 'simulated'}, qdrant {'on' if qdrant else 'off'}")
+    print(f"{'path':<6} {'peak KB/query':>14} {'blocks/vector':>14} {'median µs':>10}")
+    for name, r in results.items():
+        print(f"{name:<6} {r['peak_kb']:>14.1f} {r['blocks']:>14.1f} {r['us']:>10.1f}")
+    saved = results["list"]["peak_kb"] - results["array"]["peak_kb"]
+    print(f"\narray path saves {saved:.1f} KB of transient allocations per query")
+
+
+if __name__ == "__main__":
+    main()
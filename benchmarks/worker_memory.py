@@ -0,0 +1,168 @@
+"""
+worker memory benchmark
+-----------------------
+starts the production server twice — once with per-worker model loading
+(PRELOAD_MODELS=false, uvicorn spawn workers) and once in preload-then-fork
+mode — and reports RSS / PSS / private memory per worker from
+/proc/<pid>/smaps_rollup. PSS splits shared pages between the processes
+that map them, so it is the honest "cost per worker" figure.
+
+usage:
+    python benchmarks/worker_memory.py --workers 4 --requests 8
+
+linux only (reads /proc).
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PORT = 8000  # run.py always binds here
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+# =============================================================
+# 🔹 /proc helpers
+# =============================================================
+def _children(pid: int) -> list[int]:
+    """all descendant pids of pid"""
+    parents: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r", encoding="utf-8") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            parents.setdefault(ppid, []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    found, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def _cmdline(pid: int) -> str:
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode(errors="ignore")
+    except OSError:
+        return ""
+
+
+def _smaps(pid: int) -> dict:
+    """memory counters in MB from smaps_rollup"""
+    out = {}
+    with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in FIELDS:
+                out[key] = int(rest.split()[0]) / 1024
+    return out
+
+
+# =============================================================
+# 🔹 one server run
+# =============================================================
+def _wait_healthy(port: int, timeout: float) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/v1/health", timeout=2):
+                return True
+        except Exception:
+            time.sleep(1)
+    return False
+
+
+def _drive_traffic(port: int, requests: int):
+    """touch the models in every worker so activations are included"""
+    body = json.dumps({"query": "what is dharma", "user_age": 30}).encode()
+    for _ in range(requests):
+        req = urllib.request.Request(
+            f"http://127.0.0.1:{port}/api/v1/query",
+            data=body,
+            headers={"Content-Type": "application/json"},
+        )
+        try:
+            urllib.request.urlopen(req, timeout=120).read()
+        except Exception as e:
+            print(f"  request failed: {e}")
+
+
+def measure(preload: bool, workers: int, port: int, requests: int, settle: float) -> list[dict]:
+    env = dict(
+        os.environ,
+        ENVIRONMENT="production",
+        PRELOAD_MODELS="true" if preload else "false",
+        WEB_WORKERS=str(workers),
+    )
+    proc = subprocess.Popen([sys.executable, "run.py"], cwd=ROOT, env=env)
+    try:
+        if not _wait_healthy(port, timeout=600):
+            raise RuntimeError("server did not become healthy")
+        time.sleep(settle)  # let every worker finish its startup
+        _drive_traffic(port, requests)
+        time.sleep(2)
+
+        rows = []
+        for pid in _children(proc.pid):
+            cmd = _cmdline(pid)
+            if "resource_tracker" in cmd or "semaphore_tracker" in cmd:
+                continue
+            try:
+                rows.append({"pid": pid, **_smaps(pid)})
+            except OSError:
+                continue
+        master = {"pid": proc.pid, **_smaps(proc.pid)}
+        return [dict(master, role="master")] + [dict(r, role="worker") for r in rows]
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+# =============================================================
+# 🔹 report
+# =============================================================
+def _print(label: str, rows: list[dict]):
+    print(f"\n{label}")
+    print(f"{'role':<7} {'pid':>7} " + " ".join(f"{k:>14}" for k in FIELDS))
+    for r in rows:
+        print(f"{r['role']:<7} {r['pid']:>7} " + " ".join(f"{r.get(k, 0):>14.1f}" for k in FIELDS))
+    workers = [r for r in rows if r["role"] == "worker"]
+    if workers:
+        avg = lambda k: sum(w.get(k, 0) for w in workers) / len(workers)
+        total_pss = sum(r.get("Pss", 0) for r in rows)
+        print(
+            f"per worker: rss {avg('Rss'):.1f} MB, pss {avg('Pss'):.1f} MB, "
+            f"private {avg('Private_Clean') + avg('Private_Dirty'):.1f} MB | "
+            f"total pss (all processes) {total_pss:.1f} MB"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=8)
+    parser.add_argument("--settle", type=float, default=15.0)
+    args = parser.parse_args()
+
+    before = measure(False, args.workers, PORT, args.requests, args.settle)
+    _print("before: per-worker loading (PRELOAD_MODELS=false)", before)
+    after = measure(True, args.workers, PORT, args.requests, args.settle)
+    _print("after: preload-then-fork (PRELOAD_MODELS=true)", after)
+
+
+if __name__ == "__main__":
+    main()
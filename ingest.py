@@ -0,0 +1,69 @@
+"""
+Maharaga Ingestion Script
+-------------------------
+Bulk-loads documents into the knowledge base (Qdrant).
+
+    python ingest.py data/corpus.jsonl --checkpoint data/corpus.ckpt
+    python ingest.py data/articles/ --workers 8 --embed-batch 512
+    python ingest.py data/faq.csv --text-field answer --id-field faq_id
+    python ingest.py data/corpus.jsonl --snapshot
+
+Sources: a .jsonl file, a .csv file, or a directory of .jsonl / .csv /
+.txt / .md files. Re-running with the same --checkpoint resumes after
+the last fully stored document. --snapshot refreshes the local fallback
+index from Qdrant once the run has finished.
+"""
+
+import argparse
+import json
+import sys
+
+from app.services.ingestion_service import IngestionError, IngestionPipeline
+from app.services.vector_service import vector_service
+from app.utils.constants import (
+    INGEST_EMBED_BATCH,
+    INGEST_UPSERT_BATCH,
+    INGEST_WORKERS,
+    INGEST_MAX_RETRIES,
+)
+from app.utils.logger import logger
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="jsonl / csv file or directory")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--checkpoint", default=None, help="progress file for resumable runs")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start over")
+    parser.add_argument("--embed-batch", type=int, default=INGEST_EMBED_BATCH)
+    parser.add_argument("--upsert-batch", type=int, default=INGEST_UPSERT_BATCH)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--retries", type=int, default=INGEST_MAX_RETRIES)
+    parser.add_argument("--snapshot", action="store_true", help="mirror qdrant into the local fallback index afterwards")
+    args = parser.parse_args()
+
+    pipeline = IngestionPipeline(
+        embed_batch=args.embed_batch,
+        upsert_batch=args.upsert_batch,
+        workers=args.workers,
+        max_retries=args.retries,
+        checkpoint_path=args.checkpoint,
+    )
+    try:
+        report = pipeline.run(args.source, text_field=args.text_field, id_field=args.id_field, restart=args.restart)
+    except (IngestionError, ValueError, OSError) as e:
+        logger.error(f"❌ ingestion failed: {e}")
+        if args.checkpoint:
+            logger.info(f"↩️ rerun with --checkpoint {args.checkpoint} to resume.")
+        return 1
+
+    if args.snapshot:
+        report["snapshot"] = vector_service.snapshot_local_index()
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
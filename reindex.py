@@ -0,0 +1,41 @@
+"""
+Maharaga Reindex Script
+-----------------------
+Re-embeds the knowledge base with the configured embedding model into a
+new Qdrant collection, then swaps the QDRANT_COLLECTION alias to it.
+
+    EMBEDDING_MODEL=sentence-transformers/all-mpnet-base-v2 python reindex.py
+    python reindex.py --drop-old
+
+The previous collection keeps serving until the swap and is kept for
+rollback unless --drop-old is given. Restart the API workers with the
+same EMBEDDING_MODEL afterwards so queries are embedded in the new space.
+"""
+
+import argparse
+import json
+import sys
+
+from app.services.vector_service import vector_service
+from app.utils.constants import INGEST_EMBED_BATCH
+from app.utils.logger import logger
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=INGEST_EMBED_BATCH)
+    parser.add_argument("--drop-old", action="store_true", help="delete the previous collection after the swap")
+    args = parser.parse_args()
+
+    try:
+        report = vector_service.reindex(batch_size=args.batch_size, drop_old=args.drop_old)
+    except Exception as e:
+        logger.error(f"❌ reindex failed: {e} — the alias still points at the previous collection.")
+        return 1
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,11 +3,14 @@ Maharaga Run Script
 -------------------
 Entry point for launching the Maharaga backend server.
 Supports both development (reload) and production (optimized) modes.
+In production, cpu weights are preloaded once and workers are forked so
+they are shared copy-on-write; each worker then does its own gpu
+placement and qdrant connection (disable with PRELOAD_MODELS=false).
 """
 
 import uvicorn
 from app import create_app
-from app.config import ENVIRONMENT, APP_NAME, APP_VERSION
+from app.config import ENVIRONMENT, APP_NAME, APP_VERSION, WEB_WORKERS, PRELOAD_MODELS
 from app.utils.logger import logger
 
 # =============================================================
@@ -31,11 +34,24 @@ if __name__ == "__main__":
     # switch reload mode dynamically
     reload_mode = ENVIRONMENT in ["development", "local"]
 
-    uvicorn.run(
-        "run:app",
-        host=host,
-        port=port,
-        reload=reload_mode,
-        workers=1 if reload_mode else 4,
-        log_level="info",
-    )
+    if not reload_mode and PRELOAD_MODELS:
+        from app.utils.prefork import serve_preforked
+        from app.utils.resources import resources
+        from app.services import preload_models, after_fork
+
+        def warmup():
+            preload_models()
+            resources.log_report()
+
+        serve_preforked(
+            app, host, port, workers=WEB_WORKERS, warmup=warmup, post_fork=after_fork, log_level="info"
+        )
+    else:
+        uvicorn.run(
+            "run:app",
+            host=host,
+            port=port,
+            reload=reload_mode,
+            workers=1 if reload_mode else WEB_WORKERS,
+            log_level="info",
+        )